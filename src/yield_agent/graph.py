@@ -107,8 +107,11 @@ def handle_error(state: AgentState) -> dict[str, Any]:
 def find_routes_only(state: AgentState) -> dict[str, Any]:
     """
     Handle route-only queries without yield fetching.
+    
+    Routes go to the preferred chains and are served from the route
+    matrix where it holds them.
     """
-    from yield_agent.nodes.route_finder import find_routes_async
+    from yield_agent.nodes.route_finder import find_routes_to, needs_bridge
     import asyncio
     
     if not state.current_chain:
@@ -123,7 +126,18 @@ def find_routes_only(state: AgentState) -> dict[str, Any]:
             "processing_step": "route_only_no_destination",
         }
     
-    return asyncio.run(find_routes_async(state))
+    target_chains = [
+        chain for chain in dict.fromkeys(c.lower() for c in state.preferred_chains)
+        if needs_bridge(state.current_chain, chain)
+    ]
+    
+    return asyncio.run(find_routes_to(
+        state.current_chain,
+        target_chains,
+        state.token or "USDC",
+        state.amount or 1000,
+        list(state.warnings) if state.warnings else [],
+    ))
 
 
 def format_route_response(state: AgentState) -> dict[str, Any]:
@@ -14,6 +14,8 @@ import asyncio
 import os
 from typing import Any, Optional
 
+import numpy as np
+
 from yield_agent.state import (
     AgentState,
     BridgeRoute,
@@ -27,6 +29,12 @@ from yield_agent.tools.gas_client import (
     GasClient,
     get_gas_for_chains,
 )
+from yield_agent.tools.lifi_client import LiFiClient
+from yield_agent.tools.pool_cache import get_pool_cache
+from yield_agent.tools.pool_charts import get_pool_charts
+from yield_agent.tools.pool_history import DAY_SECONDS
+from yield_agent.tools.route_costs import COST_MODEL
+from yield_agent.tools.vocabulary import CHAINS
 
 
 # ==============================================================================
@@ -36,6 +44,24 @@ from yield_agent.tools.gas_client import (
 
 MAX_RECOMMENDATIONS = 10
 
+# Top-scoring candidates whose daily APY history is checked before the
+# final ranking (0 = skip history). The locally recorded pool history is
+# used where it covers HISTORY_MIN_DAYS; /chart is fetched for the rest.
+HISTORY_CANDIDATES = int(os.getenv("HISTORY_CANDIDATES", 50))
+
+# Top-ranked candidates whose modeled bridge routes (see route_costs)
+# are replaced by live quotes before recommendations are built.
+LIVE_QUOTE_CANDIDATES = int(os.getenv("LIVE_QUOTE_CANDIDATES", 3))
+
+HISTORY_WINDOW_DAYS = 30
+HISTORY_MIN_DAYS = 7
+
+# Risk score penalty by APY coefficient of variation over the window.
+VOLATILITY_PENALTIES = [
+    (0.5, 2.0),
+    (0.25, 1.0),
+]
+
 WEIGHT_PROFILES: dict[RiskTolerance, dict[str, float]] = {
     RiskTolerance.CONSERVATIVE: {
         "apy": 0.25,
@@ -130,6 +156,49 @@ def calculate_risk_score(
     return max(0, min(10, base_score))
 
 
+def calculate_apy_volatility(points: Optional[np.ndarray]) -> Optional[float]:
+    """
+    Coefficient of variation of daily APY over the history window.
+    
+    Returns None without HISTORY_MIN_DAYS of history or a positive mean.
+    """
+    if points is None:
+        return None
+    
+    apy = points["apy"][-HISTORY_WINDOW_DAYS:].astype(np.float64)
+    apy = apy[~np.isnan(apy)]
+    if len(apy) < HISTORY_MIN_DAYS:
+        return None
+    
+    mean = apy.mean()
+    if mean <= 0:
+        return None
+    return float(apy.std() / mean)
+
+
+def calculate_window_volatility(stats: Optional[dict[str, float]]) -> Optional[float]:
+    """
+    Coefficient of variation from daily-bucketed PoolHistory window stats.
+    
+    Same rules as calculate_apy_volatility.
+    """
+    if stats is None or stats["count"] < HISTORY_MIN_DAYS or stats["mean"] <= 0:
+        return None
+    return stats["std"] / stats["mean"]
+
+
+def calculate_volatility_penalty(volatility: Optional[float]) -> float:
+    """
+    Points taken off the risk score for an unstable APY.
+    """
+    if volatility is None:
+        return 0.0
+    for threshold, penalty in VOLATILITY_PENALTIES:
+        if volatility >= threshold:
+            return penalty
+    return 0.0
+
+
 def calculate_cost_score(
     opportunity: YieldOpportunity,
     bridge_route: Optional[BridgeRoute],
@@ -248,6 +317,7 @@ def _generate_warnings(
     requires_bridge: bool,
     bridge_route: Optional[BridgeRoute],
     amount: float,
+    apy_volatility: Optional[float] = None,
 ) -> list[str]:
     """
     Generate risk warnings for the recommendation.
@@ -266,6 +336,12 @@ def _generate_warnings(
     if opportunity.apy > 50:
         warnings.append("Very high APY may not be sustainable")
     
+    if apy_volatility is not None and apy_volatility >= VOLATILITY_PENALTIES[0][0]:
+        warnings.append(
+            f"APY has been volatile over the last {HISTORY_WINDOW_DAYS} days "
+            f"(varies by ~{apy_volatility * 100:.0f}% around its mean)"
+        )
+    
     if str(opportunity.il_risk) in ["medium", "high", "ILRisk.MEDIUM", "ILRisk.HIGH"]:
         warnings.append(f"Impermanent loss risk: {opportunity.il_risk}")
     
@@ -345,6 +421,7 @@ def build_recommendation(
     bridge_route: Optional[BridgeRoute],
     gas_estimate: Optional[GasEstimate],
     risk_tolerance: RiskTolerance,
+    apy_volatility: Optional[float] = None,
 ) -> Recommendation:
     """
     Build a complete recommendation with projections and reasoning.
@@ -379,6 +456,7 @@ def build_recommendation(
         requires_bridge,
         bridge_route,
         amount,
+        apy_volatility,
     )
     
     steps = _generate_execution_steps(
@@ -445,17 +523,17 @@ async def rank_opportunities_async(state: AgentState) -> dict[str, Any]:
         gas_estimates = {}
         warnings.append("Could not fetch gas estimates")
     
-    route_map: dict[str, BridgeRoute] = {}
+    route_map: dict[int, BridgeRoute] = {}
     for route in bridge_routes:
-        route_map[route.to_chain.lower()] = route
+        route_map[CHAINS.code(route.to_chain)] = route
     
-    scored_opportunities: list[tuple[float, YieldOpportunity]] = []
+    scored_opportunities: list[tuple[float, YieldOpportunity, tuple[float, ...]]] = []
     
     for opp in opportunities:
-        chain_lower = opp.chain.lower()
+        chain_code = CHAINS.code(opp.chain)
         
-        bridge_route = route_map.get(chain_lower)
-        gas_estimate = gas_estimates.get(chain_lower)
+        bridge_route = route_map.get(chain_code)
+        gas_estimate = gas_estimates.get(CHAINS.label(chain_code))
         
         apy_score = calculate_apy_score(opp.apy, risk_tolerance)
         tvl_score = calculate_tvl_score(opp.tvl_usd)
@@ -466,16 +544,74 @@ async def rank_opportunities_async(state: AgentState) -> dict[str, Any]:
             apy_score, tvl_score, risk_score, cost_score, risk_tolerance
         )
         
-        scored_opportunities.append((composite, opp))
+        scored_opportunities.append(
+            (composite, opp, (apy_score, tvl_score, risk_score, cost_score))
+        )
     
     scored_opportunities.sort(key=lambda x: x[0], reverse=True)
     
+    # Rescore the shortlist with its APY history: recorded locally where
+    # it is long enough, otherwise fetched from /chart in one batch.
+    shortlist = scored_opportunities[:HISTORY_CANDIDATES]
+    recorded = _recorded_volatilities([opp for _, opp, _ in shortlist])
+    histories = await _fetch_histories(
+        [opp for _, opp, _ in shortlist if opp.pool_id not in recorded], warnings
+    )
+    volatilities: dict[str, float] = {}
+    
+    for i, (composite, opp, scores) in enumerate(shortlist):
+        volatility = recorded.get(opp.pool_id)
+        if volatility is None:
+            volatility = calculate_apy_volatility(histories.get(opp.pool_id))
+        if volatility is None:
+            continue
+        volatilities[opp.pool_id] = volatility
+        
+        penalty = calculate_volatility_penalty(volatility)
+        if penalty:
+            apy_score, tvl_score, risk_score, cost_score = scores
+            composite = calculate_composite_score(
+                apy_score, tvl_score, max(0, risk_score - penalty), cost_score, risk_tolerance
+            )
+            scored_opportunities[i] = (composite, opp, scores)
+    
+    if volatilities:
+        scored_opportunities.sort(key=lambda x: x[0], reverse=True)
+    
+    # Every candidate so far was costed with modeled routes where the
+    # cost curves had them; only the top few get live quotes.
+    confirmed = await _confirm_modeled_routes(
+        [opp for _, opp, _ in scored_opportunities[:LIVE_QUOTE_CANDIDATES]],
+        route_map,
+        current_chain,
+        token,
+        amount,
+        warnings,
+    )
+    
+    if confirmed:
+        for i, (composite, opp, scores) in enumerate(scored_opportunities):
+            chain_code = CHAINS.code(opp.chain)
+            if chain_code not in confirmed:
+                continue
+            apy_score, tvl_score, risk_score, _ = scores
+            cost_score = calculate_cost_score(
+                opp, route_map[chain_code], gas_estimates.get(CHAINS.label(chain_code)), amount
+            )
+            penalty = calculate_volatility_penalty(volatilities.get(opp.pool_id))
+            composite = calculate_composite_score(
+                apy_score, tvl_score, max(0, risk_score - penalty), cost_score, risk_tolerance
+            )
+            scores = (apy_score, tvl_score, risk_score, cost_score)
+            scored_opportunities[i] = (composite, opp, scores)
+        scored_opportunities.sort(key=lambda x: x[0], reverse=True)
+    
     recommendations: list[Recommendation] = []
     
-    for rank, (score, opp) in enumerate(scored_opportunities[:MAX_RECOMMENDATIONS], 1):
-        chain_lower = opp.chain.lower()
-        bridge_route = route_map.get(chain_lower)
-        gas_estimate = gas_estimates.get(chain_lower)
+    for rank, (score, opp, _) in enumerate(scored_opportunities[:MAX_RECOMMENDATIONS], 1):
+        chain_code = CHAINS.code(opp.chain)
+        bridge_route = route_map.get(chain_code)
+        gas_estimate = gas_estimates.get(CHAINS.label(chain_code))
         
         rec = build_recommendation(
             rank=rank,
@@ -485,6 +621,7 @@ async def rank_opportunities_async(state: AgentState) -> dict[str, Any]:
             bridge_route=bridge_route,
             gas_estimate=gas_estimate,
             risk_tolerance=risk_tolerance,
+            apy_volatility=volatilities.get(opp.pool_id),
         )
         
         recommendations.append(rec)
@@ -497,6 +634,107 @@ async def rank_opportunities_async(state: AgentState) -> dict[str, Any]:
     }
 
 
+def _recorded_volatilities(opportunities: list[YieldOpportunity]) -> dict[str, float]:
+    """
+    APY volatility from the pool cache's recorded history, for the pools it covers.
+    """
+    if not opportunities:
+        return {}
+    
+    history = get_pool_cache().history
+    if history is None:
+        return {}
+    
+    try:
+        window = history.window(
+            "apy",
+            HISTORY_WINDOW_DAYS * DAY_SECONDS,
+            pool_ids=[opp.pool_id for opp in opportunities],
+            bucket_seconds=DAY_SECONDS,
+        )
+    except Exception:
+        return {}
+    
+    volatilities = {}
+    for pool_id in window.pool_ids:
+        volatility = calculate_window_volatility(window.get(pool_id))
+        if volatility is not None:
+            volatilities[pool_id] = volatility
+    return volatilities
+
+
+async def _fetch_histories(
+    opportunities: list[YieldOpportunity],
+    warnings: list[str],
+) -> dict[str, np.ndarray]:
+    """
+    Daily history for a shortlist, empty if it cannot be fetched.
+    """
+    if not opportunities:
+        return {}
+    
+    try:
+        return await get_pool_charts([opp.pool_id for opp in opportunities])
+    except Exception:
+        warnings.append("Could not fetch pool history")
+        return {}
+
+
+async def _confirm_modeled_routes(
+    opportunities: list[YieldOpportunity],
+    route_map: dict[int, BridgeRoute],
+    current_chain: Optional[str],
+    token: str,
+    amount: float,
+    warnings: list[str],
+) -> set[int]:
+    """
+    Replace the modeled routes to these opportunities' chains with live quotes.
+    
+    Live quotes are also checked against their cost curves. A chain
+    whose quote fails keeps its modeled route.
+    
+    Returns:
+        Chain codes whose route in route_map was replaced
+    """
+    chains: dict[int, str] = {}
+    for opp in opportunities:
+        chain_code = CHAINS.code(opp.chain)
+        route = route_map.get(chain_code)
+        if route is not None and route.cost_error_usd is not None:
+            chains.setdefault(chain_code, route.to_chain)
+    
+    if not chains or not current_chain:
+        return set()
+    
+    try:
+        # Live only: a cached quote is not a confirmation, and the
+        # client checks each live quote against its cost curve.
+        async with LiFiClient(
+            api_key=os.getenv("LIFI_API_KEY"), observer=COST_MODEL.observe
+        ) as client:
+            results = await client.get_routes_many(
+                from_chain=current_chain,
+                to_chains=list(chains.values()),
+                from_token=token,
+                to_token=token,
+                amount=amount,
+                cached=False,
+            )
+    except Exception:
+        warnings.append("Could not confirm modeled bridge costs")
+        return set()
+    
+    confirmed: set[int] = set()
+    for chain_code, to_chain in chains.items():
+        routes = results.get(to_chain)
+        if isinstance(routes, list) and routes:
+            route_map[chain_code] = routes[0]
+            confirmed.add(chain_code)
+    
+    return confirmed
+
+
 def rank_opportunities(state: AgentState) -> dict[str, Any]:
     """
     LangGraph node: Rank opportunities and build recommendations.
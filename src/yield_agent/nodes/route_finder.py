@@ -3,7 +3,10 @@
     ROUTE FINDER NODE
     Determines optimal bridge routes for cross-chain yield opportunities
     
-    Uses LI.FI to find the best paths between chains.
+    Uses LI.FI to find the best paths between chains. Routes are read
+    from the published routes, the fitted cost curves and the
+    background route matrix first; only the destinations none of them
+    holds are quoted live.
 ================================================================================
 """
 
@@ -20,9 +23,14 @@ from yield_agent.state import (
     SUPPORTED_CHAINS,
 )
 from yield_agent.tools.lifi_client import (
+    ROUTE_BOARD,
     LiFiClient,
     get_best_bridge_route,
+    route_key,
 )
+from yield_agent.tools.route_costs import COST_MODEL
+from yield_agent.tools.route_matrix import ROUTE_MATRIX
+from yield_agent.tools.vocabulary import CHAINS
 
 
 # ==============================================================================
@@ -68,23 +76,27 @@ def get_unique_target_chains(
 ) -> list[str]:
     """
     Get unique chains from top opportunities that need bridging.
+    
+    Chains are compared as CHAINS codes and returned lowercased.
     """
-    seen: set[str] = set()
+    seen: set[int] = set()
     chains: list[str] = []
     
-    current_lower = current_chain.lower() if current_chain else None
+    codes = [CHAINS.code(opp.chain) for opp in opportunities]
     
-    for opp in opportunities:
-        chain = opp.chain.lower()
-        
-        if chain in seen:
+    # Looked up after coding the opportunities' chains, so a current chain
+    # that matches any of them has a code.
+    current_code = CHAINS.lookup(current_chain) if current_chain else None
+    
+    for code in codes:
+        if code in seen:
             continue
         
-        if current_lower and chain == current_lower:
+        if code == current_code:
             continue
         
-        seen.add(chain)
-        chains.append(chain)
+        seen.add(code)
+        chains.append(CHAINS.label(code))
         
         if len(chains) >= limit:
             break
@@ -150,7 +162,6 @@ async def find_routes_async(state: AgentState) -> dict[str, Any]:
     opportunities = state.yield_opportunities
     
     warnings: list[str] = list(state.warnings) if state.warnings else []
-    routes: list[BridgeRoute] = []
     
     if not current_chain:
         return {
@@ -172,6 +183,28 @@ async def find_routes_async(state: AgentState) -> dict[str, Any]:
         limit=MAX_ROUTES_TO_FETCH,
     )
     
+    return await find_routes_to(current_chain, target_chains, token, amount, warnings)
+
+
+async def find_routes_to(
+    current_chain: str,
+    target_chains: list[str],
+    token: str,
+    amount: float,
+    warnings: list[str],
+) -> dict[str, Any]:
+    """
+    Find routes from the current chain to each target chain.
+    
+    Each destination is answered from ROUTE_BOARD (this exact transfer),
+    then COST_MODEL (a modeled route, with cost_error_usd set), then
+    ROUTE_MATRIX (nearest reference amount, rescaled); the rest are
+    quoted live from LI.FI concurrently, and checked against their
+    cost curves.
+    
+    Returns:
+        Node update with the routes, led by the same-chain route
+    """
     if not target_chains:
         same_chain_route = create_same_chain_route(
             current_chain, token, amount
@@ -182,32 +215,53 @@ async def find_routes_async(state: AgentState) -> dict[str, Any]:
             "warnings": warnings,
         }
     
+    found: dict[str, BridgeRoute] = {}
+    pending: list[str] = []
+    
+    for target_chain in target_chains:
+        published = ROUTE_BOARD.get(route_key(current_chain, target_chain, token, amount))
+        if not published:
+            published = COST_MODEL.route(current_chain, target_chain, token, amount)
+        if not published:
+            published = ROUTE_MATRIX.lookup(current_chain, target_chain, token, amount)
+        if published:
+            found[target_chain] = published
+        else:
+            pending.append(target_chain)
+    
     lifi_api_key = os.getenv("LIFI_API_KEY")
     
     try:
-        async with LiFiClient(api_key=lifi_api_key) as client:
-            for target_chain in target_chains:
-                try:
-                    route_options = await client.get_routes(
-                        from_chain=current_chain,
-                        to_chain=target_chain,
-                        from_token=token,
-                        to_token=token,
-                        amount=amount,
+        if pending:
+            # All destinations in flight at once; one failing or slow
+            # destination only costs its own route. Only live quotes,
+            # not cached ones, are checked against the cost curves.
+            async with LiFiClient(api_key=lifi_api_key, observer=COST_MODEL.observe) as client:
+                results = await client.get_routes_many(
+                    from_chain=current_chain,
+                    to_chains=pending,
+                    from_token=token,
+                    to_token=token,
+                    amount=amount,
+                )
+            
+            for target_chain in pending:
+                route_options = results[target_chain]
+                
+                if isinstance(route_options, Exception):
+                    warnings.append(
+                        f"Failed to get route to {target_chain}: {str(route_options)}"
                     )
-                    
-                    if route_options:
-                        routes.append(route_options[0])
-                    else:
-                        warnings.append(
-                            f"No bridge route found from {current_chain} to {target_chain}"
-                        )
-                        
-                except Exception as e:
+                elif route_options:
+                    found[target_chain] = route_options[0]
+                    ROUTE_BOARD.publish(
+                        route_key(current_chain, target_chain, token, amount),
+                        route_options[0],
+                    )
+                else:
                     warnings.append(
-                        f"Failed to get route to {target_chain}: {str(e)}"
+                        f"No bridge route found from {current_chain} to {target_chain}"
                     )
-                    continue
                     
     except Exception as e:
         return {
@@ -217,6 +271,8 @@ async def find_routes_async(state: AgentState) -> dict[str, Any]:
             "warnings": warnings + ["Could not connect to LI.FI API"],
         }
     
+    routes = [found[chain] for chain in target_chains if chain in found]
+    
     if current_chain:
         same_chain_route = create_same_chain_route(
             current_chain, token, amount
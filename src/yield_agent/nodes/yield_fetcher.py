@@ -3,14 +3,18 @@
     YIELD FETCHER NODE
     Retrieves yield opportunities from DeFiLlama
     
-    Fetches, filters, and prepares yield data for ranking.
+    Fetches, filters, and prepares yield data for ranking. Filtering
+    and sorting run on lightweight PoolCandidate rows; YieldOpportunity
+    models are built only for the pools that leave the node.
 ================================================================================
 """
 
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Optional
+from typing import Any, Optional, TypeVar
+
+import numpy as np
 
 from yield_agent.state import (
     AgentState,
@@ -20,9 +24,13 @@ from yield_agent.state import (
 )
 from yield_agent.tools.defillama_client import (
     DeFiLlamaClient,
-    get_top_yields,
-    search_yield_opportunities,
+    PoolCandidate,
+    get_top_yield_candidates,
+    materialize_opportunities,
+    search_yield_candidates,
 )
+from yield_agent.tools.pool_identity import dedupe_pools
+from yield_agent.tools.token_taxonomy import TOKENS
 
 
 # ==============================================================================
@@ -48,6 +56,9 @@ MAX_POOLS_PER_CHAIN = 30
 
 MAX_TOTAL_POOLS = 100
 
+# Filters accept models or candidates; both expose the fields they read.
+PoolRow = TypeVar("PoolRow", YieldOpportunity, PoolCandidate)
+
 
 # ==============================================================================
 # FILTER FUNCTIONS
@@ -55,9 +66,9 @@ MAX_TOTAL_POOLS = 100
 
 
 def filter_by_risk_tolerance(
-    opportunities: list[YieldOpportunity],
+    opportunities: list[PoolRow],
     risk_tolerance: RiskTolerance,
-) -> list[YieldOpportunity]:
+) -> list[PoolRow]:
     """
     Filter opportunities based on user's risk tolerance.
     
@@ -68,7 +79,7 @@ def filter_by_risk_tolerance(
     min_tvl = MIN_TVL_BY_RISK.get(risk_tolerance, MIN_TVL_BY_RISK[RiskTolerance.MODERATE])
     max_apy = MAX_APY_BY_RISK.get(risk_tolerance, MAX_APY_BY_RISK[RiskTolerance.MODERATE])
     
-    filtered: list[YieldOpportunity] = []
+    filtered: list[PoolRow] = []
     
     for opp in opportunities:
         if opp.tvl_usd < min_tvl:
@@ -93,82 +104,92 @@ def filter_by_risk_tolerance(
 
 
 def filter_by_token(
-    opportunities: list[YieldOpportunity],
+    opportunities: list[PoolRow],
     token: str,
-) -> list[YieldOpportunity]:
+) -> list[PoolRow]:
     """
     Filter opportunities that accept the specified token.
-    """
-    token_upper = token.upper()
     
-    filtered: list[YieldOpportunity] = []
-    
-    for opp in opportunities:
-        symbol_upper = opp.symbol.upper()
-        
-        if token_upper in symbol_upper:
-            filtered.append(opp)
-            continue
-        
-        if token_upper in ["USDC", "USDT", "DAI"]:
-            if any(stable in symbol_upper for stable in ["USDC", "USDT", "DAI", "USD"]):
-                filtered.append(opp)
-                continue
-        
-        if token_upper in ["ETH", "WETH"]:
-            if any(eth in symbol_upper for eth in ["ETH", "WETH", "STETH", "RETH"]):
-                filtered.append(opp)
-                continue
+    Tokens are compared as TOKENS canonical tokens, from pool symbols
+    and underlying addresses. USDC, USDT and DAI accept any stablecoin
+    pool, and ETH or WETH any pool of ETH or its staking tokens.
+    Candidates carry their mask from the snapshot table; models are
+    resolved from their symbol and underlying tokens.
+    """
+    query = TOKENS.query_mask(token)
+    
+    if query is None:
+        # No mask bit for this token: match whole symbol components.
+        wanted = TOKENS.canonical(token)
+        return [
+            opp for opp in opportunities
+            if any(t == wanted for t, _ in TOKENS.components(opp.symbol))
+        ]
+    
+    masks = np.fromiter(
+        (_token_mask(opp) for opp in opportunities),
+        dtype=np.uint64,
+        count=len(opportunities),
+    )
+    keep = (masks & np.uint64(query)) != 0
     
-    return filtered
+    return [opp for opp, kept in zip(opportunities, keep.tolist()) if kept]
+
+
+def _token_mask(opp: PoolRow) -> int:
+    """Token taxonomy mask of a candidate or model."""
+    if isinstance(opp, PoolCandidate):
+        return opp.token_mask
+    return TOKENS.pool_mask(opp.symbol, opp.underlying_tokens)
 
 
 def filter_excluded_protocols(
-    opportunities: list[YieldOpportunity],
+    opportunities: list[PoolRow],
     excluded: list[str],
-) -> list[YieldOpportunity]:
+) -> list[PoolRow]:
     """
     Remove opportunities from excluded protocols.
+    
+    Names are matched case-insensitively against the protocol name or
+    slug.
     """
     if not excluded:
         return opportunities
     
-    excluded_lower = [e.lower() for e in excluded]
+    # Plain strings: coding every project name into a process-wide
+    # vocabulary would grow it with each request's listings.
+    excluded_lower = {e.lower() for e in excluded}
     
     return [
         opp for opp in opportunities
         if opp.protocol.lower() not in excluded_lower
-        and opp.protocol_slug not in excluded_lower
+        and opp.protocol_slug.lower() not in excluded_lower
     ]
 
 
 def deduplicate_opportunities(
-    opportunities: list[YieldOpportunity],
-) -> list[YieldOpportunity]:
-    """
-    Remove duplicate pools based on pool_id.
+    opportunities: list[PoolRow],
+) -> list[PoolRow]:
     """
-    seen: set[str] = set()
-    unique: list[YieldOpportunity] = []
+    Collapse repeated pools and known wrapper listings into one.
     
-    for opp in opportunities:
-        if opp.pool_id not in seen:
-            seen.add(opp.pool_id)
-            unique.append(opp)
-    
-    return unique
+    Pools are grouped by project slug and pool id, and a wrapper
+    listing joins the pool it wraps (see pool_identity); the
+    highest-TVL listing represents each group.
+    """
+    return dedupe_pools(opportunities)
 
 
 def sort_opportunities(
-    opportunities: list[YieldOpportunity],
+    opportunities: list[PoolRow],
     risk_tolerance: RiskTolerance,
-) -> list[YieldOpportunity]:
+) -> list[PoolRow]:
     """
     Sort opportunities by a composite score.
     
     Score considers APY, TVL, and risk based on user preference.
     """
-    def calculate_score(opp: YieldOpportunity) -> float:
+    def calculate_score(opp: PoolRow) -> float:
         apy_score = min(opp.apy / 10, 10)
         
         if opp.tvl_usd >= 1_000_000_000:
@@ -217,13 +238,13 @@ async def fetch_yields_async(state: AgentState) -> dict[str, Any]:
     
     try:
         if state.token:
-            opportunities = await search_yield_opportunities(
+            candidates = await search_yield_candidates(
                 token=state.token,
                 chains=target_chains,
                 min_tvl=min_tvl * 0.5,
             )
         else:
-            opportunities = await get_top_yields(
+            candidates = await get_top_yield_candidates(
                 chains=target_chains,
                 min_tvl=min_tvl,
                 min_apy=MIN_APY_THRESHOLD,
@@ -238,28 +259,30 @@ async def fetch_yields_async(state: AgentState) -> dict[str, Any]:
             "warnings": ["Could not connect to DeFiLlama API"],
         }
     
-    if not opportunities:
+    if not candidates:
         return {
             "yield_opportunities": [],
             "processing_step": "no_yields_found",
             "warnings": ["No yield opportunities found matching your criteria"],
         }
     
-    opportunities = deduplicate_opportunities(opportunities)
-    
-    opportunities = filter_by_risk_tolerance(opportunities, risk_tolerance)
+    candidates = filter_by_risk_tolerance(candidates, risk_tolerance)
     
     if state.token:
-        opportunities = filter_by_token(opportunities, state.token)
+        candidates = filter_by_token(candidates, state.token)
     
     if state.excluded_protocols:
-        opportunities = filter_excluded_protocols(
-            opportunities, state.excluded_protocols
+        candidates = filter_excluded_protocols(
+            candidates, state.excluded_protocols
         )
     
-    opportunities = sort_opportunities(opportunities, risk_tolerance)
+    # After filtering, so a listing that fails a filter cannot stand in
+    # for a wrapped pool that passes it.
+    candidates = deduplicate_opportunities(candidates)
+    
+    candidates = sort_opportunities(candidates, risk_tolerance)
     
-    opportunities = opportunities[:MAX_TOTAL_POOLS]
+    opportunities = materialize_opportunities(candidates[:MAX_TOTAL_POOLS])
     
     if len(opportunities) == 0:
         warnings.append(
@@ -0,0 +1,274 @@
+"""
+================================================================================
+    BACKGROUND REFRESHER
+    Keeps shared data snapshots warm off the request path
+
+    Owned by the server lifespan. Each job refreshes one upstream on a
+    jittered interval, so replicas started together do not poll in
+    lockstep, and backs off exponentially while its upstream fails.
+    Request handlers never wait on these jobs; they read whatever was
+    last published.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from yield_agent.tools.gas_client import refresh_gas_estimates
+from yield_agent.tools.lifi_client import refresh_popular_routes
+from yield_agent.tools.pool_cache import CACHE_TTL_SECONDS, get_pool_cache
+from yield_agent.tools.route_costs import refresh_cost_curves
+from yield_agent.tools.token_registry import get_token_registry
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "true").lower() == "true"
+
+# Pools refresh ahead of the cache TTL so requests never see it expire.
+REFRESH_POOLS_SECONDS = float(os.getenv("REFRESH_POOLS_SECONDS", CACHE_TTL_SECONDS * 0.8))
+REFRESH_GAS_SECONDS = float(os.getenv("REFRESH_GAS_SECONDS", 60))
+REFRESH_ROUTES_SECONDS = float(os.getenv("REFRESH_ROUTES_SECONDS", 180))
+REFRESH_ROUTE_MATRIX_SECONDS = float(os.getenv("REFRESH_ROUTE_MATRIX_SECONDS", 3600))
+REFRESH_ROUTE_DRIFT_SECONDS = float(os.getenv("REFRESH_ROUTE_DRIFT_SECONDS", 300))
+
+# The token registry downloads at most once per
+# TOKEN_REGISTRY_MAX_AGE_SECONDS; this is how often that is checked.
+REFRESH_TOKENS_SECONDS = float(os.getenv("REFRESH_TOKENS_SECONDS", 3600))
+
+# Each delay is scaled by a random factor in [1 - jitter, 1 + jitter].
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", 0.1))
+
+# First retry delay after a failure, doubled per consecutive failure.
+BACKOFF_BASE_SECONDS = 15.0
+BACKOFF_MAX_SECONDS = 900.0
+
+SHUTDOWN_TIMEOUT_SECONDS = 5.0
+
+
+# ==============================================================================
+# JOB CLASS
+# ==============================================================================
+
+
+class RefreshJob:
+    """
+    One periodically refreshed upstream.
+
+    Runs immediately on start, then every interval_seconds. After a
+    failure the next attempt waits backoff_base_seconds, doubling per
+    consecutive failure up to max_backoff_seconds, and returns to the
+    normal interval after the next success.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        refresh: Callable[[], Awaitable[Any]],
+        interval_seconds: float,
+        jitter: float = REFRESH_JITTER,
+        backoff_base_seconds: float = BACKOFF_BASE_SECONDS,
+        max_backoff_seconds: float = BACKOFF_MAX_SECONDS,
+        rng: Optional[random.Random] = None,
+    ):
+        self.name = name
+        self.refresh = refresh
+        self.interval_seconds = interval_seconds
+        self.jitter = jitter
+        self.backoff_base_seconds = backoff_base_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.rng = rng or random.Random()
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.next_delay_seconds: Optional[float] = None
+
+    def next_delay(self) -> float:
+        """Seconds until the next run, with backoff and jitter applied."""
+        if self.consecutive_failures:
+            delay = min(
+                self.max_backoff_seconds,
+                self.backoff_base_seconds * 2 ** (self.consecutive_failures - 1),
+            )
+        else:
+            delay = self.interval_seconds
+
+        delay *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        self.next_delay_seconds = delay
+        return delay
+
+    async def run_once(self) -> None:
+        """Run the refresh and record its outcome. Never raises, except on cancel."""
+        started = time.perf_counter()
+        self.runs += 1
+        try:
+            await self.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(e) or type(e).__name__
+            return
+        finally:
+            self.last_duration_seconds = round(time.perf_counter() - started, 3)
+
+        self.consecutive_failures = 0
+        self.last_success_at = time.time()
+
+    def stats(self) -> dict[str, Any]:
+        """Run counters and timing for this job."""
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+            "last_duration_seconds": self.last_duration_seconds,
+            "next_delay_seconds": (
+                round(self.next_delay_seconds, 1) if self.next_delay_seconds is not None else None
+            ),
+        }
+
+
+# ==============================================================================
+# REFRESHER CLASS
+# ==============================================================================
+
+
+class BackgroundRefresher:
+    """
+    Runs RefreshJobs as asyncio tasks until stopped.
+
+    Each job sleeps on a shared stop event rather than a bare sleep, so
+    stop() wakes every idle job at once; jobs caught mid-refresh get
+    shutdown_timeout to finish before they are cancelled.
+    """
+
+    def __init__(
+        self,
+        jobs: list[RefreshJob],
+        shutdown_timeout: float = SHUTDOWN_TIMEOUT_SECONDS,
+    ):
+        self.jobs = jobs
+        self.shutdown_timeout = shutdown_timeout
+        self._stopping: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start one task per job on the running event loop."""
+        if self.running:
+            return
+
+        self._stopping = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(job), name=f"refresh-{job.name}")
+            for job in self.jobs
+        ]
+
+    async def stop(self) -> None:
+        """Signal every job to stop and wait for them, cancelling stragglers."""
+        if not self._tasks:
+            return
+
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=self.shutdown_timeout)
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._tasks = []
+
+    def stats(self) -> dict[str, Any]:
+        """Per-job counters keyed by job name."""
+        return {job.name: job.stats() for job in self.jobs}
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    async def _run(self, job: RefreshJob) -> None:
+        stopping = self._stopping
+
+        while not stopping.is_set():
+            await job.run_once()
+
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=job.next_delay())
+            except asyncio.TimeoutError:
+                continue
+
+
+# ==============================================================================
+# DEFAULT JOBS
+# ==============================================================================
+
+
+async def refresh_pools() -> None:
+    """Download and publish a new DeFiLlama pool snapshot."""
+    await get_pool_cache().refresh()
+
+
+async def refresh_gas() -> None:
+    """Publish fresh gas estimates for every supported chain."""
+    await refresh_gas_estimates(api_key=os.getenv("BLOCKNATIVE_API_KEY"))
+
+
+async def refresh_routes() -> None:
+    """Re-quote the most requested bridge routes."""
+    await refresh_popular_routes(api_key=os.getenv("LIFI_API_KEY"))
+
+
+async def refresh_matrix() -> None:
+    """Re-quote the all-pairs route matrix and refit the cost curves."""
+    await refresh_cost_curves(api_key=os.getenv("LIFI_API_KEY"))
+
+
+async def refresh_drifted_routes() -> None:
+    """Re-sample the chain pairs whose cost curves drifted from live quotes."""
+    await refresh_cost_curves(api_key=os.getenv("LIFI_API_KEY"), drifted_only=True)
+
+
+async def refresh_tokens() -> None:
+    """Re-download the LI.FI token registry once it is a day old."""
+    await get_token_registry().refresh_if_stale()
+
+
+def create_refresher() -> BackgroundRefresher:
+    """
+    Build the refresher for pools, gas estimates, popular routes, the
+    route matrix and its cost curves, and the token registry.
+
+    Creating it also warm-starts the pool cache from disk, so the
+    saved snapshot is served while the first pool refresh runs.
+    """
+    get_pool_cache()
+
+    return BackgroundRefresher([
+        RefreshJob("pools", refresh_pools, REFRESH_POOLS_SECONDS),
+        RefreshJob("gas", refresh_gas, REFRESH_GAS_SECONDS),
+        RefreshJob("routes", refresh_routes, REFRESH_ROUTES_SECONDS),
+        RefreshJob("route_matrix", refresh_matrix, REFRESH_ROUTE_MATRIX_SECONDS),
+        RefreshJob("route_drift", refresh_drifted_routes, REFRESH_ROUTE_DRIFT_SECONDS),
+        RefreshJob("tokens", refresh_tokens, REFRESH_TOKENS_SECONDS),
+    ])
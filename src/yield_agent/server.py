@@ -6,15 +6,17 @@
 """
 
 import os
-from typing import Optional
+from typing import Any, Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi import FastAPI, HTTPException, Header, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from yield_agent.graph import create_yield_agent, run_agent_async
+from yield_agent.refresher import REFRESH_ENABLED, create_refresher
 from yield_agent.state import AgentState, RiskTolerance
+from yield_agent.tools.pool_cache import get_pool_cache
 
 
 # ==============================================================================
@@ -64,6 +66,14 @@ class HealthResponse(BaseModel):
     version: str
 
 
+class ChangesResponse(BaseModel):
+    """Pool snapshot diffs since a given snapshot, oldest first."""
+    since: Optional[int]
+    latest_snapshot_id: Optional[int]
+    oldest_snapshot_id: Optional[int]
+    changes: list[dict[str, Any]]
+
+
 # ==============================================================================
 # FASTAPI APP
 # ==============================================================================
@@ -71,12 +81,23 @@ class HealthResponse(BaseModel):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize agent on startup."""
+    """Initialize agent and start the background refresher on startup."""
     print("Initializing Yield Intelligence Agent...")
     app.state.agent = create_yield_agent()
+    
+    app.state.refresher = None
+    if REFRESH_ENABLED:
+        app.state.refresher = create_refresher()
+        app.state.refresher.start()
+        print("Background refresher started")
+    
     print("Agent ready!")
     yield
     print("Shutting down...")
+    
+    if app.state.refresher:
+        await app.state.refresher.stop()
+        print("Background refresher stopped")
 
 
 app = FastAPI(
@@ -162,6 +183,61 @@ async def chat(request: AgentRequest):
     return await invoke_agent(request)
 
 
+@app.get("/changes", response_model=ChangesResponse, dependencies=[Depends(verify_api_key)])
+async def pool_changes(
+    since: Optional[int] = Query(
+        None, ge=0, description="Last pool snapshot id the client has seen"
+    ),
+):
+    """
+    Pool changes since a snapshot: added/removed pools and APY, TVL and
+    risk-score moves, one entry per snapshot refresh.
+    
+    Without ``since`` (or with 0) no changes are returned, only the
+    current ``latest_snapshot_id`` to poll from next; ids are null
+    until the first snapshot has loaded. Every response carries the
+    latest id and ``oldest_snapshot_id``, the oldest valid ``since``.
+    
+    Returns 410, with both ids in the detail, if the change log does
+    not reach back to ``since``; the client should then refetch
+    everything and continue from the latest id. Snapshot ids restart
+    with the process.
+    
+    Requires X-API-Key header for authentication.
+    """
+    changes = get_pool_cache().changes
+    
+    if not since:
+        oldest, latest = changes.bounds()
+        return ChangesResponse(
+            since=since,
+            latest_snapshot_id=latest,
+            oldest_snapshot_id=oldest,
+            changes=[],
+        )
+    
+    diffs = changes.since(since)
+    oldest, latest = changes.bounds()
+    if diffs is None:
+        raise HTTPException(
+            status_code=410,
+            detail={
+                "message": f"Changes since snapshot {since} are no longer available",
+                "latest_snapshot_id": latest,
+                "oldest_snapshot_id": oldest,
+            },
+        )
+    
+    # The latest id comes from the diffs returned, so a refresh landing
+    # in between is picked up by the next poll rather than skipped.
+    return ChangesResponse(
+        since=since,
+        latest_snapshot_id=diffs[-1].to_id if diffs else since,
+        oldest_snapshot_id=oldest,
+        changes=[diff.to_dict() for diff in diffs],
+    )
+
+
 # ==============================================================================
 # RUN SERVER
 # ==============================================================================
@@ -152,6 +152,11 @@ class BridgeRoute(BaseModel):
     estimated_output: float = Field(...)
     slippage_percent: float = Field(default=0.5)
     tx_data: Optional[dict[str, Any]] = Field(default=None)
+    cost_error_usd: Optional[float] = Field(
+        default=None,
+        description="Bound on modeled costs; None for quotes",
+    )
+
 
 class GasEstimate(BaseModel):
     chain: str = Field(...)
@@ -245,13 +250,11 @@ class AgentState(BaseModel):
 # ==============================================================================
 
 def merge_opportunities(existing, new):
-    seen_ids = {opp.pool_id for opp in existing}
-    merged = list(existing)
-    for opp in new:
-        if opp.pool_id not in seen_ids:
-            merged.append(opp)
-            seen_ids.add(opp.pool_id)
-    return merged
+    # Same identity as the fetcher's dedup stage, so repeated pools and
+    # known wrapper listings collapse here too.
+    from yield_agent.tools.pool_identity import dedupe_pools
+
+    return dedupe_pools(list(existing) + list(new))
 
 def merge_warnings(existing, new):
     return list(dict.fromkeys(existing + new))
@@ -6,13 +6,22 @@
     - DeFiLlama: Yield data from all major protocols
     - LI.FI: Cross-chain bridge routing
     - Gas: Real-time gas price estimation
+    - Pool cache: Process-wide DeFiLlama snapshot cache
 ================================================================================
 """
 
 from yield_agent.tools.defillama_client import (
     DeFiLlamaClient,
+    PoolCandidate,
     get_top_yields,
+    get_top_yield_candidates,
+    materialize_opportunities,
     search_yield_opportunities,
+    search_yield_candidates,
+)
+from yield_agent.tools.pool_cache import (
+    PoolSnapshotCache,
+    get_pool_cache,
 )
 from yield_agent.tools.lifi_client import (
     LiFiClient,
@@ -28,8 +37,14 @@ from yield_agent.tools.gas_client import (
 
 __all__ = [
     "DeFiLlamaClient",
+    "PoolCandidate",
     "get_top_yields",
+    "get_top_yield_candidates",
+    "materialize_opportunities",
     "search_yield_opportunities",
+    "search_yield_candidates",
+    "PoolSnapshotCache",
+    "get_pool_cache",
     "LiFiClient",
     "get_best_bridge_route",
     "get_all_bridge_routes",
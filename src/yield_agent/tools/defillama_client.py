@@ -11,17 +11,42 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import os
+import sys
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Iterable, Optional, Sequence
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+import msgspec
+import numpy as np
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
 from yield_agent.state import (
     ILRisk,
     SUPPORTED_CHAINS,
     YieldOpportunity,
 )
+from yield_agent.tools.pool_cache import (
+    NOT_MODIFIED,
+    SAME_CONTENT,
+    PoolDownload,
+    PoolsNotModified,
+    PoolValidators,
+    get_pool_cache,
+)
+from yield_agent.tools.pool_charts import decode_chart
+from yield_agent.tools.pool_records import (
+    SNAPSHOT_CHAINS,
+    SNAPSHOT_MIN_TVL_USD,
+    PoolRecord,
+    decode_pools,
+)
+from yield_agent.tools.pool_risk import IL_RISK_LEVELS, NO_IL_RISK
+from yield_agent.tools.pool_shards import PoolShard, build_shards, select_shards
+from yield_agent.tools.pool_stream import PoolStreamDecoder
+from yield_agent.tools.pool_table import PoolTable
+from yield_agent.tools.protocol_registry import get_protocol_registry
 
 
 # ==============================================================================
@@ -36,51 +61,43 @@ CHART_ENDPOINT = "/chart"
 
 REQUEST_TIMEOUT = 30.0
 
-KNOWN_AUDITED_PROTOCOLS = {
-    "aave-v3",
-    "aave-v2",
-    "compound-v3",
-    "compound-v2",
-    "lido",
-    "rocket-pool",
-    "maker",
-    "curve-dex",
-    "convex-finance",
-    "yearn-finance",
-    "uniswap-v3",
-    "uniswap-v2",
-    "sushiswap",
-    "balancer-v2",
-    "frax-ether",
-    "instadapp",
-    "morpho",
-    "spark",
-    "eigenlayer",
-    "pendle",
-    "gmx",
-    "radiant-v2",
-    "stargate",
-    "velodrome-v2",
-    "aerodrome",
-    "benqi",
-    "trader-joe",
-    "pancakeswap-amm-v3",
-}
-
-PROTOCOL_LAUNCH_DATES: dict[str, str] = {
-    "aave-v3": "2023-01-27",
-    "aave-v2": "2020-12-03",
-    "compound-v3": "2022-08-26",
-    "compound-v2": "2019-05-07",
-    "lido": "2020-12-18",
-    "rocket-pool": "2021-11-08",
-    "maker": "2017-12-18",
-    "curve-dex": "2020-01-20",
-    "convex-finance": "2021-05-17",
-    "yearn-finance": "2020-07-17",
-    "uniswap-v3": "2021-05-05",
-    "uniswap-v2": "2020-05-18",
-}
+# "stream" decodes /pools incrementally for the lowest peak memory;
+# "struct" buffers the body and decodes it in one msgspec pass, which
+# is several times faster. Conditional refreshes of a known body always
+# buffer it, so that an unchanged body is never decoded.
+POOL_DECODER = os.getenv("POOL_DECODER", "stream")
+
+
+# ==============================================================================
+# CANDIDATE ROWS
+# ==============================================================================
+
+
+class PoolCandidate(msgspec.Struct):
+    """
+    A pool that passed the coarse filter, not yet built into a model.
+
+    Carries the fields the yield fetcher filters and sorts on, under the
+    same names YieldOpportunity uses, so the filters accept either. Only
+    the candidates that leave the node are materialized.
+    """
+
+    pool: PoolRecord
+    chain: str
+    pool_id: str
+    protocol: str
+    protocol_slug: str
+    symbol: str
+    apy: float
+    tvl_usd: float
+    risk_score: float
+    il_risk: ILRisk
+    audited: bool
+    protocol_age_days: int
+    # Token taxonomy mask of the pool (see token_taxonomy).
+    token_mask: int = 0
+    # Prebuilt for the rare pools whose values needed pydantic to validate.
+    opportunity: Optional[YieldOpportunity] = None
 
 
 # ==============================================================================
@@ -96,9 +113,15 @@ class DeFiLlamaClient:
     from all major DeFi protocols across supported chains.
     """
 
-    def __init__(self, base_url: str = BASE_URL, timeout: float = REQUEST_TIMEOUT):
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        timeout: float = REQUEST_TIMEOUT,
+        use_cache: bool = True,
+    ):
         self.base_url = base_url
         self.timeout = timeout
+        self.use_cache = use_cache
         self._client: Optional[httpx.AsyncClient] = None
 
     async def __aenter__(self) -> DeFiLlamaClient:
@@ -119,20 +142,147 @@ class DeFiLlamaClient:
     # API METHODS
     # --------------------------------------------------------------------------
 
+    async def fetch_all_pools(self) -> Sequence[PoolRecord]:
+        """
+        Fetch all yield pools from DeFiLlama.
+        
+        Served from the process-wide snapshot cache unless the client
+        was created with use_cache=False or points at another base URL.
+        
+        Returns pool records projected to the fields the client reads.
+        """
+        if not self.use_cache or self.base_url != BASE_URL:
+            return await self.download_all_pools()
+        
+        snapshot = await get_pool_cache().get()
+        return snapshot.pools
+
+    async def download_all_pools(
+        self,
+        chains: Optional[list[str]] = SNAPSHOT_CHAINS,
+        min_tvl: float = SNAPSHOT_MIN_TVL_USD,
+    ) -> list[PoolRecord]:
+        """
+        Download yield pools from DeFiLlama, bypassing the cache.
+        
+        Decoded with the POOL_DECODER strategy. Pools outside the given
+        DeFiLlama chains or below min_tvl are dropped while decoding.
+        
+        Args:
+            chains: DeFiLlama chain names to keep (None = all chains)
+            min_tvl: Minimum TVL in USD
+            
+        Returns:
+            Pool records projected to the fields the client reads
+        """
+        download = await self.download_pools_if_changed(None, chains=chains, min_tvl=min_tvl)
+        return download.pools
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_not_exception_type(PoolsNotModified),
     )
-    async def fetch_all_pools(self) -> list[dict[str, Any]]:
+    async def download_pools_if_changed(
+        self,
+        validators: Optional[PoolValidators],
+        chains: Optional[list[str]] = SNAPSHOT_CHAINS,
+        min_tvl: float = SNAPSHOT_MIN_TVL_USD,
+    ) -> PoolDownload:
         """
-        Fetch all yield pools from DeFiLlama.
+        Download yield pools unless upstream still serves a known body.
+        
+        Sends If-None-Match / If-Modified-Since when the known body came
+        with an ETag / Last-Modified, and hashes every body it receives.
+        With known validators the body is buffered and hashed before
+        anything is decoded, whatever POOL_DECODER says, so a matching
+        hash skips decoding. Only unconditional downloads stream-decode.
+        
+        Args:
+            validators: Validators of the known body (None = always download)
+            chains: DeFiLlama chain names to keep (None = all chains)
+            min_tvl: Minimum TVL in USD
+            
+        Returns:
+            Pool records and the validators of their body
+            
+        Raises:
+            PoolsNotModified: On a 304 or a body with the known hash
+        """
+        url = f"{self.base_url}{POOL_ENDPOINT}"
+        headers = _conditional_headers(validators)
+        # The filter is hashed too: the same body filtered differently
+        # is a different snapshot.
+        hasher = hashlib.blake2b(repr((chains, min_tvl)).encode(), digest_size=16)
+        
+        if POOL_DECODER == "struct" or validators is not None:
+            response = await self.client.get(url, headers=headers)
+            _raise_if_not_modified(response, validators)
+            hasher.update(response.content)
+            current = _response_validators(response, hasher.hexdigest(), validators)
+            return PoolDownload(
+                decode_pools(response.content, chains=chains, min_tvl=min_tvl), current
+            )
+        
+        decoder = PoolStreamDecoder(chains=chains, min_tvl=min_tvl)
         
-        Returns raw pool data from the API.
+        async with self.client.stream("GET", url, headers=headers) as response:
+            _raise_if_not_modified(response, validators)
+            async for chunk in response.aiter_bytes():
+                hasher.update(chunk)
+                decoder.feed(chunk)
+        
+        current = _response_validators(response, hasher.hexdigest(), validators)
+        return PoolDownload(decoder.close(), current)
+
+    async def fetch_pool_table(self) -> PoolTable:
+        """
+        Fetch all yield pools as a columnar PoolTable.
+        
+        Cached snapshots carry a prebuilt table; uncached clients build
+        one from a fresh download.
         """
-        response = await self.client.get(f"{self.base_url}{POOL_ENDPOINT}")
+        if not self.use_cache or self.base_url != BASE_URL:
+            return PoolTable(await self.download_all_pools())
+        
+        snapshot = await get_pool_cache().get()
+        return snapshot.table
+
+    async def fetch_shards(
+        self, chains: Optional[Iterable[str]] = None
+    ) -> dict[str, PoolShard]:
+        """
+        Fetch the per-chain shards for some chains.
+        
+        Args:
+            chains: Chain identifiers (default: every supported chain)
+            
+        Returns:
+            Shards keyed by the requested identifiers; unsupported chains
+            and chains without pools are left out
+        """
+        if not self.use_cache or self.base_url != BASE_URL:
+            shards = build_shards(PoolTable(await self.download_all_pools()))
+        else:
+            shards = (await get_pool_cache().get()).shards
+        return select_shards(shards, chains)
+
+    async def fetch_pool_chart(self, pool_id: str) -> np.ndarray:
+        """
+        Fetch one pool's daily history from /chart/{pool}.
+        
+        Not retried: callers batch many pools and fall back to cached
+        history, so a retry would only stretch the batch.
+        
+        Args:
+            pool_id: DeFiLlama pool id
+            
+        Returns:
+            CHART_DTYPE points sorted by time
+        """
+        response = await self.client.get(f"{self.base_url}{CHART_ENDPOINT}/{pool_id}")
         response.raise_for_status()
-        data = response.json()
-        return data.get("data", [])
+        return decode_chart(response.content)
 
     async def fetch_pools_by_chain(
         self,
@@ -151,21 +301,27 @@ class DeFiLlamaClient:
         Returns:
             List of YieldOpportunity objects
         """
-        all_pools = await self.fetch_all_pools()
-        
-        chain_config = SUPPORTED_CHAINS.get(chain.lower())
-        if not chain_config:
+        return self.materialize(
+            await self.fetch_candidates_by_chain(chain, min_tvl, min_apy)
+        )
+
+    async def fetch_candidates_by_chain(
+        self,
+        chain: str,
+        min_tvl: float = 100_000,
+        min_apy: float = 0.1,
+    ) -> list[PoolCandidate]:
+        """Same selection as fetch_pools_by_chain, without building models."""
+        shard = (await self.fetch_shards([chain])).get(chain)
+        if shard is None:
             return []
         
-        defillama_chain = chain_config["defillama_slug"]
-        
+        table = shard.table
         filtered_pools = []
-        for pool in all_pools:
-            if self._matches_chain(pool, defillama_chain):
-                if self._meets_criteria(pool, min_tvl, min_apy):
-                    opportunity = self._parse_pool(pool, chain)
-                    if opportunity:
-                        filtered_pools.append(opportunity)
+        for row in np.flatnonzero(table.criteria_mask(min_tvl, min_apy)):
+            candidate = self._parse_candidate(table, row, chain)
+            if candidate:
+                filtered_pools.append(candidate)
         
         return filtered_pools
 
@@ -188,37 +344,50 @@ class DeFiLlamaClient:
         Returns:
             Combined list of YieldOpportunity objects
         """
-        all_pools = await self.fetch_all_pools()
-        
-        results: list[YieldOpportunity] = []
-        chain_counts: dict[str, int] = {c: 0 for c in chains}
-        
-        sorted_pools = sorted(
-            all_pools,
-            key=lambda p: (p.get("tvlUsd") or 0),
-            reverse=True,
+        return self.materialize(
+            await self.fetch_candidates_multi_chain(
+                chains, min_tvl, min_apy, max_results_per_chain
+            )
         )
+
+    async def fetch_candidates_multi_chain(
+        self,
+        chains: list[str],
+        min_tvl: float = 100_000,
+        min_apy: float = 0.1,
+        max_results_per_chain: int = 50,
+    ) -> list[PoolCandidate]:
+        """Same selection as fetch_pools_multi_chain, without building models."""
+        shards = await self.fetch_shards(chains)
+        
+        # (snapshot row, tvl, candidate); snapshot rows break TVL ties
+        # across shards the way a single table would.
+        selected: list[tuple[int, float, PoolCandidate]] = []
+        
+        for chain, shard in shards.items():
+            table = shard.table
+            rows = np.flatnonzero(table.criteria_mask(min_tvl, min_apy))
+            remaining = max_results_per_chain
+            
+            while remaining > 0 and len(rows):
+                top_rows = table.top_by_tvl(rows, remaining)
+                for row in top_rows:
+                    candidate = self._parse_candidate(table, row, chain)
+                    if candidate:
+                        selected.append(
+                            (int(shard.rows[row]), table.tvl_usd[row], candidate)
+                        )
+                        remaining -= 1
+                rows = np.setdiff1d(rows, top_rows, assume_unique=True)
+        
+        if not selected:
+            return []
         
-        for pool in sorted_pools:
-            for chain in chains:
-                chain_config = SUPPORTED_CHAINS.get(chain.lower())
-                if not chain_config:
-                    continue
-                    
-                defillama_chain = chain_config["defillama_slug"]
-                
-                if chain_counts[chain] >= max_results_per_chain:
-                    continue
-                    
-                if self._matches_chain(pool, defillama_chain):
-                    if self._meets_criteria(pool, min_tvl, min_apy):
-                        opportunity = self._parse_pool(pool, chain)
-                        if opportunity:
-                            results.append(opportunity)
-                            chain_counts[chain] += 1
-                        break
-        
-        return results
+        snapshot_rows = np.array([row for row, _, _ in selected])
+        tvl = np.array([value for _, value, _ in selected])
+        order = np.lexsort((snapshot_rows, -tvl))
+        
+        return [selected[i][2] for i in order]
 
     async def search_pools(
         self,
@@ -237,216 +406,135 @@ class DeFiLlamaClient:
         Returns:
             Matching YieldOpportunity objects
         """
-        all_pools = await self.fetch_all_pools()
-        query_lower = query.lower()
+        return self.materialize(await self.search_candidates(query, chains, min_tvl))
+
+    async def search_candidates(
+        self,
+        query: str,
+        chains: Optional[list[str]] = None,
+        min_tvl: float = 50_000,
+    ) -> list[PoolCandidate]:
+        """Same matches as search_pools, without building models."""
+        shards = await self.fetch_shards(chains or None)
         
-        results: list[YieldOpportunity] = []
+        matches: list[tuple[int, PoolCandidate]] = []
         
-        for pool in all_pools:
-            symbol = (pool.get("symbol") or "").lower()
-            project = (pool.get("project") or "").lower()
-            
-            if query_lower not in symbol and query_lower not in project:
-                continue
-            
-            tvl = pool.get("tvlUsd") or 0
-            if tvl < min_tvl:
-                continue
-            
-            pool_chain = (pool.get("chain") or "").lower()
-            
-            if chains:
-                chain_match = False
-                for chain in chains:
-                    chain_config = SUPPORTED_CHAINS.get(chain.lower())
-                    if chain_config:
-                        if pool_chain == chain_config["defillama_slug"].lower():
-                            chain_match = True
-                            opportunity = self._parse_pool(pool, chain)
-                            if opportunity:
-                                results.append(opportunity)
-                            break
-                if not chain_match:
-                    continue
-            else:
-                chain_key = self._get_chain_key(pool_chain)
-                if chain_key:
-                    opportunity = self._parse_pool(pool, chain_key)
-                    if opportunity:
-                        results.append(opportunity)
+        for chain, shard in shards.items():
+            table = shard.table
+            rows = table.search_rows(query)
+            rows = rows[table.tvl_usd[rows] >= min_tvl]
+            for row in rows:
+                candidate = self._parse_candidate(table, row, chain)
+                if candidate:
+                    matches.append((int(shard.rows[row]), candidate))
+        
+        # Snapshot row order first, so equal TVLs keep a single table's order.
+        matches.sort(key=lambda match: match[0])
+        results = [candidate for _, candidate in matches]
         
         return sorted(results, key=lambda x: x.tvl_usd, reverse=True)
 
+    def materialize(
+        self, candidates: Iterable[PoolCandidate]
+    ) -> list[YieldOpportunity]:
+        """
+        Build YieldOpportunity models for candidates, keeping their order.
+        
+        Args:
+            candidates: Candidates returned by the fetch/search methods
+            
+        Returns:
+            One model per candidate that validates
+        """
+        opportunities = []
+        for candidate in candidates:
+            opportunity = self._build_opportunity(candidate)
+            if opportunity:
+                opportunities.append(opportunity)
+        return opportunities
+
     # --------------------------------------------------------------------------
     # HELPER METHODS
     # --------------------------------------------------------------------------
 
-    def _matches_chain(self, pool: dict[str, Any], defillama_chain: str) -> bool:
-        """Check if pool matches the target chain."""
-        pool_chain = (pool.get("chain") or "").lower()
-        return pool_chain == defillama_chain.lower()
-
-    def _meets_criteria(
-        self, pool: dict[str, Any], min_tvl: float, min_apy: float
-    ) -> bool:
-        """Check if pool meets minimum criteria."""
-        tvl = pool.get("tvlUsd") or 0
-        apy = pool.get("apy") or 0
-        
-        if tvl < min_tvl:
-            return False
-        if apy < min_apy:
-            return False
-        if apy > 1000:
-            return False
-            
-        return True
-
-    def _parse_pool(
-        self, pool: dict[str, Any], chain: str
-    ) -> Optional[YieldOpportunity]:
-        """Parse raw pool data into YieldOpportunity."""
+    def _parse_candidate(
+        self, table: PoolTable, row: int, chain: str
+    ) -> Optional[PoolCandidate]:
+        """Read a row's filter and sort fields, or None if it cannot be parsed."""
+        il_code = table.il_risk_codes[row]
+        project_code = table.project_codes[row]
+        protocol_slug = table.project_slugs[project_code]
+        if il_code == NO_IL_RISK or protocol_slug is None:
+            return None
+        
+        pool = table.pools[row]
         try:
-            pool_id = pool.get("pool", "")
-            project = pool.get("project", "unknown")
-            symbol = pool.get("symbol", "")
-            
-            apy = pool.get("apy") or 0
-            apy_base = pool.get("apyBase") or 0
-            apy_reward = pool.get("apyReward") or 0
-            
-            tvl = pool.get("tvlUsd") or 0
-            
-            il_risk = self._calculate_il_risk(pool)
-            risk_score = self._calculate_risk_score(pool, il_risk)
-            
-            project_slug = project.lower().replace(" ", "-")
-            audited = project_slug in KNOWN_AUDITED_PROTOCOLS
-            
-            protocol_age = self._get_protocol_age(project_slug)
-            
-            pool_url = self._build_pool_url(project_slug, pool_id, chain)
-            
-            return YieldOpportunity(
-                pool_id=pool_id,
-                protocol=project,
-                protocol_slug=project_slug,
-                chain=chain,
-                pool_name=f"{project} {symbol}",
-                symbol=symbol,
-                underlying_tokens=pool.get("underlyingTokens") or [],
-                reward_tokens=(pool.get("rewardTokens") or "").split(", ") if pool.get("rewardTokens") else [],
-                apy=round(apy, 2),
-                apy_base=round(apy_base, 2),
-                apy_reward=round(apy_reward, 2),
-                apy_7d_avg=pool.get("apyMean7d"),
-                apy_30d_avg=pool.get("apyMean30d"),
-                tvl_usd=round(tvl, 2),
-                risk_score=risk_score,
-                il_risk=il_risk,
-                audited=audited,
-                audit_links=[],
-                protocol_age_days=protocol_age,
-                pool_url=pool_url,
-                last_updated=datetime.now(timezone.utc).isoformat(),
+            candidate = PoolCandidate(
+                pool=pool,
+                chain=sys.intern(chain),
+                pool_id=pool.pool or "",
+                protocol=table.project_names[project_code],
+                protocol_slug=protocol_slug,
+                symbol=table.symbol_names[table.symbol_codes[row]],
+                apy=round(pool.apy or 0, 2),
+                tvl_usd=round(pool.tvl_usd or 0, 2),
+                risk_score=float(table.risk_scores[row]),
+                il_risk=IL_RISK_LEVELS[il_code],
+                audited=bool(table.project_audited[project_code]),
+                protocol_age_days=table.protocol_age_days(row),
+                token_mask=int(table.token_masks[row]),
             )
         except Exception:
             return None
-
-    def _calculate_il_risk(self, pool: dict[str, Any]) -> ILRisk:
-        """Calculate impermanent loss risk based on pool type."""
-        symbol = (pool.get("symbol") or "").upper()
-        
-        stable_indicators = ["USD", "DAI", "FRAX", "LUSD", "USDT", "USDC"]
-        is_single = "-" not in symbol and "/" not in symbol
-        
-        if is_single:
-            return ILRisk.NONE
-        
-        tokens = symbol.replace("/", "-").split("-")
-        
-        stable_count = sum(
-            1 for t in tokens
-            if any(s in t.upper() for s in stable_indicators)
-        )
-        
-        if stable_count == len(tokens):
-            return ILRisk.LOW
-        
-        correlated_pairs = [
-            ("ETH", "STETH"), ("ETH", "WSTETH"), ("ETH", "RETH"),
-            ("ETH", "CBETH"), ("BTC", "WBTC"), ("BTC", "TBTC"),
-        ]
         
-        for t1, t2 in correlated_pairs:
-            if t1 in symbol.upper() and t2 in symbol.upper():
-                return ILRisk.MEDIUM
+        if _has_plain_values(candidate):
+            return candidate
+        if _has_negative_rate(candidate):
+            return None
         
-        if stable_count >= 1:
-            return ILRisk.MEDIUM
-            
-        return ILRisk.HIGH
+        # Unusual values: let the model decide, and keep it if it validates.
+        candidate.opportunity = self._build_opportunity(candidate)
+        return candidate if candidate.opportunity else None
 
-    def _calculate_risk_score(
-        self, pool: dict[str, Any], il_risk: ILRisk
-    ) -> float:
-        """
-        Calculate composite risk score from 1-10.
-        
-        Factors:
-        - TVL (higher = safer)
-        - Protocol reputation (audited = safer)
-        - APY sustainability (very high APY = riskier)
-        - Impermanent loss risk
-        """
-        score = 5.0
-        
-        tvl = pool.get("tvlUsd") or 0
-        if tvl > 1_000_000_000:
-            score -= 2.0
-        elif tvl > 100_000_000:
-            score -= 1.5
-        elif tvl > 10_000_000:
-            score -= 1.0
-        elif tvl > 1_000_000:
-            score -= 0.5
-        elif tvl < 500_000:
-            score += 1.0
-        
-        project_slug = (pool.get("project") or "").lower().replace(" ", "-")
-        if project_slug in KNOWN_AUDITED_PROTOCOLS:
-            score -= 1.5
-        
-        apy = pool.get("apy") or 0
-        if apy > 100:
-            score += 2.5
-        elif apy > 50:
-            score += 1.5
-        elif apy > 20:
-            score += 0.5
-        
-        il_adjustments = {
-            ILRisk.NONE: -0.5,
-            ILRisk.LOW: 0,
-            ILRisk.MEDIUM: 0.5,
-            ILRisk.HIGH: 1.5,
-        }
-        score += il_adjustments.get(il_risk, 0)
-        
-        return round(max(1.0, min(10.0, score)), 1)
-
-    def _get_protocol_age(self, project_slug: str) -> int:
-        """Get protocol age in days."""
-        launch_date_str = PROTOCOL_LAUNCH_DATES.get(project_slug)
-        if not launch_date_str:
-            return 0
+    def _build_opportunity(
+        self, candidate: PoolCandidate
+    ) -> Optional[YieldOpportunity]:
+        """Build the YieldOpportunity for a candidate."""
+        if candidate.opportunity is not None:
+            return candidate.opportunity
         
+        pool = candidate.pool
         try:
-            launch_date = datetime.strptime(launch_date_str, "%Y-%m-%d")
-            age = datetime.now() - launch_date
-            return age.days
-        except ValueError:
-            return 0
+            return YieldOpportunity(
+                pool_id=candidate.pool_id,
+                protocol=candidate.protocol,
+                protocol_slug=candidate.protocol_slug,
+                chain=candidate.chain,
+                pool_name=sys.intern(f"{candidate.protocol} {candidate.symbol}"),
+                symbol=candidate.symbol,
+                underlying_tokens=pool.underlying_tokens or [],
+                reward_tokens=(
+                    [sys.intern(token) for token in pool.reward_tokens.split(", ")]
+                    if pool.reward_tokens else []
+                ),
+                apy=candidate.apy,
+                apy_base=round(pool.apy_base or 0, 2),
+                apy_reward=round(pool.apy_reward or 0, 2),
+                apy_7d_avg=pool.apy_mean_7d,
+                apy_30d_avg=pool.apy_mean_30d,
+                tvl_usd=candidate.tvl_usd,
+                risk_score=candidate.risk_score,
+                il_risk=candidate.il_risk,
+                audited=candidate.audited,
+                audit_links=get_protocol_registry().audit_links(candidate.protocol_slug),
+                protocol_age_days=candidate.protocol_age_days,
+                pool_url=self._build_pool_url(
+                    candidate.protocol_slug, candidate.pool_id, candidate.chain
+                ),
+                last_updated=datetime.now(timezone.utc).isoformat(),
+            )
+        except Exception:
+            return None
 
     def _build_pool_url(
         self, project_slug: str, pool_id: str, chain: str
@@ -454,13 +542,96 @@ class DeFiLlamaClient:
         """Build URL to the pool on the protocol's site."""
         return f"https://defillama.com/yields/pool/{pool_id}"
 
-    def _get_chain_key(self, defillama_chain: str) -> Optional[str]:
-        """Get chain key from DeFiLlama chain name."""
-        defillama_lower = defillama_chain.lower()
-        for key, config in SUPPORTED_CHAINS.items():
-            if config["defillama_slug"].lower() == defillama_lower:
-                return key
-        return None
+
+# ==============================================================================
+# HELPER FUNCTIONS
+# ==============================================================================
+
+
+def _conditional_headers(validators: Optional[PoolValidators]) -> dict[str, str]:
+    """Request headers that let the server answer 304 for a known body."""
+    headers = {}
+    if validators is not None:
+        if validators.etag:
+            headers["If-None-Match"] = validators.etag
+        if validators.last_modified:
+            headers["If-Modified-Since"] = validators.last_modified
+    return headers
+
+
+def _raise_if_not_modified(
+    response: httpx.Response,
+    validators: Optional[PoolValidators],
+) -> None:
+    """Raise PoolsNotModified on a 304, and for any other error status."""
+    if response.status_code == 304 and validators is not None:
+        raise PoolsNotModified(NOT_MODIFIED, validators)
+    response.raise_for_status()
+
+
+def _response_validators(
+    response: httpx.Response,
+    content_hash: str,
+    known: Optional[PoolValidators],
+) -> PoolValidators:
+    """
+    Validators of a downloaded body.
+    
+    Raises:
+        PoolsNotModified: If the body has the known hash
+    """
+    current = PoolValidators(
+        content_hash,
+        etag=response.headers.get("etag"),
+        last_modified=response.headers.get("last-modified"),
+    )
+    if known is not None and content_hash == known.content_hash:
+        raise PoolsNotModified(SAME_CONTENT, current)
+    return current
+
+
+def _has_plain_values(candidate: PoolCandidate) -> bool:
+    """
+    Whether YieldOpportunity is sure to accept a candidate's values.
+    
+    Checks the shapes DeFiLlama normally sends; anything else (odd
+    types, negative rates) returns False and is left to pydantic.
+    """
+    pool = candidate.pool
+    underlying = pool.underlying_tokens
+    reward = pool.reward_tokens
+    
+    return (
+        type(candidate.pool_id) is str
+        and type(candidate.symbol) is str
+        and _is_non_negative(candidate.apy)
+        and _is_non_negative(candidate.tvl_usd)
+        and _is_non_negative(pool.apy_base or 0)
+        and _is_non_negative(pool.apy_reward or 0)
+        and (pool.apy_mean_7d is None or type(pool.apy_mean_7d) is float)
+        and (pool.apy_mean_30d is None or type(pool.apy_mean_30d) is float)
+        and (
+            not underlying
+            or type(underlying) is list and all(type(t) is str for t in underlying)
+        )
+        and (not reward or type(reward) is str)
+    )
+
+
+def _has_negative_rate(candidate: PoolCandidate) -> bool:
+    """Whether a rate or TVL is a number below zero, which the model rejects."""
+    pool = candidate.pool
+    return any(
+        type(value) in (int, float) and round(value, 2) < 0
+        for value in (
+            candidate.apy, candidate.tvl_usd, pool.apy_base or 0, pool.apy_reward or 0
+        )
+    )
+
+
+def _is_non_negative(value: Any) -> bool:
+    """A plain number that is still >= 0 after rounding to 2 decimals."""
+    return type(value) in (int, float) and round(value, 2) >= 0
 
 
 # ==============================================================================
@@ -468,6 +639,39 @@ class DeFiLlamaClient:
 # ==============================================================================
 
 
+async def download_pools() -> list[PoolRecord]:
+    """
+    Download a fresh /pools payload with a short-lived client.
+    
+    Used as the loader of the process-wide snapshot cache, which may
+    call it from any thread or event loop.
+    """
+    async with DeFiLlamaClient(use_cache=False) as client:
+        return await client.download_all_pools()
+
+
+async def download_pools_if_changed(
+    validators: Optional[PoolValidators] = None,
+) -> PoolDownload:
+    """
+    Conditionally download a fresh /pools payload with a short-lived client.
+    
+    The loader of the process-wide snapshot cache, which passes the
+    validators of its current snapshot. The protocol registry is
+    refreshed alongside when it is stale, so the table built from these
+    pools sees it.
+    
+    Raises:
+        PoolsNotModified: If upstream still serves that snapshot's body
+    """
+    async with DeFiLlamaClient(use_cache=False) as client:
+        _, download = await asyncio.gather(
+            get_protocol_registry().refresh_if_stale(client.client),
+            client.download_pools_if_changed(validators),
+        )
+        return download
+
+
 async def get_top_yields(
     chains: Optional[list[str]] = None,
     min_tvl: float = 100_000,
@@ -486,18 +690,30 @@ async def get_top_yields(
     Returns:
         List of top YieldOpportunity objects sorted by APY
     """
+    return materialize_opportunities(
+        await get_top_yield_candidates(chains, min_tvl, min_apy, limit)
+    )
+
+
+async def get_top_yield_candidates(
+    chains: Optional[list[str]] = None,
+    min_tvl: float = 100_000,
+    min_apy: float = 1.0,
+    limit: int = 20,
+) -> list[PoolCandidate]:
+    """Same selection as get_top_yields, as unmaterialized candidates."""
     if chains is None:
         chains = list(SUPPORTED_CHAINS.keys())
     
     async with DeFiLlamaClient() as client:
-        opportunities = await client.fetch_pools_multi_chain(
+        candidates = await client.fetch_candidates_multi_chain(
             chains=chains,
             min_tvl=min_tvl,
             min_apy=min_apy,
         )
     
-    sorted_opps = sorted(opportunities, key=lambda x: x.apy, reverse=True)
-    return sorted_opps[:limit]
+    sorted_candidates = sorted(candidates, key=lambda x: x.apy, reverse=True)
+    return sorted_candidates[:limit]
 
 
 async def search_yield_opportunities(
@@ -516,9 +732,35 @@ async def search_yield_opportunities(
     Returns:
         Matching opportunities sorted by TVL
     """
+    return materialize_opportunities(
+        await search_yield_candidates(token, chains, min_tvl)
+    )
+
+
+async def search_yield_candidates(
+    token: str,
+    chains: Optional[list[str]] = None,
+    min_tvl: float = 50_000,
+) -> list[PoolCandidate]:
+    """Same matches as search_yield_opportunities, as unmaterialized candidates."""
     async with DeFiLlamaClient() as client:
-        return await client.search_pools(
+        return await client.search_candidates(
             query=token,
             chains=chains,
             min_tvl=min_tvl,
         )
+
+
+def materialize_opportunities(
+    candidates: Iterable[PoolCandidate],
+) -> list[YieldOpportunity]:
+    """
+    Build YieldOpportunity models for the candidates that are kept.
+    
+    Args:
+        candidates: Final candidates, already filtered and sorted
+        
+    Returns:
+        Models in the same order
+    """
+    return DeFiLlamaClient().materialize(candidates)
@@ -10,6 +10,7 @@
 
 from __future__ import annotations
 
+import os
 from datetime import datetime, timezone
 from typing import Any, Optional
 
@@ -17,6 +18,7 @@ import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from yield_agent.state import GasEstimate, SUPPORTED_CHAINS
+from yield_agent.tools.snapshot_board import SnapshotBoard
 
 
 # ==============================================================================
@@ -28,6 +30,8 @@ BLOCKNATIVE_URL = "https://api.blocknative.com/gasprices/blockprices"
 
 REQUEST_TIMEOUT = 15.0
 
+GAS_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("GAS_SNAPSHOT_MAX_AGE_SECONDS", 180))
+
 GAS_UNITS = {
     "swap": 150_000,
     "deposit": 100_000,
@@ -62,6 +66,12 @@ NATIVE_TOKEN_PRICES: dict[str, float] = {
 }
 
 
+# Latest estimate per chain, published by the background refresher.
+GAS_BOARD: SnapshotBoard[str, GasEstimate] = SnapshotBoard(
+    "gas", max_age_seconds=GAS_SNAPSHOT_MAX_AGE_SECONDS
+)
+
+
 # ==============================================================================
 # CLIENT CLASS
 # ==============================================================================
@@ -334,6 +344,9 @@ async def get_gas_for_chains(
     """
     Get gas estimates for multiple chains.
     
+    Published estimates are served as-is; only chains without a fresh
+    one are fetched live, and those results are published in turn.
+    
     Args:
         chains: List of chain identifiers
         api_key: Optional Blocknative API key
@@ -341,8 +354,58 @@ async def get_gas_for_chains(
     Returns:
         Dictionary of chain to GasEstimate
     """
+    results: dict[str, Optional[GasEstimate]] = {
+        chain.lower(): GAS_BOARD.get(chain.lower()) for chain in chains
+    }
+    
+    missing = [chain for chain, estimate in results.items() if estimate is None]
+    if not missing:
+        return results
+    
     async with GasClient(api_key=api_key) as client:
-        return await client.get_gas_estimates_multi(chains)
+        fetched = await client.get_gas_estimates_multi(missing)
+    
+    for chain, estimate in fetched.items():
+        results[chain] = estimate
+        if estimate:
+            GAS_BOARD.publish(chain, estimate)
+    
+    return results
+
+
+async def refresh_gas_estimates(
+    chains: Optional[list[str]] = None,
+    api_key: Optional[str] = None,
+) -> int:
+    """
+    Fetch live gas estimates and publish them to GAS_BOARD.
+    
+    Args:
+        chains: Chains to refresh (None = all supported)
+        api_key: Optional Blocknative API key
+        
+    Returns:
+        Number of chains published
+        
+    Raises:
+        RuntimeError: If no chain returned an estimate
+    """
+    if chains is None:
+        chains = list(SUPPORTED_CHAINS.keys())
+    
+    async with GasClient(api_key=api_key) as client:
+        estimates = await client.get_gas_estimates_multi(chains)
+    
+    published = 0
+    for chain, estimate in estimates.items():
+        if estimate:
+            GAS_BOARD.publish(chain, estimate)
+            published += 1
+    
+    if not published:
+        raise RuntimeError("No gas estimates available from any chain")
+    
+    return published
 
 
 async def get_cheapest_chain(
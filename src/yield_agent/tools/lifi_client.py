@@ -10,12 +10,17 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional
+import asyncio
+import os
+from typing import Any, Callable, Iterable, Optional, Union
 
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from yield_agent.state import BridgeRoute, SUPPORTED_CHAINS
+from yield_agent.tools.route_cache import CacheKey, RouteCache
+from yield_agent.tools.snapshot_board import SnapshotBoard
+from yield_agent.tools.token_registry import get_token_registry
 
 
 # ==============================================================================
@@ -33,6 +38,23 @@ TOKENS_ENDPOINT = "/tokens"
 
 REQUEST_TIMEOUT = 30.0
 
+ROUTE_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("ROUTE_SNAPSHOT_MAX_AGE_SECONDS", 300))
+
+POPULAR_ROUTES_LIMIT = int(os.getenv("POPULAR_ROUTES_LIMIT", 20))
+
+# Route requests in flight at once per fan-out, and the time one
+# destination may take, retries included, before it is given up on.
+ROUTE_CONCURRENCY = int(os.getenv("ROUTE_CONCURRENCY", 6))
+ROUTE_CALL_TIMEOUT = float(os.getenv("ROUTE_CALL_TIMEOUT", 20))
+
+# Route cache: entries are fresh for ROUTE_CACHE_TTL_SECONDS and served
+# for ROUTE_CACHE_STALE_SECONDS more only when LI.FI fails; amounts
+# share an entry within 1/ROUTE_CACHE_BUCKETS_PER_DECADE of a decade.
+ROUTE_CACHE_TTL_SECONDS = float(os.getenv("ROUTE_CACHE_TTL_SECONDS", 120))
+ROUTE_CACHE_STALE_SECONDS = float(os.getenv("ROUTE_CACHE_STALE_SECONDS", 600))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", 2048))
+ROUTE_CACHE_BUCKETS_PER_DECADE = int(os.getenv("ROUTE_CACHE_BUCKETS_PER_DECADE", 8))
+
 NATIVE_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000"
 
 COMMON_TOKENS: dict[str, dict[str, str]] = {
@@ -75,6 +97,27 @@ COMMON_TOKENS: dict[str, dict[str, str]] = {
 }
 
 
+# (from_chain, to_chain, token, amount) of a requested transfer.
+RouteKey = tuple[str, str, str, float]
+
+# Routes to one destination, or the error that destination raised.
+RouteResult = Union[list[BridgeRoute], Exception]
+
+# Best route per requested transfer. Request handlers publish what they
+# fetch; the background refresher re-quotes the most requested keys.
+ROUTE_BOARD: SnapshotBoard[RouteKey, BridgeRoute] = SnapshotBoard(
+    "routes", max_age_seconds=ROUTE_SNAPSHOT_MAX_AGE_SECONDS
+)
+
+# Routes by chain pair, token and amount bucket, shared by all clients.
+ROUTE_CACHE = RouteCache(
+    ttl_seconds=ROUTE_CACHE_TTL_SECONDS,
+    stale_seconds=ROUTE_CACHE_STALE_SECONDS,
+    max_entries=ROUTE_CACHE_MAX_ENTRIES,
+    buckets_per_decade=ROUTE_CACHE_BUCKETS_PER_DECADE,
+)
+
+
 # ==============================================================================
 # CLIENT CLASS
 # ==============================================================================
@@ -85,7 +128,10 @@ class LiFiClient:
     Async client for LI.FI Bridge Aggregator API.
     
     Provides methods to find optimal bridge routes and get
-    quotes for cross-chain token transfers.
+    quotes for cross-chain token transfers. Routes are read through
+    ``cache`` (ROUTE_CACHE by default; None disables caching).
+    ``observer``, if given, is called with the best route of every
+    live /routes response, and never with routes the cache served.
     """
 
     def __init__(
@@ -93,10 +139,14 @@ class LiFiClient:
         api_key: Optional[str] = None,
         base_url: str = BASE_URL,
         timeout: float = REQUEST_TIMEOUT,
+        cache: Optional[RouteCache] = ROUTE_CACHE,
+        observer: Optional[Callable[[BridgeRoute], Any]] = None,
     ):
         self.api_key = api_key
         self.base_url = base_url
         self.timeout = timeout
+        self.cache = cache
+        self.observer = observer
         self._client: Optional[httpx.AsyncClient] = None
 
     async def __aenter__(self) -> LiFiClient:
@@ -120,10 +170,6 @@ class LiFiClient:
     # API METHODS
     # --------------------------------------------------------------------------
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-    )
     async def get_routes(
         self,
         from_chain: str,
@@ -133,10 +179,19 @@ class LiFiClient:
         amount: float,
         from_address: Optional[str] = None,
         slippage: float = 0.5,
+        cached: bool = True,
     ) -> list[BridgeRoute]:
         """
         Get available bridge routes between chains.
         
+        Same-token transfers without a wallet address at the default
+        slippage go through the route cache: a fresh entry for the
+        amount's bucket is returned rescaled to ``amount``, and every
+        live result is stored. If the live request fails, an expired
+        entry still within the stale window is served instead.
+        Cached routes never carry transaction data; use get_quote to
+        build a transaction.
+        
         Args:
             from_chain: Source chain identifier
             to_chain: Destination chain identifier
@@ -145,10 +200,57 @@ class LiFiClient:
             amount: Amount to bridge (in token units)
             from_address: User's wallet address (optional)
             slippage: Slippage tolerance percentage
+            cached: Whether the cache may answer the request; False
+                always requests live, and only refreshes the entry
             
         Returns:
             List of BridgeRoute options sorted by best value
         """
+        key = self._cache_key(
+            from_chain, to_chain, from_token, to_token, amount, from_address, slippage
+        )
+        
+        if key is not None and cached:
+            hit = self.cache.lookup(key, amount)
+            if hit is not None:
+                return hit
+        
+        await self._load_token_registry([(from_token, from_chain), (to_token, to_chain)])
+        
+        try:
+            routes = await self._request_routes(
+                from_chain, to_chain, from_token, to_token, amount, from_address, slippage
+            )
+        except Exception:
+            stale = None
+            if key is not None and cached:
+                stale = self.cache.serve_stale(key, amount)
+            if stale is None:
+                raise
+            return stale
+        
+        if key is not None and routes:
+            self.cache.store(key, routes, amount)
+        if self.observer is not None and routes:
+            self.observer(routes[0])
+        
+        return routes
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+    )
+    async def _request_routes(
+        self,
+        from_chain: str,
+        to_chain: str,
+        from_token: str,
+        to_token: str,
+        amount: float,
+        from_address: Optional[str],
+        slippage: float,
+    ) -> list[BridgeRoute]:
+        """POST a routes request to LI.FI, with retries."""
         from_chain_config = SUPPORTED_CHAINS.get(from_chain.lower())
         to_chain_config = SUPPORTED_CHAINS.get(to_chain.lower())
         
@@ -164,7 +266,7 @@ class LiFiClient:
         if not from_token_address or not to_token_address:
             return []
         
-        decimals = self._get_token_decimals(from_token)
+        decimals = self._get_token_decimals(from_token, from_chain)
         amount_wei = int(amount * (10 ** decimals))
         
         payload = {
@@ -194,11 +296,79 @@ class LiFiClient:
         routes = data.get("routes", [])
         
         return [
-            self._parse_route(route, from_chain, to_chain, from_token, amount)
+            self._parse_route(route, from_chain, to_chain, from_token, amount, to_token)
             for route in routes[:5]
             if route
         ]
 
+    async def get_routes_many(
+        self,
+        from_chain: str,
+        to_chains: Iterable[str],
+        from_token: str,
+        to_token: str,
+        amount: float,
+        concurrency: int = ROUTE_CONCURRENCY,
+        call_timeout: float = ROUTE_CALL_TIMEOUT,
+        cached: bool = True,
+    ) -> dict[str, RouteResult]:
+        """
+        Get routes from one chain to several destinations concurrently.
+        
+        At most ``concurrency`` destinations are requested at once, and
+        each is cut off after ``call_timeout`` seconds. A destination
+        that fails or times out does not affect the others, so the
+        whole call takes about as long as its slowest destination.
+        
+        Args:
+            from_chain: Source chain identifier
+            to_chains: Destination chain identifiers; duplicates are fetched once
+            from_token: Source token symbol or address
+            to_token: Destination token symbol or address
+            amount: Amount to bridge (in token units)
+            concurrency: Maximum requests in flight
+            call_timeout: Seconds allowed per destination, retries included
+            cached: Whether the route cache may answer (see get_routes)
+            
+        Returns:
+            Routes or the raised exception, per destination in request order
+        """
+        to_chains = list(dict.fromkeys(to_chains))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        # Load the registry once per fan-out rather than once per destination.
+        await self._load_token_registry(
+            [(from_token, from_chain)] + [(to_token, to_chain) for to_chain in to_chains]
+        )
+        
+        async def fetch(to_chain: str) -> list[BridgeRoute]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        self.get_routes(
+                            from_chain=from_chain,
+                            to_chain=to_chain,
+                            from_token=from_token,
+                            to_token=to_token,
+                            amount=amount,
+                            cached=cached,
+                        ),
+                        timeout=call_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"no response within {call_timeout:g}s") from None
+        
+        results = await asyncio.gather(
+            *(fetch(to_chain) for to_chain in to_chains), return_exceptions=True
+        )
+        
+        # Cancellation of the caller still propagates.
+        for result in results:
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+        
+        return dict(zip(to_chains, results))
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
@@ -217,6 +387,10 @@ class LiFiClient:
         """
         Get a specific quote with transaction data.
         
+        Always requested live, never from the route cache, so a route
+        that was shown from the cache is re-quoted before a transaction
+        is built for it.
+        
         Args:
             from_chain: Source chain identifier
             to_chain: Destination chain identifier
@@ -239,13 +413,14 @@ class LiFiClient:
         from_chain_id = from_chain_config["chain_id"]
         to_chain_id = to_chain_config["chain_id"]
         
+        await self._load_token_registry([(from_token, from_chain), (to_token, to_chain)])
         from_token_address = self._resolve_token_address(from_token, from_chain)
         to_token_address = self._resolve_token_address(to_token, to_chain)
         
         if not from_token_address or not to_token_address:
             return None
         
-        decimals = self._get_token_decimals(from_token)
+        decimals = self._get_token_decimals(from_token, from_chain)
         amount_wei = int(amount * (10 ** decimals))
         
         params = {
@@ -268,7 +443,7 @@ class LiFiClient:
             return None
         
         data = response.json()
-        return self._parse_quote(data, from_chain, to_chain, from_token, amount)
+        return self._parse_quote(data, from_chain, to_chain, from_token, amount, to_token)
 
     async def get_supported_chains(self) -> list[dict[str, Any]]:
         """Get list of chains supported by LI.FI."""
@@ -300,23 +475,69 @@ class LiFiClient:
     # HELPER METHODS
     # --------------------------------------------------------------------------
 
+    def _cache_key(
+        self,
+        from_chain: str,
+        to_chain: str,
+        from_token: str,
+        to_token: str,
+        amount: float,
+        from_address: Optional[str],
+        slippage: float,
+    ) -> Optional[CacheKey]:
+        """Route cache key of a request, or None if it bypasses the cache."""
+        if (
+            self.cache is None
+            or from_address
+            or slippage != 0.5
+            or from_token.upper() != to_token.upper()
+        ):
+            return None
+        return self.cache.key(from_chain, to_chain, from_token, amount)
+
+    async def _load_token_registry(self, tokens: Iterable[tuple[str, str]]) -> None:
+        """
+        Load the token registry if a (token, chain) pair needs it.
+        
+        A token outside COMMON_TOKENS on a supported chain can only be
+        resolved from the registry. Never raises.
+        """
+        if any(
+            chain.lower() in SUPPORTED_CHAINS and not self._resolve_token_address(token, chain)
+            for token, chain in tokens
+        ):
+            await get_token_registry().refresh_if_stale(self.client)
+
     def _resolve_token_address(
         self, token: str, chain: str
     ) -> Optional[str]:
-        """Resolve token symbol to address."""
+        """Resolve token symbol to address, from COMMON_TOKENS or the token registry."""
         if token.startswith("0x") and len(token) == 42:
             return token
         
         token_upper = token.upper()
         chain_lower = chain.lower()
         
-        if token_upper in COMMON_TOKENS:
-            return COMMON_TOKENS[token_upper].get(chain_lower)
+        address = COMMON_TOKENS.get(token_upper, {}).get(chain_lower)
+        if address:
+            return address
         
-        return None
+        return get_token_registry().address(chain_lower, token_upper)
 
-    def _get_token_decimals(self, token: str) -> int:
-        """Get token decimals (simplified)."""
+    def _get_token_decimals(self, token: str, chain: Optional[str] = None) -> int:
+        """
+        Get token decimals.
+        
+        The token registry knows the decimals of the resolved contract on
+        a chain; without a chain or a registry entry, they are guessed
+        from the symbol.
+        """
+        if chain is not None:
+            address = self._resolve_token_address(token, chain)
+            decimals = get_token_registry().decimals(chain, address or token)
+            if decimals is not None:
+                return decimals
+        
         token_upper = token.upper()
         
         if token_upper in ["USDC", "USDT"]:
@@ -325,6 +546,16 @@ class LiFiClient:
             return 8
         return 18
 
+    def _output_decimals(
+        self, to_token_data: Any, token: str, to_chain: str
+    ) -> int:
+        """Decimals of the received token, as LI.FI reports them if it does."""
+        if isinstance(to_token_data, dict):
+            decimals = to_token_data.get("decimals")
+            if isinstance(decimals, int) and not isinstance(decimals, bool):
+                return decimals
+        return self._get_token_decimals(token, to_chain)
+
     def _parse_route(
         self,
         route: dict[str, Any],
@@ -332,6 +563,7 @@ class LiFiClient:
         to_chain: str,
         token: str,
         amount: float,
+        to_token: Optional[str] = None,
     ) -> BridgeRoute:
         """Parse LI.FI route response into BridgeRoute."""
         from_chain_config = SUPPORTED_CHAINS[from_chain.lower()]
@@ -357,7 +589,7 @@ class LiFiClient:
         bridge_fee_usd = float(fee_costs) if fee_costs else 0
         
         to_amount = route.get("toAmount", "0")
-        decimals = self._get_token_decimals(token)
+        decimals = self._output_decimals(route.get("toToken"), to_token or token, to_chain)
         estimated_output = int(to_amount) / (10 ** decimals) if to_amount else amount
         
         return BridgeRoute(
@@ -385,6 +617,7 @@ class LiFiClient:
         to_chain: str,
         token: str,
         amount: float,
+        to_token: Optional[str] = None,
     ) -> BridgeRoute:
         """Parse LI.FI quote response into BridgeRoute with tx data."""
         from_chain_config = SUPPORTED_CHAINS[from_chain.lower()]
@@ -407,7 +640,9 @@ class LiFiClient:
         )
         
         to_amount = estimate.get("toAmount", "0")
-        decimals = self._get_token_decimals(token)
+        decimals = self._output_decimals(
+            quote.get("action", {}).get("toToken"), to_token or token, to_chain
+        )
         estimated_output = int(to_amount) / (10 ** decimals) if to_amount else amount
         
         tx_data = quote.get("transactionRequest")
@@ -481,6 +716,8 @@ async def get_all_bridge_routes(
     """
     Get bridge routes to multiple destination chains.
     
+    Destinations are fetched concurrently (see LiFiClient.get_routes_many).
+    
     Args:
         from_chain: Source chain
         to_chains: List of destination chains
@@ -489,24 +726,80 @@ async def get_all_bridge_routes(
         api_key: Optional LI.FI API key
         
     Returns:
-        Dictionary mapping chain to best route
+        Dictionary mapping chain to best route; None for the source
+        chain and for destinations without a route or whose request
+        failed
     """
-    results: dict[str, Optional[BridgeRoute]] = {}
+    results: dict[str, Optional[BridgeRoute]] = dict.fromkeys(to_chains)
+    remote = [chain for chain in to_chains if chain.lower() != from_chain.lower()]
     
-    async with LiFiClient(api_key=api_key) as client:
-        for to_chain in to_chains:
-            if to_chain.lower() == from_chain.lower():
-                results[to_chain] = None
-                continue
-            
-            routes = await client.get_routes(
+    if remote:
+        async with LiFiClient(api_key=api_key) as client:
+            fetched = await client.get_routes_many(
                 from_chain=from_chain,
-                to_chain=to_chain,
+                to_chains=remote,
                 from_token=token,
                 to_token=token,
                 amount=amount,
             )
-            
-            results[to_chain] = routes[0] if routes else None
+        
+        for to_chain, routes in fetched.items():
+            if isinstance(routes, list) and routes:
+                results[to_chain] = routes[0]
     
     return results
+
+
+async def refresh_popular_routes(
+    limit: int = POPULAR_ROUTES_LIMIT,
+    api_key: Optional[str] = None,
+) -> int:
+    """
+    Re-quote the most requested transfers and publish them to ROUTE_BOARD.
+    
+    Args:
+        limit: Number of popular transfers to refresh
+        api_key: Optional LI.FI API key
+        
+    Returns:
+        Number of routes published
+        
+    Raises:
+        RuntimeError: If every quote failed
+    """
+    keys = ROUTE_BOARD.popular(limit)
+    if not keys:
+        return 0
+    
+    published = 0
+    errors: list[str] = []
+    
+    async with LiFiClient(api_key=api_key) as client:
+        for key in keys:
+            from_chain, to_chain, token, amount = key
+            try:
+                routes = await client.get_routes(
+                    from_chain=from_chain,
+                    to_chain=to_chain,
+                    from_token=token,
+                    to_token=token,
+                    amount=amount,
+                    cached=False,
+                )
+            except Exception as e:
+                errors.append(f"{from_chain}->{to_chain}: {e}")
+                continue
+            
+            if routes:
+                ROUTE_BOARD.publish(key, routes[0])
+                published += 1
+    
+    if errors and len(errors) == len(keys):
+        raise RuntimeError(f"All route quotes failed ({errors[0]})")
+    
+    return published
+
+
+def route_key(from_chain: str, to_chain: str, token: str, amount: float) -> RouteKey:
+    """Normalized ROUTE_BOARD key for a transfer."""
+    return (from_chain.lower(), to_chain.lower(), token.upper(), float(amount))
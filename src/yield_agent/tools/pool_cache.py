@@ -0,0 +1,662 @@
+"""
+================================================================================
+    POOL SNAPSHOT CACHE
+    Process-wide cache for the DeFiLlama /pools payload
+
+    One snapshot is shared by every request in the process. It is served
+    fresh for CACHE_TTL_SECONDS, then served stale while a single
+    background refresh downloads its replacement. Concurrent callers on
+    a cold cache wait on one in-flight download instead of each
+    starting their own. Each refresh is also saved to disk, and a
+    restarted process warm-starts from that file, serving it as stale
+    until its first refresh lands. Every new snapshot is diffed against
+    the previous one into a bounded change log, and split into per-chain
+    shards that are rebuilt only where their chain's pools changed.
+
+    Refreshes can be conditional: the loader is handed the validators of
+    the current snapshot and raises PoolsNotModified when upstream still
+    serves the same body, and the current snapshot is then re-served as
+    fresh without being rebuilt, diffed or saved.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+from yield_agent.tools.pool_diff import ChangeLog, diff_tables
+from yield_agent.tools.pool_history import HISTORY_COMPACT_SECONDS, HISTORY_PATH, PoolHistory
+from yield_agent.tools.pool_records import PoolRecord
+from yield_agent.tools.pool_shards import PoolShard, build_shards
+from yield_agent.tools.pool_store import SNAPSHOT_PATH, load_snapshot, save_snapshot
+from yield_agent.tools.pool_table import PoolTable
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 300))
+
+PoolLoader = Callable[[], Awaitable[list[PoolRecord]]]
+
+# Reasons a conditional refresh was short-circuited.
+NOT_MODIFIED = "not_modified"
+SAME_CONTENT = "content_hash"
+
+
+# ==============================================================================
+# CONDITIONAL DOWNLOADS
+# ==============================================================================
+
+
+class PoolValidators:
+    """
+    Identity of one /pools body.
+
+    ``content_hash`` covers the raw body and the decode filter; ``etag``
+    and ``last_modified`` are the server's validators, if it sent any.
+    """
+
+    def __init__(
+        self,
+        content_hash: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class PoolDownload:
+    """Pools returned by a conditional loader, with their body's validators."""
+
+    def __init__(self, pools: Sequence[PoolRecord], validators: Optional[PoolValidators]):
+        self.pools = pools
+        self.validators = validators
+
+
+class PoolsNotModified(Exception):  # noqa: N818 - an expected outcome (like a 304), not an error
+    """
+    Upstream still serves the body the current snapshot was built from.
+
+    ``reason`` is NOT_MODIFIED for an HTTP 304 and SAME_CONTENT for a
+    body with the same hash. ``validators`` are the ones to keep.
+    """
+
+    def __init__(self, reason: str, validators: Optional[PoolValidators] = None):
+        super().__init__(f"pools not modified ({reason})")
+        self.reason = reason
+        self.validators = validators
+
+
+ConditionalPoolLoader = Callable[[Optional[PoolValidators]], Awaitable[PoolDownload]]
+
+
+# ==============================================================================
+# SNAPSHOT
+# ==============================================================================
+
+
+class PoolSnapshot:
+    """
+    Immutable view of one /pools download.
+
+    Snapshots are replaced, never mutated, so readers can keep using
+    the instance they were handed while a refresh publishes a new one.
+    The columnar table is built here, on the refresh path, so request
+    handlers only ever filter it. A stale snapshot (one loaded from
+    disk) triggers a refresh on first use whatever its age.
+
+    ``shards`` partitions the table by chain (see pool_shards).
+    """
+
+    def __init__(
+        self,
+        pools: Sequence[PoolRecord],
+        snapshot_id: int,
+        fetched_at: Optional[float] = None,
+        table: Optional[PoolTable] = None,
+        source: str = "network",
+        stale: bool = False,
+        validators: Optional[PoolValidators] = None,
+        shards: Optional[dict[str, PoolShard]] = None,
+    ):
+        self.pools = pools
+        self.table = table if table is not None else PoolTable(pools)
+        self.shards = shards if shards is not None else build_shards(self.table)
+        self.snapshot_id = snapshot_id
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.source = source
+        self.stale = stale
+        self.validators = validators
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+
+# ==============================================================================
+# CACHE CLASS
+# ==============================================================================
+
+
+class PoolSnapshotCache:
+    """
+    TTL cache with stale-while-revalidate for pool snapshots.
+
+    The cache is shared across threads and event loops: LangGraph runs
+    each sync node in a worker thread with its own ``asyncio.run`` loop,
+    so state is guarded by a ``threading.Lock`` and background refreshes
+    run on a dedicated thread rather than on any caller's loop.
+
+    With a snapshot_path, every refreshed snapshot is written there from
+    the refresh thread and warm_start() can load it back after a restart.
+
+    ``changes`` holds the diffs between consecutive snapshots. They are
+    computed after waiters have been handed the new snapshot.
+
+    With a history, every downloaded snapshot is also appended to it, and
+    the history is compacted at most every compact_seconds.
+
+    A conditional cache calls its loader with the current snapshot's
+    validators (None if it has none) and expects a PoolDownload back.
+    """
+
+    def __init__(
+        self,
+        loader: PoolLoader | ConditionalPoolLoader,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        snapshot_path: Optional[str] = None,
+        history: Optional[PoolHistory] = None,
+        compact_seconds: float = HISTORY_COMPACT_SECONDS,
+        conditional: bool = False,
+    ):
+        self.loader = loader
+        self.conditional = conditional
+        self.ttl_seconds = ttl_seconds
+        self.snapshot_path = snapshot_path
+        self.history = history
+        self.compact_seconds = compact_seconds
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._snapshot: Optional[PoolSnapshot] = None
+        self._snapshot_ids = itertools.count(1)
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._inflight: Optional[concurrent.futures.Future] = None
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._refreshes = 0
+        self._refresh_errors = 0
+        self._last_error: Optional[str] = None
+        self._post_refresh_errors = 0
+        self._post_refresh_error: Optional[str] = None
+        self._short_circuits = {NOT_MODIFIED: 0, SAME_CONTENT: 0}
+        self._last_refresh: dict[str, Any] = {}
+        self._warm_start: dict[str, Any] = {}
+        self._persisted: dict[str, Any] = {}
+        self._persisted_id = 0
+        self.changes = ChangeLog()
+        self._changes_lock = threading.Lock()
+        self._diff_base: Optional[PoolSnapshot] = None
+        self._diff_error: Optional[str] = None
+        self._history_lock = threading.Lock()
+        self._history_id = 0
+        self._history_error: Optional[str] = None
+        self._compacted_at = time.time()
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    async def get(self) -> PoolSnapshot:
+        """
+        Return the current snapshot, downloading one on a cold cache.
+
+        Expired snapshots are returned immediately and a background
+        refresh is started if one is not already running. Concurrent
+        cold callers share a single download.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                if not snapshot.stale and snapshot.age_seconds < self.ttl_seconds:
+                    self._hits += 1
+                else:
+                    self._stale_hits += 1
+                    self._start_refresh()
+                return snapshot
+            self._misses += 1
+            future = self._join_refresh()
+
+        return await asyncio.wrap_future(future)
+
+    async def refresh(self) -> PoolSnapshot:
+        """
+        Download and publish a new snapshot.
+
+        Joins the in-flight download if there is one, so callers never
+        trigger more than one request to the upstream at a time.
+        """
+        with self._lock:
+            future = self._join_refresh()
+
+        return await asyncio.wrap_future(future)
+
+    def warm_start(self) -> Optional[PoolSnapshot]:
+        """
+        Load the snapshot saved by a previous process and start a refresh.
+
+        The loaded snapshot is served as stale, so callers get pools
+        immediately while the refresh runs. A missing, truncated or
+        corrupt file is skipped and the first caller downloads instead.
+
+        Returns:
+            The warm-started snapshot, or None if nothing was loaded
+        """
+        if not self.snapshot_path:
+            return None
+
+        started = time.perf_counter()
+        try:
+            pools = load_snapshot(self.snapshot_path)
+            table = pools.build_table()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            with self._lock:
+                self._warm_start = {"loaded": False, "error": str(e) or type(e).__name__}
+            return None
+
+        with self._lock:
+            if self._snapshot is not None:
+                return None
+            snapshot = PoolSnapshot(
+                pools,
+                snapshot_id=next(self._snapshot_ids),
+                fetched_at=pools.fetched_at,
+                table=table,
+                source="disk",
+                stale=True,
+            )
+            self._snapshot = snapshot
+            self._warm_start = {
+                "loaded": True,
+                "pools": len(pools),
+                "duration_seconds": round(time.perf_counter() - started, 3),
+            }
+            self._start_refresh()
+
+        self._record_changes(snapshot)
+        return snapshot
+
+    def publish(
+        self,
+        pools: Sequence[PoolRecord],
+        validators: Optional[PoolValidators] = None,
+    ) -> PoolSnapshot:
+        """Replace the current snapshot with freshly downloaded pools."""
+        snapshot = self._publish(pools, validators)
+        self._record_changes(snapshot)
+        self._record_history(snapshot)
+        return snapshot
+
+    def peek(self) -> Optional[PoolSnapshot]:
+        """Return the current snapshot without touching counters."""
+        return self._snapshot
+
+    def clear(self) -> None:
+        """Drop the current snapshot and reset all counters."""
+        with self._lock:
+            self._snapshot = None
+            self._hits = 0
+            self._stale_hits = 0
+            self._misses = 0
+            self._coalesced = 0
+            self._refreshes = 0
+            self._refresh_errors = 0
+            self._last_error = None
+            self._post_refresh_errors = 0
+            self._post_refresh_error = None
+            self._short_circuits = dict.fromkeys(self._short_circuits, 0)
+        with self._changes_lock:
+            self._diff_base = None
+            self._diff_error = None
+            self.changes = ChangeLog(self.changes.max_diffs)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters and the age of the current snapshot."""
+        with self._lock:
+            snapshot = self._snapshot
+            refreshing = self._inflight is not None
+            lookups = self._hits + self._stale_hits + self._misses
+            return {
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "hit_ratio": (
+                    round((self._hits + self._stale_hits) / lookups, 4) if lookups else 0.0
+                ),
+                "refreshes": self._refreshes,
+                "refresh_errors": self._refresh_errors,
+                "short_circuited": sum(self._short_circuits.values()),
+                "short_circuits": dict(self._short_circuits),
+                "last_error": self._last_error,
+                "post_refresh_errors": self._post_refresh_errors,
+                "last_post_refresh_error": self._post_refresh_error,
+                "refreshing": refreshing,
+                "snapshot_id": snapshot.snapshot_id if snapshot else None,
+                "snapshot_source": snapshot.source if snapshot else None,
+                "snapshot_pools": len(snapshot) if snapshot else 0,
+                "shards": (
+                    {chain: shard.stats() for chain, shard in snapshot.shards.items()}
+                    if snapshot else {}
+                ),
+                "age_seconds": round(snapshot.age_seconds, 1) if snapshot else None,
+                "ttl_seconds": self.ttl_seconds,
+                "last_refresh": dict(self._last_refresh),
+                "warm_start": dict(self._warm_start),
+                "persisted": dict(self._persisted),
+                "changes": {**self.changes.stats(), "last_error": self._diff_error},
+                "history": (
+                    {**self.history.stats(), "last_error": self._history_error}
+                    if self.history is not None else None
+                ),
+            }
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _publish(
+        self,
+        pools: Sequence[PoolRecord],
+        validators: Optional[PoolValidators] = None,
+    ) -> PoolSnapshot:
+        # Built outside the lock; unchanged shards are carried over from
+        # whichever snapshot is current at this point.
+        current = self._snapshot
+        table = PoolTable(pools)
+        shards = build_shards(table, current.shards if current is not None else None)
+        with self._lock:
+            snapshot = PoolSnapshot(
+                pools,
+                snapshot_id=next(self._snapshot_ids),
+                table=table,
+                validators=validators,
+                shards=shards,
+            )
+            self._snapshot = snapshot
+            self._refreshes += 1
+            self._last_error = None
+        return snapshot
+
+    def _record_changes(self, snapshot: PoolSnapshot) -> None:
+        """Diff a new snapshot against the last one diffed. Never raises."""
+        with self._changes_lock:
+            base = self._diff_base
+            # Publishes can race; only move forward.
+            if base is not None and snapshot.snapshot_id <= base.snapshot_id:
+                return
+            self._diff_base = snapshot
+
+            if base is None:
+                self.changes.start(snapshot.snapshot_id)
+                return
+            try:
+                self.changes.record(diff_tables(
+                    base.table, snapshot.table, base.snapshot_id, snapshot.snapshot_id
+                ))
+                self._diff_error = None
+            except Exception as e:
+                # Restart the history rather than leave a gap in it.
+                logger.warning("Pool snapshot %d: diff failed: %s", snapshot.snapshot_id, e)
+                self._diff_error = str(e) or type(e).__name__
+                self.changes.start(snapshot.snapshot_id)
+
+    def _record_history(self, snapshot: PoolSnapshot) -> None:
+        """Append a downloaded snapshot to the history, compacting when due. Never raises."""
+        if self.history is None:
+            return
+
+        with self._history_lock:
+            if snapshot.snapshot_id <= self._history_id:
+                return
+            self._history_id = snapshot.snapshot_id
+            try:
+                self.history.append(snapshot.table, snapshot.fetched_at)
+                if time.time() - self._compacted_at >= self.compact_seconds:
+                    self.history.compact()
+                    self._compacted_at = time.time()
+                self._history_error = None
+            except Exception as e:
+                logger.warning(
+                    "Pool snapshot %d: history append failed: %s", snapshot.snapshot_id, e
+                )
+                self._history_error = str(e) or type(e).__name__
+
+    def _join_refresh(self) -> concurrent.futures.Future:
+        """Return the in-flight download for a waiting caller. Lock held."""
+        if self._inflight is not None:
+            self._coalesced += 1
+        return self._start_refresh()
+
+    def _start_refresh(self) -> concurrent.futures.Future:
+        """
+        Return the in-flight download, starting one if needed. Lock held.
+
+        The download runs on its own thread and event loop so it survives
+        the caller's ``asyncio.run`` returning, and its future is marked
+        running up front so a cancelled waiter cannot cancel it for the
+        others.
+        """
+        if self._inflight is not None:
+            return self._inflight
+
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        self._inflight = future
+
+        self._refresh_thread = threading.Thread(
+            target=self._run_refresh,
+            args=(future,),
+            name="pool-snapshot-refresh",
+            daemon=True,
+        )
+        self._refresh_thread.start()
+        return future
+
+    def _run_refresh(self, future: concurrent.futures.Future) -> None:
+        """
+        Download and publish on the refresh thread, resolving ``future``.
+
+        Any failure up to publishing clears the in-flight slot and fails
+        the future; failures of the diff, history and save steps that
+        follow are logged and counted in stats().
+        """
+        started = time.perf_counter()
+        peak_rss_before = _peak_rss_mb()
+        current = self._snapshot
+        try:
+            try:
+                download = asyncio.run(self._download(current))
+            except PoolsNotModified as e:
+                future.set_result(self._revalidate(current, e, started))
+                return
+            snapshot = self._publish(download.pools, download.validators)
+        except BaseException as e:
+            # Errors fan out to every waiter but are never cached: the
+            # in-flight slot is cleared so the next caller retries.
+            with self._lock:
+                self._inflight = None
+                self._refresh_errors += 1
+                self._last_error = str(e) or type(e).__name__
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._inflight = None
+            self._last_refresh = {
+                "duration_seconds": round(time.perf_counter() - started, 3),
+                "pools": len(snapshot),
+                "peak_rss_mb_before": peak_rss_before,
+                "peak_rss_mb_after": _peak_rss_mb(),
+            }
+        future.set_result(snapshot)
+
+        for step in (self._record_changes, self._record_history, self._persist):
+            self._after_refresh(step, snapshot)
+
+    def _after_refresh(
+        self,
+        step: Callable[[PoolSnapshot], None],
+        snapshot: PoolSnapshot,
+    ) -> None:
+        """Run one post-publish step on the refresh thread. Never raises."""
+        try:
+            step(snapshot)
+        except Exception as e:
+            logger.exception(
+                "Pool snapshot %d: %s failed", snapshot.snapshot_id, step.__name__
+            )
+            with self._lock:
+                self._post_refresh_errors += 1
+                self._post_refresh_error = f"{step.__name__}: {str(e) or type(e).__name__}"
+
+    async def _download(self, current: Optional[PoolSnapshot]) -> PoolDownload:
+        if not self.conditional:
+            return PoolDownload(await self.loader(), None)
+        return await self.loader(current.validators if current is not None else None)
+
+    def _revalidate(
+        self,
+        current: PoolSnapshot,
+        unchanged: PoolsNotModified,
+        started: float,
+    ) -> PoolSnapshot:
+        """Re-serve the current snapshot as freshly fetched, reusing its table."""
+        with self._lock:
+            if self._snapshot is current:
+                self._snapshot = PoolSnapshot(
+                    current.pools,
+                    snapshot_id=current.snapshot_id,
+                    table=current.table,
+                    validators=unchanged.validators or current.validators,
+                    shards=current.shards,
+                )
+            self._inflight = None
+            self._refreshes += 1
+            self._last_error = None
+            self._short_circuits[unchanged.reason] = (
+                self._short_circuits.get(unchanged.reason, 0) + 1
+            )
+            self._last_refresh = {
+                "duration_seconds": round(time.perf_counter() - started, 3),
+                "pools": len(current),
+                "short_circuit": unchanged.reason,
+            }
+            return self._snapshot or current
+
+    def _persist(self, snapshot: PoolSnapshot) -> None:
+        """Save a refreshed snapshot for the next warm start. Never raises."""
+        if not self.snapshot_path:
+            return
+
+        with self._persist_lock:
+            # A slower writer must not replace a newer snapshot's file.
+            if snapshot.snapshot_id <= self._persisted_id:
+                return
+            try:
+                size = save_snapshot(snapshot.pools, snapshot.fetched_at, self.snapshot_path)
+            except Exception as e:
+                logger.warning("Pool snapshot %d: save failed: %s", snapshot.snapshot_id, e)
+                self._persisted = {"error": str(e) or type(e).__name__}
+                return
+            self._persisted_id = snapshot.snapshot_id
+            self._persisted = {
+                "snapshot_id": snapshot.snapshot_id,
+                "bytes": size,
+                "saved_at": time.time(),
+            }
+
+
+# ==============================================================================
+# HELPER FUNCTIONS
+# ==============================================================================
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, where supported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _open_history() -> Optional[PoolHistory]:
+    """The history at HISTORY_PATH, or None if disabled or unreadable."""
+    if not HISTORY_PATH:
+        return None
+    try:
+        return PoolHistory(HISTORY_PATH)
+    except (OSError, ValueError):
+        return None
+
+
+# ==============================================================================
+# PROCESS-WIDE INSTANCE
+# ==============================================================================
+
+
+_pool_cache: Optional[PoolSnapshotCache] = None
+_pool_cache_lock = threading.Lock()
+
+
+def get_pool_cache() -> PoolSnapshotCache:
+    """
+    Return the process-wide pool snapshot cache, creating it on first use.
+
+    A new cache warm-starts from SNAPSHOT_PATH and records history to
+    HISTORY_PATH; set either to an empty string to disable it.
+    """
+    global _pool_cache
+
+    if _pool_cache is None:
+        with _pool_cache_lock:
+            if _pool_cache is None:
+                from yield_agent.tools.defillama_client import download_pools_if_changed
+
+                _pool_cache = PoolSnapshotCache(
+                    loader=download_pools_if_changed,
+                    conditional=True,
+                    snapshot_path=SNAPSHOT_PATH or None,
+                    history=_open_history(),
+                )
+                _pool_cache.warm_start()
+
+    return _pool_cache
@@ -0,0 +1,412 @@
+"""
+================================================================================
+    POOL CHARTS
+    Cached daily APY/TVL history from DeFiLlama /chart/{pool}
+
+    /chart returns one point per day for a single pool, so ranking a
+    shortlist means one request per pool. ChartFetcher issues them
+    concurrently under a bounded semaphore and a per-host token bucket,
+    so a batch takes about as long as its slowest request rather than
+    the sum of them, and a deadline caps even that.
+
+    Series are cached on disk, one append-only file of fixed-width rows
+    per pool. A file checked within CHART_MAX_AGE_SECONDS is served
+    without a request; an older one is topped up with only the points
+    newer than its last row.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional, Sequence
+from urllib.parse import urlsplit
+
+import msgspec
+import numpy as np
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+CHART_CACHE_PATH = os.getenv("CHART_CACHE_PATH", os.path.join(".cache", "charts"))
+
+# A cached series checked more recently than this is served as is.
+# DeFiLlama adds one point per day.
+CHART_MAX_AGE_SECONDS = float(os.getenv("CHART_MAX_AGE_SECONDS", 6 * 3_600))
+
+# Requests in flight at once, and the per-host request rate and burst.
+CHART_CONCURRENCY = int(os.getenv("CHART_CONCURRENCY", 50))
+CHART_RATE_PER_SECOND = float(os.getenv("CHART_RATE_PER_SECOND", 10))
+CHART_BURST = int(os.getenv("CHART_BURST", 50))
+
+CHART_REQUEST_TIMEOUT = float(os.getenv("CHART_REQUEST_TIMEOUT", 10))
+
+# Upper bound on a whole batch; unfinished pools fall back to the cache.
+CHART_DEADLINE_SECONDS = float(os.getenv("CHART_DEADLINE_SECONDS", 15))
+
+CHART_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("apy", "<f4"),
+    ("apy_base", "<f4"),
+    ("apy_reward", "<f4"),
+    ("tvl_usd", "<f4"),
+])
+
+
+# ==============================================================================
+# SCHEMA
+# ==============================================================================
+
+
+class ChartPoint(msgspec.Struct, gc=False, rename="camel"):
+    """One day of a /chart response, decoded from its camelCase keys."""
+
+    timestamp: datetime
+    apy: Optional[float] = None
+    apy_base: Optional[float] = None
+    apy_reward: Optional[float] = None
+    tvl_usd: Optional[float] = None
+
+
+class ChartResponse(msgspec.Struct):
+    """Envelope of the /chart response."""
+
+    data: list[ChartPoint] = []
+
+
+_chart_decoder = msgspec.json.Decoder(ChartResponse, strict=False)
+
+
+def decode_chart(body: bytes) -> np.ndarray:
+    """
+    Decode a /chart body into CHART_DTYPE rows.
+
+    Missing values become NaN and timestamps without a zone are read as
+    UTC.
+
+    Returns:
+        Points sorted by time
+
+    Raises:
+        msgspec.DecodeError: If the body is not a valid /chart payload
+    """
+    points = _chart_decoder.decode(body).data
+    rows = np.empty(len(points), dtype=CHART_DTYPE)
+
+    def value(v: Optional[float]) -> float:
+        return np.nan if v is None else v
+
+    for i, point in enumerate(points):
+        stamp = point.timestamp
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=timezone.utc)
+        rows[i] = (
+            stamp.timestamp(),
+            value(point.apy),
+            value(point.apy_base),
+            value(point.apy_reward),
+            value(point.tvl_usd),
+        )
+
+    return rows[np.argsort(rows["time"], kind="stable")]
+
+
+# ==============================================================================
+# DISK CACHE
+# ==============================================================================
+
+
+class ChartStore:
+    """
+    One append-only file of CHART_DTYPE rows per pool.
+
+    File names are hashes of the pool id, so any id is safe to store.
+    A file's modification time records when the pool was last checked
+    upstream, whether or not that check added points.
+    """
+
+    def __init__(self, path: str = CHART_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    def load(self, pool_id: str) -> Optional[np.ndarray]:
+        """Cached points for a pool, or None if it was never fetched."""
+        try:
+            with open(self._file(pool_id), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        # A torn append leaves a partial row at the end.
+        usable = len(body) - len(body) % CHART_DTYPE.itemsize
+        return np.frombuffer(body[:usable], dtype=CHART_DTYPE)
+
+    def checked_at(self, pool_id: str) -> Optional[float]:
+        """When a pool was last checked upstream, or None."""
+        try:
+            return os.path.getmtime(self._file(pool_id))
+        except FileNotFoundError:
+            return None
+
+    def top_up(self, pool_id: str, points: np.ndarray) -> int:
+        """
+        Append the points newer than the cached series and mark it checked.
+
+        Args:
+            pool_id: DeFiLlama pool id
+            points: Full series from /chart, sorted by time
+
+        Returns:
+            Number of points appended
+        """
+        with self._lock:
+            cached = self.load(pool_id)
+            if cached is not None and len(cached):
+                points = points[points["time"] > cached["time"][-1]]
+
+            file = self._file(pool_id)
+            with open(file, "ab") as f:
+                if cached is not None:
+                    f.truncate(len(cached) * CHART_DTYPE.itemsize)
+                f.write(points.astype(CHART_DTYPE, copy=False).tobytes())
+            os.utime(file)
+            return len(points)
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _file(self, pool_id: str) -> str:
+        name = hashlib.sha1(pool_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{name}.bin")
+
+
+# ==============================================================================
+# RATE LIMITER
+# ==============================================================================
+
+
+class HostRateLimiter:
+    """
+    Token bucket per host, shared across threads and event loops.
+
+    Each acquire() reserves a token under a thread lock and then sleeps
+    on the caller's own loop until that token is due, so LangGraph nodes
+    running their own ``asyncio.run`` loops draw from the same buckets.
+    """
+
+    def __init__(self, rate_per_second: float = CHART_RATE_PER_SECOND, burst: int = CHART_BURST):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    async def acquire(self, host: str) -> float:
+        """
+        Wait for a request slot on a host.
+
+        Returns:
+            Seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(host, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate_per_second)
+            tokens -= 1
+            self._buckets[host] = (tokens, now)
+
+        delay = -tokens / self.rate_per_second if tokens < 0 else 0.0
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+# ==============================================================================
+# FETCHER CLASS
+# ==============================================================================
+
+
+class ChartFetcher:
+    """
+    Concurrent, cached /chart fetcher.
+
+    A failed or unfinished request never fails the batch: the pool is
+    served from whatever the cache already holds, or left out.
+    """
+
+    def __init__(
+        self,
+        store: ChartStore,
+        limiter: Optional[HostRateLimiter] = None,
+        concurrency: int = CHART_CONCURRENCY,
+        max_age_seconds: float = CHART_MAX_AGE_SECONDS,
+        deadline_seconds: float = CHART_DEADLINE_SECONDS,
+        request_timeout: float = CHART_REQUEST_TIMEOUT,
+    ):
+        self.store = store
+        self.limiter = limiter or HostRateLimiter()
+        self.concurrency = concurrency
+        self.max_age_seconds = max_age_seconds
+        self.deadline_seconds = deadline_seconds
+        self.request_timeout = request_timeout
+        self._stats_lock = threading.Lock()
+        self._requested = 0
+        self._fresh = 0
+        self._fetched = 0
+        self._appended = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._last_error: Optional[str] = None
+        self._last_batch: dict[str, Any] = {}
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    async def fetch(self, pool_ids: Sequence[str], client: Any = None) -> dict[str, np.ndarray]:
+        """
+        History for many pools in one call.
+
+        Args:
+            pool_ids: DeFiLlama pool ids; duplicates are fetched once
+            client: Open DeFiLlamaClient to use (default: a new one)
+
+        Returns:
+            Points per pool id, for every pool with any history
+        """
+        started = time.perf_counter()
+        pool_ids = list(dict.fromkeys(pool_id for pool_id in pool_ids if pool_id))
+        now = time.time()
+        stale = [
+            pool_id for pool_id in pool_ids
+            if now - (self.store.checked_at(pool_id) or 0.0) >= self.max_age_seconds
+        ]
+
+        timeouts = 0
+        if stale:
+            if client is None:
+                from yield_agent.tools.defillama_client import DeFiLlamaClient
+
+                async with DeFiLlamaClient(timeout=self.request_timeout) as client:
+                    timeouts = await self._top_up_all(client, stale)
+            else:
+                timeouts = await self._top_up_all(client, stale)
+
+        charts = {}
+        for pool_id in pool_ids:
+            points = self.store.load(pool_id)
+            if points is not None and len(points):
+                charts[pool_id] = points
+
+        with self._stats_lock:
+            self._requested += len(pool_ids)
+            self._fresh += len(pool_ids) - len(stale)
+            self._timeouts += timeouts
+            self._last_batch = {
+                "pools": len(pool_ids),
+                "fetched": len(stale),
+                "served": len(charts),
+                "timeouts": timeouts,
+                "duration_seconds": round(time.perf_counter() - started, 3),
+            }
+        return charts
+
+    def stats(self) -> dict[str, Any]:
+        """Request, cache and error counters."""
+        with self._stats_lock:
+            return {
+                "requested": self._requested,
+                "fresh": self._fresh,
+                "fetched": self._fetched,
+                "points_appended": self._appended,
+                "errors": self._errors,
+                "timeouts": self._timeouts,
+                "last_error": self._last_error,
+                "last_batch": dict(self._last_batch),
+            }
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    async def _top_up_all(self, client: Any, pool_ids: list[str]) -> int:
+        """Top up every pool concurrently until the deadline. Returns timeouts."""
+        semaphore = asyncio.BoundedSemaphore(self.concurrency)
+        host = urlsplit(client.base_url).netloc
+        tasks = [
+            asyncio.create_task(self._top_up(client, semaphore, host, pool_id))
+            for pool_id in pool_ids
+        ]
+        _, pending = await asyncio.wait(tasks, timeout=self.deadline_seconds)
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return len(pending)
+
+    async def _top_up(
+        self,
+        client: Any,
+        semaphore: asyncio.BoundedSemaphore,
+        host: str,
+        pool_id: str,
+    ) -> None:
+        async with semaphore:
+            await self.limiter.acquire(host)
+            try:
+                points = await client.fetch_pool_chart(pool_id)
+                appended = self.store.top_up(pool_id, points)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                with self._stats_lock:
+                    self._errors += 1
+                    self._last_error = str(e) or type(e).__name__
+                return
+
+        with self._stats_lock:
+            self._fetched += 1
+            self._appended += appended
+
+
+# ==============================================================================
+# PROCESS-WIDE INSTANCE
+# ==============================================================================
+
+
+_chart_fetcher: Optional[ChartFetcher] = None
+_chart_fetcher_lock = threading.Lock()
+
+
+def get_chart_fetcher() -> ChartFetcher:
+    """Return the process-wide chart fetcher, creating it on first use."""
+    global _chart_fetcher
+
+    if _chart_fetcher is None:
+        with _chart_fetcher_lock:
+            if _chart_fetcher is None:
+                _chart_fetcher = ChartFetcher(ChartStore(CHART_CACHE_PATH))
+
+    return _chart_fetcher
+
+
+async def get_pool_charts(pool_ids: Sequence[str]) -> dict[str, np.ndarray]:
+    """
+    Convenience function: daily history for many pools at once.
+
+    Returns:
+        CHART_DTYPE points per pool id, for pools with any history
+    """
+    return await get_chart_fetcher().fetch(pool_ids)
@@ -0,0 +1,314 @@
+"""
+================================================================================
+    POOL SNAPSHOT DIFF
+    What changed between consecutive /pools snapshots
+
+    Pools are matched by their DeFiLlama ``pool`` id with a sorted join
+    over the two tables' id columns, and every comparison runs on whole
+    NumPy columns; Python only touches the rows that actually changed.
+    Diffs are kept in a bounded ChangeLog so downstream caches and API
+    clients can ask for everything since the snapshot they last saw
+    instead of rebuilding from scratch.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+import numpy as np
+
+from yield_agent.tools.pool_table import PoolTable
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+# Smallest APY move reported, in percentage points.
+APY_CHANGE_THRESHOLD = float(os.getenv("APY_CHANGE_THRESHOLD", 0.5))
+
+# Smallest TVL move reported, as a fraction of the previous TVL.
+TVL_CHANGE_THRESHOLD = float(os.getenv("TVL_CHANGE_THRESHOLD", 0.1))
+
+# Number of diffs the change log keeps.
+CHANGE_LOG_SIZE = int(os.getenv("CHANGE_LOG_SIZE", 50))
+
+
+# ==============================================================================
+# DIFF CLASS
+# ==============================================================================
+
+
+class SnapshotDiff:
+    """
+    Changes from one snapshot to the next.
+
+    ``added`` and ``removed`` hold pool ids; ``apy``, ``tvl_usd`` and
+    ``risk_score`` hold ``{"pool", "chain", "old", "new"}`` entries for
+    pools present in both snapshots whose value moved past its threshold.
+    ``chains`` lists the DeFiLlama chains (lowercased) touched by any of
+    them.
+    """
+
+    def __init__(
+        self,
+        from_id: int,
+        to_id: int,
+        added: list[str],
+        removed: list[str],
+        apy: list[dict[str, Any]],
+        tvl_usd: list[dict[str, Any]],
+        risk_score: list[dict[str, Any]],
+        chains: list[str],
+        computed_at: Optional[float] = None,
+    ):
+        self.from_id = from_id
+        self.to_id = to_id
+        self.added = added
+        self.removed = removed
+        self.apy = apy
+        self.tvl_usd = tvl_usd
+        self.risk_score = risk_score
+        self.chains = chains
+        self.computed_at = computed_at if computed_at is not None else time.time()
+
+    @property
+    def changed_pools(self) -> int:
+        """Number of distinct pools added, removed or changed."""
+        changed = {entry["pool"] for entry in self.apy + self.tvl_usd + self.risk_score}
+        return len(self.added) + len(self.removed) + len(changed)
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-ready representation."""
+        return {
+            "from_snapshot_id": self.from_id,
+            "to_snapshot_id": self.to_id,
+            "computed_at": self.computed_at,
+            "added": self.added,
+            "removed": self.removed,
+            "apy": self.apy,
+            "tvl_usd": self.tvl_usd,
+            "risk_score": self.risk_score,
+            "chains": self.chains,
+        }
+
+    def summary(self) -> dict[str, Any]:
+        """Counts per kind of change."""
+        return {
+            "from_snapshot_id": self.from_id,
+            "to_snapshot_id": self.to_id,
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "apy": len(self.apy),
+            "tvl_usd": len(self.tvl_usd),
+            "risk_score": len(self.risk_score),
+        }
+
+
+# ==============================================================================
+# DIFF ENGINE
+# ==============================================================================
+
+
+def diff_tables(
+    old: PoolTable,
+    new: PoolTable,
+    from_id: int,
+    to_id: int,
+    apy_threshold: float = APY_CHANGE_THRESHOLD,
+    tvl_threshold: float = TVL_CHANGE_THRESHOLD,
+) -> SnapshotDiff:
+    """
+    Compare two snapshots' tables pool by pool.
+
+    Rows without a pool id are ignored, and if an id appears twice in a
+    snapshot its first row is used.
+
+    Args:
+        old: Table of the earlier snapshot
+        new: Table of the later snapshot
+        from_id: Snapshot id of ``old``
+        to_id: Snapshot id of ``new``
+        apy_threshold: Smallest APY move reported, in percentage points
+        tvl_threshold: Smallest TVL move reported, relative to the old TVL
+
+    Returns:
+        SnapshotDiff from ``old`` to ``new``
+    """
+    old_ids, old_rows = _unique_ids(old)
+    new_ids, new_rows = _unique_ids(new)
+
+    _, old_pos, new_pos = np.intersect1d(
+        old_ids, new_ids, assume_unique=True, return_indices=True
+    )
+    before = old_rows[old_pos]
+    after = new_rows[new_pos]
+
+    added_rows = np.delete(new_rows, new_pos)
+    removed_rows = np.delete(old_rows, old_pos)
+
+    apy_moved = np.abs(new.apy[after] - old.apy[before]) >= apy_threshold
+
+    old_tvl = old.tvl_usd[before]
+    tvl_moved = (
+        np.abs(new.tvl_usd[after] - old_tvl) >= tvl_threshold * np.maximum(old_tvl, 1.0)
+    )
+
+    risk_moved = new.risk_scores[after] != old.risk_scores[before]
+
+    chains: set[str] = set()
+    chains.update(_chains(new, added_rows))
+    chains.update(_chains(old, removed_rows))
+    chains.update(_chains(new, after[apy_moved | tvl_moved | risk_moved]))
+
+    return SnapshotDiff(
+        from_id=from_id,
+        to_id=to_id,
+        added=new.pool_ids[added_rows].tolist(),
+        removed=old.pool_ids[removed_rows].tolist(),
+        apy=_moves(old, new, before[apy_moved], after[apy_moved], "apy"),
+        tvl_usd=_moves(old, new, before[tvl_moved], after[tvl_moved], "tvl_usd"),
+        risk_score=_moves(old, new, before[risk_moved], after[risk_moved], "risk_scores"),
+        chains=sorted(chains),
+    )
+
+
+def _unique_ids(table: PoolTable) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted distinct non-empty pool ids and the first row of each."""
+    rows = np.flatnonzero(table.pool_ids != "")
+    ids, first = np.unique(table.pool_ids[rows], return_index=True)
+    return ids, rows[first]
+
+
+def _moves(
+    old: PoolTable,
+    new: PoolTable,
+    before: np.ndarray,
+    after: np.ndarray,
+    column: str,
+) -> list[dict[str, Any]]:
+    """Change entries for matched rows of one column."""
+    return [
+        {"pool": pool, "chain": chain, "old": old_value, "new": new_value}
+        for pool, chain, old_value, new_value in zip(
+            new.pool_ids[after].tolist(),
+            _chains(new, after),
+            getattr(old, column)[before].tolist(),
+            getattr(new, column)[after].tolist(),
+        )
+    ]
+
+
+def _chains(table: PoolTable, rows: np.ndarray) -> list[str]:
+    """Chain name per row."""
+    names = table.chain_names
+    return [names[code] for code in table.chain_codes[rows].tolist()]
+
+
+# ==============================================================================
+# CHANGE LOG
+# ==============================================================================
+
+
+class ChangeLog:
+    """
+    Bounded, thread-safe history of consecutive snapshot diffs.
+
+    Diffs are recorded in order and chain: each starts at the snapshot
+    the previous one ended at. Once the log is full the oldest diff is
+    dropped, and callers asking for changes since a snapshot the log no
+    longer covers get None and must refetch everything.
+    """
+
+    def __init__(self, max_diffs: int = CHANGE_LOG_SIZE):
+        self.max_diffs = max_diffs
+        self._lock = threading.Lock()
+        self._diffs: deque[SnapshotDiff] = deque(maxlen=max_diffs)
+        self._base_id: Optional[int] = None
+        self._recorded = 0
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    @property
+    def latest_id(self) -> Optional[int]:
+        """Id of the newest snapshot the log knows about."""
+        with self._lock:
+            return self._latest_id()
+
+    def bounds(self) -> tuple[Optional[int], Optional[int]]:
+        """Oldest snapshot id the log can diff from, and the latest id."""
+        with self._lock:
+            return self._oldest_id(), self._latest_id()
+
+    def start(self, snapshot_id: int) -> None:
+        """Forget all diffs and begin a new history at a snapshot."""
+        with self._lock:
+            self._diffs.clear()
+            self._base_id = snapshot_id
+
+    def record(self, diff: SnapshotDiff) -> None:
+        """
+        Append a diff.
+
+        Raises:
+            ValueError: If the diff does not start at the latest snapshot
+        """
+        with self._lock:
+            latest = self._latest_id()
+            if latest is not None and diff.from_id != latest:
+                raise ValueError(
+                    f"diff starts at snapshot {diff.from_id}, log is at {latest}"
+                )
+            if self._base_id is None:
+                self._base_id = diff.from_id
+            self._diffs.append(diff)
+            self._recorded += 1
+
+    def since(self, snapshot_id: int) -> Optional[list[SnapshotDiff]]:
+        """
+        Diffs leading from a snapshot to the latest one, oldest first.
+
+        Args:
+            snapshot_id: Last snapshot the caller has seen
+
+        Returns:
+            The diffs (empty if the caller is up to date), or None if the
+            log does not reach back to that snapshot
+        """
+        with self._lock:
+            latest = self._latest_id()
+            if latest is None or snapshot_id > latest:
+                return None
+            if snapshot_id < self._oldest_id():
+                return None
+            return [diff for diff in self._diffs if diff.to_id > snapshot_id]
+
+    def stats(self) -> dict[str, Any]:
+        """Ids covered and the most recent diff's counts."""
+        with self._lock:
+            return {
+                "diffs": len(self._diffs),
+                "max_diffs": self.max_diffs,
+                "recorded": self._recorded,
+                "oldest_snapshot_id": self._oldest_id(),
+                "latest_snapshot_id": self._latest_id(),
+                "last_diff": self._diffs[-1].summary() if self._diffs else None,
+            }
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _latest_id(self) -> Optional[int]:
+        return self._diffs[-1].to_id if self._diffs else self._base_id
+
+    def _oldest_id(self) -> Optional[int]:
+        return self._diffs[0].from_id if self._diffs else self._base_id
@@ -0,0 +1,606 @@
+"""
+================================================================================
+    POOL HISTORY
+    Append-only APY/TVL time series built from pool snapshots
+
+    Layout (one directory per generation, CURRENT names the live one):
+        CURRENT                 e.g. "gen-000003"
+        gen-000003/pools.txt    pool ids, one per line; line n = code n
+        gen-000003/<column>     raw little-endian column files
+
+    Every refresh appends one row per pool to each column file, so an
+    append costs the same however long the history is. Rows are in time
+    order, which lets window queries binary-search their start and run
+    grouped NumPy reductions over memory-mapped columns for all pools at
+    once. Compaction rewrites the history into a new generation, keeping
+    recent rows as they are, averaging older ones into hourly and then
+    daily points, and dropping anything past retention. It streams the
+    columns in chunks cut at bucket edges, so its memory use is bounded
+    by the chunk size rather than the length of the history.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import shutil
+import threading
+import time
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+from yield_agent.tools.pool_table import PoolTable
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+HISTORY_PATH = os.getenv("HISTORY_PATH", os.path.join(".cache", "history"))
+
+# Rows younger than this are kept as recorded.
+HISTORY_RAW_SECONDS = float(os.getenv("HISTORY_RAW_SECONDS", 2 * 86_400))
+
+# Rows younger than this (and older than raw) are averaged per hour;
+# older rows are averaged per day until they pass retention.
+HISTORY_HOURLY_SECONDS = float(os.getenv("HISTORY_HOURLY_SECONDS", 30 * 86_400))
+
+HISTORY_RETENTION_SECONDS = float(os.getenv("HISTORY_RETENTION_SECONDS", 365 * 86_400))
+
+# Minimum time between compactions triggered by PoolSnapshotCache.
+HISTORY_COMPACT_SECONDS = float(os.getenv("HISTORY_COMPACT_SECONDS", 3_600))
+
+HOUR_SECONDS = 3_600
+DAY_SECONDS = 86_400
+
+# Rows read per compaction chunk. A chunk grows to the end of the
+# bucket it stops in, so one bucket is never split across chunks.
+COMPACT_CHUNK_ROWS = 1 << 20
+
+# Recorded PoolTable columns.
+HISTORY_FIELDS = ("apy", "apy_base", "apy_reward", "tvl_usd")
+
+COLUMN_DTYPES: dict[str, np.dtype] = {
+    "time": np.dtype("<f8"),
+    "pool": np.dtype("<i4"),
+    **{field: np.dtype("<f4") for field in HISTORY_FIELDS},
+}
+
+CURRENT_FILE = "CURRENT"
+POOLS_FILE = "pools.txt"
+
+
+# ==============================================================================
+# WINDOW RESULT
+# ==============================================================================
+
+
+class WindowStats:
+    """
+    Per-pool statistics of one field over a time window.
+
+    Every array is aligned with ``pool_ids``; pools without a value in
+    the window are absent. ``std`` is the population standard deviation,
+    ``max_drawdown`` the largest fall from a running peak as a fraction
+    of that peak (0 when the peak is not positive), and ``change`` the
+    last value minus the first.
+    """
+
+    def __init__(
+        self,
+        field: str,
+        window_seconds: float,
+        pool_ids: list[str],
+        count: np.ndarray,
+        mean: np.ndarray,
+        std: np.ndarray,
+        max_drawdown: np.ndarray,
+        change: np.ndarray,
+    ):
+        self.field = field
+        self.window_seconds = window_seconds
+        self.pool_ids = pool_ids
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.max_drawdown = max_drawdown
+        self.change = change
+        self._rows = {pool_id: row for row, pool_id in enumerate(pool_ids)}
+
+    def __len__(self) -> int:
+        return len(self.pool_ids)
+
+    def get(self, pool_id: str) -> Optional[dict[str, float]]:
+        """Statistics for one pool, or None if it has no points in the window."""
+        row = self._rows.get(pool_id)
+        if row is None:
+            return None
+        return {
+            "count": int(self.count[row]),
+            "mean": float(self.mean[row]),
+            "std": float(self.std[row]),
+            "max_drawdown": float(self.max_drawdown[row]),
+            "change": float(self.change[row]),
+        }
+
+
+# ==============================================================================
+# STORE CLASS
+# ==============================================================================
+
+
+class PoolHistory:
+    """
+    Memory-mapped columnar time series of pool APY and TVL.
+
+    Thread-safe. A process that crashed mid-append leaves column files
+    of different lengths; opening the store trims them back to the last
+    complete row.
+    """
+
+    def __init__(
+        self,
+        path: str = HISTORY_PATH,
+        raw_seconds: float = HISTORY_RAW_SECONDS,
+        hourly_seconds: float = HISTORY_HOURLY_SECONDS,
+        retention_seconds: float = HISTORY_RETENTION_SECONDS,
+        chunk_rows: int = COMPACT_CHUNK_ROWS,
+    ):
+        self.path = path
+        self.raw_seconds = raw_seconds
+        self.hourly_seconds = hourly_seconds
+        self.retention_seconds = retention_seconds
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        self._mapped: dict[str, np.ndarray] = {}
+        self._mapped_rows = -1
+        self._appends = 0
+        self._compactions = 0
+        self._last_compaction: dict[str, Any] = {}
+
+        os.makedirs(path, exist_ok=True)
+        self._generation = self._read_current()
+        os.makedirs(self._generation_path, exist_ok=True)
+        self._pool_ids = self._read_pool_ids()
+        self._codes = {pool_id: code for code, pool_id in enumerate(self._pool_ids)}
+        self._rows = self._repair()
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    # --------------------------------------------------------------------------
+    # WRITES
+    # --------------------------------------------------------------------------
+
+    def append(self, table: PoolTable, timestamp: Optional[float] = None) -> int:
+        """
+        Record one point per pool of a snapshot.
+
+        Args:
+            table: Snapshot table; rows without a pool id are skipped
+            timestamp: Unix time of the snapshot (default now)
+
+        Returns:
+            Number of rows appended
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        rows = np.flatnonzero(table.pool_ids != "")
+
+        with self._lock:
+            new_ids = []
+            codes = np.empty(len(rows), dtype=COLUMN_DTYPES["pool"])
+            for i, pool_id in enumerate(table.pool_ids[rows].tolist()):
+                code = self._codes.get(pool_id)
+                if code is None:
+                    code = self._codes[pool_id] = len(self._pool_ids)
+                    self._pool_ids.append(pool_id)
+                    new_ids.append(pool_id)
+                codes[i] = code
+
+            # Ids go first: a row must never reference an unwritten id.
+            if new_ids:
+                with open(self._file(POOLS_FILE), "a", encoding="utf-8") as f:
+                    f.write("".join(f"{pool_id}\n" for pool_id in new_ids))
+
+            columns = {
+                "time": np.full(len(rows), timestamp),
+                "pool": codes,
+                **{field: getattr(table, field)[rows] for field in HISTORY_FIELDS},
+            }
+            for name, dtype in COLUMN_DTYPES.items():
+                with open(self._file(name), "ab") as f:
+                    f.write(columns[name].astype(dtype, copy=False).tobytes())
+
+            self._rows += len(rows)
+            self._appends += 1
+
+        return len(rows)
+
+    def compact(self, now: Optional[float] = None) -> dict[str, Any]:
+        """
+        Downsample old rows and drop expired ones into a new generation.
+
+        Args:
+            now: Reference Unix time for the retention tiers (default now)
+
+        Returns:
+            Row counts before and after, and the duration
+        """
+        now = now if now is not None else time.time()
+        started = time.perf_counter()
+
+        with self._lock:
+            columns = self._columns()
+            rows_before = self._rows
+            times = columns["time"]
+
+            # Rows are in time order, so each tier is a contiguous range.
+            expired, hourly, raw = np.searchsorted(times, [
+                now - self.retention_seconds,
+                now - self.hourly_seconds,
+                now - self.raw_seconds,
+            ]).tolist()
+            hourly = max(hourly, expired)
+            raw = max(raw, hourly)
+
+            # Re-code so ids without rows left are forgotten.
+            used = np.zeros(len(self._pool_ids), dtype=bool)
+            for start, stop in _chunk_bounds(times, expired, rows_before, self.chunk_rows):
+                used[columns["pool"][start:stop]] = True
+            recode = np.cumsum(used) - 1
+            pool_ids = [pool_id for pool_id, kept in zip(self._pool_ids, used.tolist()) if kept]
+
+            tiers = [
+                (expired, hourly, DAY_SECONDS),
+                (hourly, raw, HOUR_SECONDS),
+                (raw, rows_before, None),
+            ]
+            rows_after = self._write_generation(
+                pool_ids, _compacted_chunks(columns, tiers, recode, self.chunk_rows)
+            )
+            self._pool_ids = pool_ids
+            self._codes = {pool_id: code for code, pool_id in enumerate(pool_ids)}
+            self._rows = rows_after
+            self._mapped = {}
+            self._mapped_rows = -1
+            self._compactions += 1
+            self._last_compaction = {
+                "rows_before": rows_before,
+                "rows_after": self._rows,
+                "duration_seconds": round(time.perf_counter() - started, 3),
+                "compacted_at": time.time(),
+            }
+            return dict(self._last_compaction)
+
+    # --------------------------------------------------------------------------
+    # READS
+    # --------------------------------------------------------------------------
+
+    def window(
+        self,
+        field: str,
+        window_seconds: float,
+        now: Optional[float] = None,
+        pool_ids: Optional[Iterable[str]] = None,
+        bucket_seconds: Optional[int] = None,
+    ) -> WindowStats:
+        """
+        Rolling statistics of a field for every pool over a trailing window.
+
+        Args:
+            field: One of HISTORY_FIELDS
+            window_seconds: Window length ending at ``now``
+            now: End of the window (default now)
+            pool_ids: Only these pools (default all)
+            bucket_seconds: Average each pool's points per time bucket
+                first, so every bucket counts once however many rows
+                fall in it (e.g. DAY_SECONDS for daily points)
+
+        Returns:
+            WindowStats for pools with at least one value in the window
+
+        Raises:
+            ValueError: If the field is not recorded
+        """
+        if field not in HISTORY_FIELDS:
+            raise ValueError(f"unknown history field {field!r}")
+        now = now if now is not None else time.time()
+
+        with self._lock:
+            columns = self._columns()
+            known = self._pool_ids
+            pool_codes = self._codes
+
+        times = columns["time"]
+        start = np.searchsorted(times, now - window_seconds, side="left")
+        end = np.searchsorted(times, now, side="right")
+
+        selected = {"time": times[start:end], "pool": columns["pool"][start:end]}
+        selected[field] = columns[field][start:end]
+        if pool_ids is not None:
+            wanted = [pool_codes[pool_id] for pool_id in pool_ids if pool_id in pool_codes]
+            keep = np.isin(selected["pool"], wanted)
+            selected = {name: values[keep] for name, values in selected.items()}
+        if bucket_seconds is not None:
+            selected = _downsample(selected, bucket_seconds)
+
+        points = selected[field]
+        codes = selected["pool"]
+        valid = ~np.isnan(points)
+        points, codes = points[valid], codes[valid]
+
+        # Stable sort keeps each pool's points in time order.
+        order = np.argsort(codes, kind="stable")
+        codes, points = codes[order], points[order]
+
+        if not len(points):
+            empty = np.empty(0)
+            return WindowStats(
+                field, window_seconds, [], np.empty(0, dtype=np.int64),
+                empty, empty, empty, empty,
+            )
+
+        starts = np.flatnonzero(np.concatenate([[True], codes[1:] != codes[:-1]]))
+        counts = np.diff(np.append(starts, len(codes)))
+        values = points.astype(np.float64)
+
+        mean = np.add.reduceat(values, starts) / counts
+        spread = np.add.reduceat((values - np.repeat(mean, counts)) ** 2, starts)
+        std = np.sqrt(spread / counts)
+        change = values[starts + counts - 1] - values[starts]
+
+        return WindowStats(
+            field=field,
+            window_seconds=window_seconds,
+            pool_ids=[known[code] for code in codes[starts].tolist()],
+            count=counts,
+            mean=mean,
+            std=std,
+            max_drawdown=_max_drawdowns(points, starts, counts),
+            change=change,
+        )
+
+    def series(self, pool_id: str, field: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        One pool's recorded points.
+
+        Returns:
+            (times, values) in time order; empty if the pool is unknown
+        """
+        with self._lock:
+            columns = self._columns()
+            code = self._codes.get(pool_id)
+
+        if code is None:
+            return np.empty(0), np.empty(0)
+        rows = np.flatnonzero(columns["pool"] == code)
+        return np.array(columns["time"][rows]), columns[field][rows].astype(np.float64)
+
+    def stats(self) -> dict[str, Any]:
+        """Size of the store and compaction counters."""
+        with self._lock:
+            row_bytes = sum(dtype.itemsize for dtype in COLUMN_DTYPES.values())
+            return {
+                "generation": self._generation,
+                "rows": self._rows,
+                "pools": len(self._pool_ids),
+                "bytes": self._rows * row_bytes,
+                "appends": self._appends,
+                "compactions": self._compactions,
+                "last_compaction": dict(self._last_compaction),
+            }
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    @property
+    def _generation_path(self) -> str:
+        return os.path.join(self.path, self._generation)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self._generation_path, name)
+
+    def _read_current(self) -> str:
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), encoding="utf-8") as f:
+                return f.read().strip() or "gen-000000"
+        except FileNotFoundError:
+            return "gen-000000"
+
+    def _read_pool_ids(self) -> list[str]:
+        try:
+            with open(self._file(POOLS_FILE), encoding="utf-8") as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def _repair(self) -> int:
+        """Trim column files to the longest complete row. Returns the row count."""
+        sizes = {}
+        for name, dtype in COLUMN_DTYPES.items():
+            file = self._file(name)
+            sizes[name] = os.path.getsize(file) // dtype.itemsize if os.path.exists(file) else 0
+
+        rows = min(sizes.values())
+        for name, dtype in COLUMN_DTYPES.items():
+            with open(self._file(name), "ab") as f:
+                f.truncate(rows * dtype.itemsize)
+        return rows
+
+    def _columns(self) -> dict[str, np.ndarray]:
+        """Memory-mapped columns covering every complete row. Lock held."""
+        if self._mapped_rows != self._rows:
+            self._mapped = {
+                name: (
+                    np.memmap(self._file(name), dtype=dtype, mode="r", shape=(self._rows,))
+                    if self._rows else np.empty(0, dtype=dtype)
+                )
+                for name, dtype in COLUMN_DTYPES.items()
+            }
+            self._mapped_rows = self._rows
+        return self._mapped
+
+    def _write_generation(
+        self,
+        pool_ids: list[str],
+        chunks: Iterable[dict[str, np.ndarray]],
+    ) -> int:
+        """
+        Write a generation chunk by chunk and make it current. Lock held.
+
+        Returns:
+            Number of rows written
+        """
+        number = int(self._generation.rsplit("-", 1)[-1]) + 1
+        generation = f"gen-{number:06d}"
+        target = os.path.join(self.path, generation)
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(target)
+
+        with open(os.path.join(target, POOLS_FILE), "w", encoding="utf-8") as f:
+            f.write("".join(f"{pool_id}\n" for pool_id in pool_ids))
+        rows = 0
+        with contextlib.ExitStack() as stack:
+            files = {
+                name: stack.enter_context(open(os.path.join(target, name), "wb"))
+                for name in COLUMN_DTYPES
+            }
+            for chunk in chunks:
+                for name, dtype in COLUMN_DTYPES.items():
+                    files[name].write(chunk[name].astype(dtype, copy=False).tobytes())
+                rows += len(chunk["time"])
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+
+        current = os.path.join(self.path, CURRENT_FILE)
+        with open(f"{current}.tmp", "w", encoding="utf-8") as f:
+            f.write(generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{current}.tmp", current)
+
+        previous = self._generation_path
+        self._generation = generation
+        shutil.rmtree(previous, ignore_errors=True)
+        return rows
+
+
+# ==============================================================================
+# HELPER FUNCTIONS
+# ==============================================================================
+
+
+def _chunk_bounds(
+    times: np.ndarray,
+    start: int,
+    end: int,
+    chunk_rows: int,
+    bucket_seconds: Optional[int] = None,
+) -> Iterator[tuple[int, int]]:
+    """
+    Split the rows [start, end) into consecutive chunks of about chunk_rows.
+
+    With bucket_seconds, each chunk is extended to the end of the bucket
+    its last row falls in, so no bucket spans two chunks.
+    """
+    while start < end:
+        stop = min(start + max(chunk_rows, 1), end)
+        if bucket_seconds is not None and stop < end:
+            edge = (np.floor(times[stop - 1] / bucket_seconds) + 1) * bucket_seconds
+            stop = min(int(np.searchsorted(times, edge, side="left")), end)
+        yield start, stop
+        start = stop
+
+
+def _compacted_chunks(
+    columns: dict[str, np.ndarray],
+    tiers: list[tuple[int, int, Optional[int]]],
+    recode: np.ndarray,
+    chunk_rows: int,
+) -> Iterator[dict[str, np.ndarray]]:
+    """
+    Compacted rows of each (start, end, bucket_seconds) tier, in time order.
+
+    Tiers without a bucket are copied as they are. Pool codes are mapped
+    through recode.
+    """
+    times = columns["time"]
+    for begin, end, bucket_seconds in tiers:
+        for start, stop in _chunk_bounds(times, begin, end, chunk_rows, bucket_seconds):
+            chunk = {name: values[start:stop] for name, values in columns.items()}
+            if bucket_seconds is not None:
+                chunk = _downsample(chunk, bucket_seconds)
+                order = np.lexsort((chunk["pool"], chunk["time"]))
+                chunk = {name: values[order] for name, values in chunk.items()}
+            chunk["pool"] = recode[chunk["pool"]]
+            yield chunk
+
+
+def _downsample(columns: dict[str, np.ndarray], bucket_seconds: int) -> dict[str, np.ndarray]:
+    """
+    Average rows per pool and time bucket.
+
+    Each output row is stamped with its bucket's start time, and rows
+    are ordered by pool, then time. Every column other than time and
+    pool is averaged; missing values are ignored, and a bucket with
+    none stays NaN.
+    """
+    times = columns["time"]
+    codes = columns["pool"].astype(np.int64)
+    buckets = np.floor(times / bucket_seconds).astype(np.int64)
+
+    order = np.lexsort((buckets, codes))
+    keys = np.stack([codes[order], buckets[order]])
+    if not keys.shape[1]:
+        return {name: np.empty(0, dtype=COLUMN_DTYPES[name]) for name in columns}
+
+    boundaries = np.flatnonzero(np.any(keys[:, 1:] != keys[:, :-1], axis=0)) + 1
+    starts = np.concatenate([[0], boundaries])
+
+    result = {
+        "time": (keys[1, starts] * bucket_seconds).astype(np.float64),
+        "pool": keys[0, starts],
+    }
+    for field in [name for name in columns if name not in ("time", "pool")]:
+        values = columns[field][order].astype(np.float64)
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[field] = np.where(counts > 0, sums / counts, np.nan)
+
+    return result
+
+
+def _max_drawdowns(points: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Largest relative fall from a running peak, per group of contiguous points.
+
+    A grouped running maximum without a Python loop or a sort: each
+    float32 is mapped to a uint32 with the same ordering, the group
+    number goes in the high 32 bits, and one cumulative max over the
+    resulting int64 keys then never crosses a group boundary. The low
+    bits of the running key map back to the exact peak value.
+    """
+    bits = points.astype("<f4").view(np.uint32)
+    negative = (bits >> 31).astype(bool)
+    ordered = np.where(negative, ~bits, bits | np.uint32(0x80000000)).astype(np.int64)
+
+    groups = np.repeat(np.arange(len(starts), dtype=np.int64), counts)
+    peak_keys = np.maximum.accumulate((groups << 32) | ordered) & 0xFFFFFFFF
+
+    peak_bits = peak_keys.astype(np.uint32)
+    positive = (peak_bits >> 31).astype(bool)
+    peak_bits = np.where(positive, peak_bits & np.uint32(0x7FFFFFFF), ~peak_bits)
+    peaks = peak_bits.view(np.float32).astype(np.float64)
+
+    values = points.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        drawdowns = np.where(peaks > 0, (peaks - values) / peaks, 0.0)
+    return np.maximum.reduceat(drawdowns, starts)
@@ -0,0 +1,171 @@
+"""
+================================================================================
+    POOL IDENTITY
+    One key per listing, and collapsing of known wrapper listings
+
+    A listing is identified by its exact project slug and DeFiLlama pool
+    id; versions of a protocol (aave-v2, aave-v3) and same-token pools
+    inside one project (fee tiers, maturities, separate vaults) are
+    different markets and keep separate keys. The only listings that
+    collapse are repeated pool ids and the hand-listed wrappers in
+    WRAPPED_PROTOCOLS, whose pools hold another protocol's pool
+    one-to-one (Convex on Curve, Aura on Balancer). A wrapper listing
+    joins the wrapped pool with the same chain and underlying token
+    addresses, and only when exactly one such pool is listed.
+================================================================================
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Hashable, Iterable, Optional, TypeVar
+
+from yield_agent.tools.vocabulary import CHAINS
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+# Wrapper project slugs whose pools hold one pool of another project,
+# mapped to the slug of the project they wrap.
+WRAPPED_PROTOCOLS: dict[str, str] = {
+    "convex-finance": "curve-dex",
+    "stakedao": "curve-dex",
+    "aura": "balancer-v2",
+}
+
+# (chain code, project slug, sorted lowercase underlying addresses).
+Position = tuple[int, str, tuple[str, ...]]
+
+Row = TypeVar("Row")
+
+
+# ==============================================================================
+# IDENTITY
+# ==============================================================================
+
+
+def underlying_tokens(opportunity: Any) -> Any:
+    """Underlying token addresses of a YieldOpportunity or PoolCandidate."""
+    tokens = getattr(opportunity, "underlying_tokens", None)
+    if tokens is None and hasattr(opportunity, "pool"):
+        tokens = opportunity.pool.underlying_tokens
+    return tokens
+
+
+def identity_key(opportunity: Any) -> Hashable:
+    """
+    Identity of a pool listing: its exact project slug and pool id.
+
+    Args:
+        opportunity: YieldOpportunity or PoolCandidate
+
+    Returns:
+        (lowercase project slug, pool_id)
+    """
+    return (opportunity.protocol_slug.lower(), opportunity.pool_id)
+
+
+def position_key(opportunity: Any, project: Optional[str] = None) -> Optional[Position]:
+    """
+    Chain, project and underlying tokens of a listing, for wrapper matching.
+
+    Args:
+        opportunity: YieldOpportunity or PoolCandidate
+        project: Project slug to key under (default: the listing's own)
+
+    Returns:
+        The position, or None without usable underlying tokens
+    """
+    tokens = underlying_tokens(opportunity)
+    if (
+        not isinstance(tokens, (list, tuple))
+        or not tokens
+        or not all(isinstance(token, str) and token for token in tokens)
+    ):
+        return None
+
+    return (
+        CHAINS.code(opportunity.chain),
+        project or opportunity.protocol_slug.lower(),
+        tuple(sorted({token.lower() for token in tokens})),
+    )
+
+
+# ==============================================================================
+# DEDUPLICATION
+# ==============================================================================
+
+
+def by_tvl(opportunity: Any) -> float:
+    """Default representative ranking: the listing holding the most TVL."""
+    return opportunity.tvl_usd
+
+
+def dedupe_pools(
+    opportunities: Iterable[Row],
+    rank: Callable[[Any], Any] = by_tvl,
+    key: Callable[[Any], Hashable] = identity_key,
+) -> list[Row]:
+    """
+    Collapse repeated listings and known wrapper listings into one.
+
+    A wrapper listing takes the identity of the wrapped pool it matches
+    (see WRAPPED_PROTOCOLS); ambiguous or unmatched wrappers keep their
+    own. Each group keeps the position of its first listing and is
+    represented by the listing with the highest ``rank`` (the earliest
+    one on ties), so the output order follows the input order.
+
+    Args:
+        opportunities: YieldOpportunity models or PoolCandidate rows
+        rank: Sort key; the highest value represents its group
+        key: Identity of each row
+
+    Returns:
+        One row per identity
+    """
+    rows = list(opportunities)
+    identities = [key(row) for row in rows]
+
+    # Wrapped pools by position; None marks a position listed twice.
+    wrapped_slugs = set(WRAPPED_PROTOCOLS.values())
+    wrapped: dict[Position, Optional[Hashable]] = {}
+    for row, identity in zip(rows, identities):
+        if row.protocol_slug.lower() not in wrapped_slugs:
+            continue
+        position = position_key(row)
+        if position is None:
+            continue
+        if wrapped.get(position, identity) != identity:
+            identity = None
+        wrapped[position] = identity
+
+    if wrapped:
+        for i, row in enumerate(rows):
+            target = WRAPPED_PROTOCOLS.get(row.protocol_slug.lower())
+            if target is None:
+                continue
+            position = position_key(row, target)
+            match = wrapped.get(position) if position is not None else None
+            if match is not None:
+                identities[i] = match
+
+    slots: dict[Hashable, int] = {}
+    kept: list[Row] = []
+    ranks: list[Any] = []
+
+    for opportunity, identity in zip(rows, identities):
+        slot: Optional[int] = slots.get(identity)
+        if slot is None:
+            slots[identity] = len(kept)
+            kept.append(opportunity)
+            ranks.append(rank(opportunity))
+            continue
+
+        value = rank(opportunity)
+        if value > ranks[slot]:
+            kept[slot] = opportunity
+            ranks[slot] = value
+
+    return kept
@@ -0,0 +1,190 @@
+"""
+================================================================================
+    POOL SEARCH INDEX
+    Inverted index over pool symbols and projects
+
+    Maps symbol components (split on "-" and "/"), project slugs and
+    their character trigrams to row ids of a PoolTable, so a token or
+    protocol search touches only the rows that can match.
+================================================================================
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+GRAM_SIZE = 3
+
+SYMBOL_SEPARATORS = ("-", "/")
+
+EMPTY_ROWS = np.empty(0, dtype=np.int32)
+
+
+# ==============================================================================
+# INDEX CLASS
+# ==============================================================================
+
+
+class PoolSearchIndex:
+    """
+    Substring search over pool symbols and project names.
+
+    A query without separators can only occur inside a single symbol
+    component, so components are indexed instead of whole symbols.
+    Candidate terms come from intersecting trigram postings and are
+    verified with a plain substring test, which keeps the exact
+    semantics of ``query in symbol or query in project``.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        project_names: list[str],
+        project_codes: np.ndarray,
+        chain_codes: np.ndarray,
+    ):
+        self.size = len(project_codes)
+
+        symbol_rows: dict[str, list[int]] = {}
+        for row, symbol in enumerate(symbols):
+            symbol_rows.setdefault(symbol.lower(), []).append(row)
+        self.symbol_rows = _to_postings(symbol_rows)
+
+        component_rows: dict[str, list[np.ndarray]] = {}
+        for symbol, rows in self.symbol_rows.items():
+            for component in set(_split_symbol(symbol)):
+                component_rows.setdefault(component, []).append(rows)
+        self.component_rows = {
+            component: _union(postings) for component, postings in component_rows.items()
+        }
+
+        project_rows: dict[str, list[np.ndarray]] = {}
+        rows_by_code = _group_rows(project_codes, len(project_names))
+        for code, name in enumerate(project_names):
+            project_rows.setdefault(name.lower(), []).append(rows_by_code[code])
+        self.project_rows = {
+            project: _union(postings) for project, postings in project_rows.items()
+        }
+
+        self.chain_codes = chain_codes
+        chain_count = int(chain_codes.max()) + 1 if len(chain_codes) else 0
+        self.chain_rows = _group_rows(chain_codes, chain_count)
+
+        self._terms: list[tuple[str, np.ndarray]] = list(self.component_rows.items())
+        self._terms.extend(self.project_rows.items())
+
+        grams: dict[str, set[int]] = {}
+        for term_id, (term, _) in enumerate(self._terms):
+            for gram in _grams(term):
+                grams.setdefault(gram, set()).add(term_id)
+        self._grams = grams
+
+    # --------------------------------------------------------------------------
+    # QUERIES
+    # --------------------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        chain_codes: Optional[Iterable[int]] = None,
+    ) -> np.ndarray:
+        """
+        Row ids whose symbol or project contains the query.
+
+        Args:
+            query: Case-insensitive search term
+            chain_codes: Optional chain codes to restrict matches to
+
+        Returns:
+            Sorted int32 array of matching row ids
+        """
+        query_lower = query.lower()
+        codes = None
+        if chain_codes is not None:
+            codes = np.fromiter(chain_codes, dtype=np.int32)
+
+        if not query_lower:
+            if codes is None:
+                return np.arange(self.size, dtype=np.int32)
+            return _union([self.chain_rows[code] for code in codes if code < len(self.chain_rows)])
+
+        if any(sep in query_lower for sep in SYMBOL_SEPARATORS):
+            rows = self._scan(query_lower, self.symbol_rows.items(), self.project_rows.items())
+        else:
+            rows = _union([postings for _, postings in self._candidates(query_lower)])
+
+        if codes is not None:
+            rows = rows[np.isin(self.chain_codes[rows], codes)]
+
+        return rows
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _candidates(self, query_lower: str) -> list[tuple[str, np.ndarray]]:
+        """Terms containing the query, narrowed by trigram postings."""
+        if len(query_lower) < GRAM_SIZE:
+            return [(term, rows) for term, rows in self._terms if query_lower in term]
+
+        term_ids: Optional[set[int]] = None
+        for gram in _grams(query_lower):
+            postings = self._grams.get(gram)
+            if not postings:
+                return []
+            term_ids = set(postings) if term_ids is None else term_ids & postings
+
+        return [
+            self._terms[term_id]
+            for term_id in term_ids or ()
+            if query_lower in self._terms[term_id][0]
+        ]
+
+    def _scan(self, query_lower: str, *term_groups) -> np.ndarray:
+        """Substring scan over distinct terms, for queries containing separators."""
+        return _union([
+            rows
+            for terms in term_groups
+            for term, rows in terms
+            if query_lower in term
+        ])
+
+
+# ==============================================================================
+# HELPER FUNCTIONS
+# ==============================================================================
+
+
+def _split_symbol(symbol: str) -> list[str]:
+    return symbol.replace("/", "-").split("-")
+
+
+def _grams(term: str) -> set[str]:
+    return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+
+
+def _to_postings(rows: dict[str, list[int]]) -> dict[str, np.ndarray]:
+    return {key: np.array(values, dtype=np.int32) for key, values in rows.items()}
+
+
+def _group_rows(codes: np.ndarray, size: int) -> list[np.ndarray]:
+    """Sorted row ids for each code in ``range(size)``."""
+    order = np.argsort(codes, kind="stable").astype(np.int32)
+    bounds = np.searchsorted(codes[order], np.arange(size + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(size)]
+
+
+def _union(postings: list[np.ndarray]) -> np.ndarray:
+    if not postings:
+        return EMPTY_ROWS
+    if len(postings) == 1:
+        return postings[0]
+    return np.unique(np.concatenate(postings))
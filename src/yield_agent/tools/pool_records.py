@@ -0,0 +1,291 @@
+"""
+================================================================================
+    POOL RECORDS
+    Typed, field-projected schema for DeFiLlama /pools entries
+
+    A /pools entry carries two dozen fields; the client reads twelve.
+    PoolRecord declares only those, so the msgspec decoder skips every
+    other key without building it and each pool becomes a compact,
+    non-GC-tracked struct instead of a dict. Chain, project, symbol and
+    token address strings are interned, so the thousands of pools that
+    repeat them share one string object each, across snapshots too.
+
+    Run this module directly to benchmark the decoders:
+
+        python src/yield_agent/tools/pool_records.py
+================================================================================
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable, Optional
+
+import msgspec
+
+from yield_agent.state import SUPPORTED_CHAINS
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+SNAPSHOT_MIN_TVL_USD = float(os.getenv("SNAPSHOT_MIN_TVL_USD", 10_000))
+
+SNAPSHOT_CHAINS = [config["defillama_slug"] for config in SUPPORTED_CHAINS.values()]
+
+
+# ==============================================================================
+# SCHEMA
+# ==============================================================================
+
+
+class PoolRecord(msgspec.Struct, gc=False, rename="camel"):
+    """
+    One DeFiLlama pool, projected to the fields the client reads.
+
+    Fields are snake_case and decode from upstream's camelCase keys
+    (POOL_KEYS). Missing and null values both decode to None. Token
+    lists are left untyped because upstream occasionally sends
+    ``rewardTokens`` as a string; the client validates them when
+    building a YieldOpportunity.
+    """
+
+    pool: Optional[str] = None
+    project: Optional[str] = None
+    symbol: Optional[str] = None
+    chain: Optional[str] = None
+    apy: Optional[float] = None
+    apy_base: Optional[float] = None
+    apy_reward: Optional[float] = None
+    # Named explicitly: camel-casing would give "apyMean7D".
+    apy_mean_7d: Optional[float] = msgspec.field(default=None, name="apyMean7d")
+    apy_mean_30d: Optional[float] = msgspec.field(default=None, name="apyMean30d")
+    tvl_usd: Optional[float] = None
+    underlying_tokens: Any = None
+    reward_tokens: Any = None
+
+
+class PoolsResponse(msgspec.Struct):
+    """Envelope of the /pools response."""
+
+    data: list[PoolRecord] = []
+
+
+# Attribute names, and the /pools keys they decode from, in field order.
+POOL_FIELDS: tuple[str, ...] = PoolRecord.__struct_fields__
+POOL_KEYS: tuple[str, ...] = PoolRecord.__struct_encode_fields__
+
+# strict=False lets numeric strings such as "12.5" decode into floats.
+_response_decoder = msgspec.json.Decoder(PoolsResponse, strict=False)
+
+
+# ==============================================================================
+# DECODING
+# ==============================================================================
+
+
+def decode_pools(
+    body: bytes,
+    chains: Optional[Iterable[str]] = SNAPSHOT_CHAINS,
+    min_tvl: float = SNAPSHOT_MIN_TVL_USD,
+) -> list[PoolRecord]:
+    """
+    Decode a complete /pools body into PoolRecords.
+
+    Args:
+        body: Raw response body
+        chains: DeFiLlama chain names to keep (None = all chains)
+        min_tvl: Minimum TVL in USD
+
+    Returns:
+        Records on the given chains with at least min_tvl
+
+    Raises:
+        msgspec.DecodeError: If the body is not a valid /pools payload
+    """
+    records = _response_decoder.decode(body).data
+    chain_set = {c.lower() for c in chains} if chains is not None else None
+    return [
+        intern_strings(record) for record in records
+        if keep_pool(record.chain, record.tvl_usd, chain_set, min_tvl)
+    ]
+
+
+def keep_pool(
+    chain: Any,
+    tvl: Any,
+    chains: Optional[set[str]],
+    min_tvl: float,
+) -> bool:
+    """Snapshot filter shared by the decoders; ``chains`` is lowercased."""
+    if chains is not None and (not isinstance(chain, str) or chain.lower() not in chains):
+        return False
+    return (tvl or 0) >= min_tvl
+
+
+def intern_strings(record: PoolRecord) -> PoolRecord:
+    """Replace a record's repeated strings with interned copies, in place."""
+    if type(record.chain) is str:
+        record.chain = sys.intern(record.chain)
+    if type(record.project) is str:
+        record.project = sys.intern(record.project)
+    if type(record.symbol) is str:
+        record.symbol = sys.intern(record.symbol)
+
+    tokens = record.underlying_tokens
+    if type(tokens) is list and all(type(token) is str for token in tokens):
+        record.underlying_tokens = [sys.intern(token) for token in tokens]
+
+    return record
+
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+
+
+def synthetic_pools_body(pool_count: int = 20_000, seed: int = 7) -> bytes:
+    """
+    Build a /pools body shaped like the live API, unused fields included.
+
+    Args:
+        pool_count: Number of pools in the payload
+        seed: Random seed, so runs are comparable
+
+    Returns:
+        JSON-encoded response body
+    """
+    rng = random.Random(seed)
+    chains = ["Ethereum", "Arbitrum", "Base", "Polygon", "Solana", "Tron", "Sui", "Aptos"]
+    tokens = ["USDC", "USDT", "DAI", "WETH", "WBTC", "STETH", "ARB", "OP", "SOL"]
+
+    data = []
+    for i in range(pool_count):
+        tvl = rng.uniform(0, 5e7)
+        apy = rng.uniform(0, 40)
+        data.append({
+            "chain": rng.choice(chains),
+            "project": f"protocol-{rng.randrange(400)}",
+            "symbol": "-".join(rng.sample(tokens, rng.choice([1, 1, 2]))),
+            "tvlUsd": tvl,
+            "apyBase": apy * 0.8,
+            "apyReward": apy * 0.2,
+            "apy": apy,
+            "rewardTokens": ["0x" + "ab" * 20] if rng.random() < 0.3 else None,
+            "pool": f"{i:08x}-0000-4000-8000-{rng.randrange(1 << 48):012x}",
+            "apyPct1D": rng.uniform(-1, 1),
+            "apyPct7D": rng.uniform(-1, 1),
+            "apyPct30D": rng.uniform(-1, 1),
+            "stablecoin": rng.random() < 0.4,
+            "ilRisk": rng.choice(["no", "yes"]),
+            "exposure": rng.choice(["single", "multi"]),
+            "predictions": {
+                "predictedClass": rng.choice(["Stable/Up", "Down"]),
+                "predictedProbability": rng.randrange(50, 100),
+                "binnedConfidence": rng.randrange(1, 4),
+            },
+            "poolMeta": None,
+            "mu": rng.uniform(0, 20),
+            "sigma": rng.uniform(0, 2),
+            "count": rng.randrange(1, 1000),
+            "outlier": False,
+            "underlyingTokens": ["0x" + "cd" * 20] * rng.choice([1, 2]),
+            "il7d": None,
+            "apyBase7d": None,
+            "apyMean30d": apy * 1.05,
+            "volumeUsd1d": None,
+            "volumeUsd7d": None,
+            "apyBaseInception": None,
+        })
+
+    return json.dumps({"status": "success", "data": data}).encode()
+
+
+def benchmark_decoders(
+    body: Optional[bytes] = None,
+    rounds: int = 3,
+) -> dict[str, dict[str, float]]:
+    """
+    Compare decode time and memory of the /pools decoding paths.
+
+    - ``json_dicts``: ``response.json()`` then the snapshot filter on dicts
+    - ``stream``: the incremental PoolStreamDecoder
+    - ``struct``: decode_pools into PoolRecords
+
+    Args:
+        body: Response body to decode (defaults to a synthetic payload)
+        rounds: Timing rounds; the fastest is reported
+
+    Returns:
+        Per-path seconds, peak traced MB while decoding, and retained MB
+        for the kept pools
+    """
+    from yield_agent.tools.pool_stream import PoolStreamDecoder
+
+    if body is None:
+        body = synthetic_pools_body()
+
+    chain_set = {c.lower() for c in SNAPSHOT_CHAINS}
+
+    def json_dicts() -> list[dict[str, Any]]:
+        return [
+            pool for pool in json.loads(body)["data"]
+            if keep_pool(pool.get("chain"), pool.get("tvlUsd"), chain_set, SNAPSHOT_MIN_TVL_USD)
+        ]
+
+    def stream() -> list[PoolRecord]:
+        decoder = PoolStreamDecoder()
+        for start in range(0, len(body), 65_536):
+            decoder.feed(body[start:start + 65_536])
+        return decoder.close()
+
+    def struct() -> list[PoolRecord]:
+        return decode_pools(body)
+
+    results = {}
+    for name, decode in (("json_dicts", json_dicts), ("stream", stream), ("struct", struct)):
+        results[name] = _measure(decode, rounds)
+
+    return results
+
+
+def _measure(decode: Callable[[], list[Any]], rounds: int) -> dict[str, float]:
+    best = float("inf")
+    for _ in range(rounds):
+        gc.collect()
+        started = time.perf_counter()
+        pools = decode()
+        best = min(best, time.perf_counter() - started)
+        del pools
+
+    gc.collect()
+    tracemalloc.start()
+    pools = decode()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": round(best, 4),
+        "peak_mb": round(peak / 1e6, 1),
+        "retained_mb": round(retained / 1e6, 1),
+        "pools": len(pools),
+    }
+
+
+if __name__ == "__main__":
+    payload = synthetic_pools_body()
+    print(f"Payload: {len(payload) / 1e6:.1f} MB")
+    print(f"{'decoder':<12}{'seconds':>10}{'peak MB':>10}{'kept MB':>10}{'pools':>8}")
+    for decoder_name, result in benchmark_decoders(payload).items():
+        print(
+            f"{decoder_name:<12}{result['seconds']:>10}{result['peak_mb']:>10}"
+            f"{result['retained_mb']:>10}{result['pools']:>8}"
+        )
@@ -0,0 +1,209 @@
+"""
+================================================================================
+    POOL RISK
+    Per-pool risk attributes derived once per snapshot
+
+    Impermanent-loss class, composite risk score, audit status and
+    protocol launch date depend only on snapshot data, so PoolTable
+    computes them as columns when a snapshot is built. IL risk is
+    classified once per distinct symbol, from the token families the
+    taxonomy resolves its components to, and the risk score is a few
+    vectorized comparisons; only protocol age, which changes daily, is
+    derived at read time from a stored launch day.
+================================================================================
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from yield_agent.state import ILRisk
+from yield_agent.tools.token_taxonomy import FAMILY_BTC, FAMILY_ETH, FAMILY_STABLE, TOKENS
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+KNOWN_AUDITED_PROTOCOLS = {
+    "aave-v3",
+    "aave-v2",
+    "compound-v3",
+    "compound-v2",
+    "lido",
+    "rocket-pool",
+    "maker",
+    "curve-dex",
+    "convex-finance",
+    "yearn-finance",
+    "uniswap-v3",
+    "uniswap-v2",
+    "sushiswap",
+    "balancer-v2",
+    "frax-ether",
+    "instadapp",
+    "morpho",
+    "spark",
+    "eigenlayer",
+    "pendle",
+    "gmx",
+    "radiant-v2",
+    "stargate",
+    "velodrome-v2",
+    "aerodrome",
+    "benqi",
+    "trader-joe",
+    "pancakeswap-amm-v3",
+}
+
+PROTOCOL_LAUNCH_DATES: dict[str, str] = {
+    "aave-v3": "2023-01-27",
+    "aave-v2": "2020-12-03",
+    "compound-v3": "2022-08-26",
+    "compound-v2": "2019-05-07",
+    "lido": "2020-12-18",
+    "rocket-pool": "2021-11-08",
+    "maker": "2017-12-18",
+    "curve-dex": "2020-01-20",
+    "convex-finance": "2021-05-17",
+    "yearn-finance": "2020-07-17",
+    "uniswap-v3": "2021-05-05",
+    "uniswap-v2": "2020-05-18",
+}
+
+# Families whose members track one price, so pairing them is low-IL.
+CORRELATED_FAMILIES = FAMILY_ETH | FAMILY_BTC
+
+# IL risk code -> level; codes index IL_RISK_ADJUSTMENTS too.
+IL_RISK_LEVELS: tuple[ILRisk, ...] = (ILRisk.NONE, ILRisk.LOW, ILRisk.MEDIUM, ILRisk.HIGH)
+IL_RISK_ADJUSTMENTS = np.array([-0.5, 0.0, 0.5, 1.5])
+
+# IL risk code for a symbol that is not a string and cannot be parsed.
+NO_IL_RISK = -1
+
+# Launch day for protocols without a known launch date.
+NO_LAUNCH_DAY = 0
+
+IL_RISK_CODES = {level: code for code, level in enumerate(IL_RISK_LEVELS)}
+
+
+# ==============================================================================
+# CLASSIFICATION
+# ==============================================================================
+
+
+def project_slug(project: str) -> str:
+    """DeFiLlama project name to the slug used by the protocol tables."""
+    return project.lower().replace(" ", "-")
+
+
+def classify_il_risk(symbol: str) -> ILRisk:
+    """Impermanent loss risk of a pool, judged from its symbol's token families."""
+    is_single = "-" not in symbol and "/" not in symbol
+    if is_single:
+        return ILRisk.NONE
+
+    families = [family for _, family in TOKENS.components(symbol)]
+    stable_count = families.count(FAMILY_STABLE)
+
+    if families and stable_count == len(families):
+        return ILRisk.LOW
+
+    # ETH with its staking tokens, or BTC with its wrappers.
+    if len(set(families)) == 1 and families[0] & CORRELATED_FAMILIES:
+        return ILRisk.MEDIUM
+
+    if stable_count >= 1:
+        return ILRisk.MEDIUM
+
+    return ILRisk.HIGH
+
+
+def launch_day(slug: str) -> int:
+    """Proleptic ordinal of a protocol's launch date, or NO_LAUNCH_DAY."""
+    launch_date_str = PROTOCOL_LAUNCH_DATES.get(slug)
+    if not launch_date_str:
+        return NO_LAUNCH_DAY
+
+    try:
+        return datetime.strptime(launch_date_str, "%Y-%m-%d").toordinal()
+    except ValueError:
+        return NO_LAUNCH_DAY
+
+
+def protocol_age_days(launch: int, today: Optional[date] = None) -> int:
+    """Days since a launch day from launch_day(), 0 if unknown."""
+    if launch == NO_LAUNCH_DAY:
+        return 0
+    return (today or date.today()).toordinal() - launch
+
+
+# ==============================================================================
+# COLUMNS
+# ==============================================================================
+
+
+def il_risk_codes(symbols: Sequence[Any]) -> np.ndarray:
+    """
+    IL risk code per row, classifying each distinct symbol once.
+
+    Args:
+        symbols: Per-row pool symbols (None counts as empty)
+
+    Returns:
+        int8 codes into IL_RISK_LEVELS, NO_IL_RISK for non-string symbols
+    """
+    by_symbol: dict[Any, int] = {}
+
+    def code(symbol: Any) -> int:
+        symbol = symbol or ""
+        if not isinstance(symbol, str):
+            return NO_IL_RISK
+        found = by_symbol.get(symbol)
+        if found is None:
+            found = by_symbol[symbol] = IL_RISK_CODES[classify_il_risk(symbol)]
+        return found
+
+    return np.fromiter(map(code, symbols), dtype=np.int8, count=len(symbols))
+
+
+def risk_scores(
+    tvl: np.ndarray,
+    apy: np.ndarray,
+    audited: np.ndarray,
+    il_codes: np.ndarray,
+) -> np.ndarray:
+    """
+    Composite risk score from 1-10 per row.
+
+    Factors:
+    - TVL (higher = safer)
+    - Protocol reputation (audited = safer)
+    - APY sustainability (very high APY = riskier)
+    - Impermanent loss risk
+
+    Args:
+        tvl: TVL in USD, 0 where missing
+        apy: APY percentage, 0 where missing
+        audited: Whether each row's protocol is audited
+        il_codes: Codes from il_risk_codes()
+
+    Returns:
+        float64 scores rounded to one decimal
+    """
+    score = np.full(len(tvl), 5.0)
+
+    score += np.select(
+        [tvl > 1_000_000_000, tvl > 100_000_000, tvl > 10_000_000, tvl > 1_000_000, tvl < 500_000],
+        [-2.0, -1.5, -1.0, -0.5, 1.0],
+        default=0.0,
+    )
+    score -= np.where(audited, 1.5, 0.0)
+    score += np.select([apy > 100, apy > 50, apy > 20], [2.5, 1.5, 0.5], default=0.0)
+    score += np.where(il_codes >= 0, IL_RISK_ADJUSTMENTS[np.maximum(il_codes, 0)], 0.0)
+
+    return np.round(np.clip(score, 1.0, 10.0), 1)
@@ -0,0 +1,257 @@
+"""
+================================================================================
+    POOL SHARDS
+    Per-chain partitions of a pool snapshot
+
+    Each shard holds the rows of one DeFiLlama chain as its own PoolTable,
+    with its own search index, so a request scoped to a few chains
+    filters and searches only their rows. Shards are rebuilt on the
+    refresh path, and only when their content changed: a shard whose
+    rows hash the same as in the previous snapshot keeps its table and
+    its version number, and a changed shard is rebuilt with the next
+    version.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import sys
+import time
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+from yield_agent.state import SUPPORTED_CHAINS
+from yield_agent.tools.pool_records import PoolRecord
+from yield_agent.tools.pool_table import CHAIN_KEYS_BY_SLUG, NUMERIC_COLUMNS, PoolTable
+
+
+# ==============================================================================
+# SHARD ROWS
+# ==============================================================================
+
+
+class PoolRows(Sequence[PoolRecord]):
+    """
+    The records of some rows of a snapshot, in row order.
+
+    Indexes into the snapshot's own sequence, so records that are built
+    lazily (a warm-started snapshot) stay unbuilt until a shard row is
+    actually read.
+    """
+
+    def __init__(self, pools: Sequence[PoolRecord], rows: np.ndarray):
+        self._pools = pools
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._pools[int(i)] for i in self._rows[row]]
+        return self._pools[int(self._rows[row])]
+
+    def __iter__(self) -> Iterator[PoolRecord]:
+        for row in self._rows.tolist():
+            yield self._pools[row]
+
+
+# ==============================================================================
+# SHARD CLASS
+# ==============================================================================
+
+
+class PoolShard:
+    """
+    One chain's rows of a snapshot.
+
+    ``rows`` maps shard rows to rows of the full snapshot table and is
+    ascending, so shard row order is snapshot row order. ``version``
+    starts at 1 and increases each time the shard's content changes;
+    ``changed_at`` is when that last happened.
+    """
+
+    def __init__(
+        self,
+        chain: str,
+        rows: np.ndarray,
+        table: PoolTable,
+        content_hash: str,
+        version: int = 1,
+        changed_at: Optional[float] = None,
+    ):
+        self.chain = chain
+        self.rows = rows
+        self.table = table
+        self.content_hash = content_hash
+        self.version = version
+        self.changed_at = changed_at if changed_at is not None else time.time()
+        self._nbytes: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the shard's columns and indexes."""
+        # Shards are never mutated, so the walk is done once.
+        if self._nbytes is None:
+            self._nbytes = self.rows.nbytes + _footprint(self.table, set())
+        return self._nbytes
+
+    def stats(self) -> dict[str, Any]:
+        """Size, version and age of the shard."""
+        return {
+            "pools": len(self),
+            "version": self.version,
+            "bytes": self.nbytes(),
+            "changed_seconds_ago": round(max(0.0, time.time() - self.changed_at), 1),
+        }
+
+
+# ==============================================================================
+# BUILDING
+# ==============================================================================
+
+
+def build_shards(
+    table: PoolTable,
+    previous: Optional[dict[str, PoolShard]] = None,
+) -> dict[str, PoolShard]:
+    """
+    Partition a snapshot table by chain.
+
+    Args:
+        table: Table of the full snapshot
+        previous: Shards of the snapshot being replaced, reused where
+            their content is unchanged
+
+    Returns:
+        Shards keyed by lowercase DeFiLlama chain name
+    """
+    previous = previous or {}
+    shards: dict[str, PoolShard] = {}
+
+    for code, rows in table.group_by_chain(np.arange(len(table))).items():
+        chain = table.chain_names[code]
+        pools = PoolRows(table.pools, rows)
+        content_hash = _content_hash(table, rows)
+        old = previous.get(chain)
+
+        if old is not None and old.content_hash == content_hash:
+            # Same rows in the same order: only the records are new.
+            shard_table = copy.copy(old.table)
+            shard_table.pools = pools
+            shards[chain] = PoolShard(
+                chain, rows, shard_table, content_hash, old.version, old.changed_at
+            )
+            continue
+
+        shards[chain] = PoolShard(
+            chain,
+            rows,
+            _shard_table(table, rows, pools),
+            content_hash,
+            version=old.version + 1 if old is not None else 1,
+        )
+
+    return shards
+
+
+def select_shards(
+    shards: dict[str, PoolShard],
+    chains: Optional[Iterable[str]] = None,
+) -> dict[str, PoolShard]:
+    """
+    Shards for requested chain identifiers, keyed by those identifiers.
+
+    Unsupported chains and chains without pools are dropped. When two
+    identifiers resolve to the same DeFiLlama chain the first wins.
+    Without chains, every supported chain's shard is returned under its
+    agent chain key.
+    """
+    if chains is None:
+        return {
+            CHAIN_KEYS_BY_SLUG[name]: shard
+            for name, shard in shards.items() if name in CHAIN_KEYS_BY_SLUG
+        }
+
+    selected: dict[str, PoolShard] = {}
+    claimed: set[str] = set()
+    for chain in chains:
+        chain_config = SUPPORTED_CHAINS.get(chain.lower())
+        if not chain_config:
+            continue
+        name = chain_config["defillama_slug"].lower()
+        if name in shards and name not in claimed:
+            claimed.add(name)
+            selected[chain] = shards[name]
+    return selected
+
+
+# ==============================================================================
+# HELPER FUNCTIONS
+# ==============================================================================
+
+
+def _shard_table(table: PoolTable, rows: np.ndarray, pools: PoolRows) -> PoolTable:
+    """Slice a snapshot table's columns into a table of its own."""
+    return PoolTable.from_columns(
+        pools,
+        columns={column: getattr(table, column)[rows] for column in NUMERIC_COLUMNS},
+        chains=[table.chain_names[code] for code in table.chain_codes[rows].tolist()],
+        projects=[table.project_names[code] for code in table.project_codes[rows].tolist()],
+        symbols=[table.symbol_names[code] for code in table.symbol_codes[rows].tolist()],
+        pool_ids=table.pool_ids[rows],
+        underlying_masks=table.underlying_masks[rows],
+    )
+
+
+def _content_hash(table: PoolTable, rows: np.ndarray) -> str:
+    """
+    Hash of everything a shard table is built from.
+
+    Covers the numeric columns, ids, symbols, projects and token masks
+    of the rows, and the registry facts derived from the projects, so a
+    registry update rebuilds the shards it affects.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for column in (*NUMERIC_COLUMNS, "token_masks"):
+        hasher.update(np.ascontiguousarray(getattr(table, column)[rows]).tobytes())
+
+    project_codes = table.project_codes[rows]
+    hasher.update(table.project_audited[project_codes].tobytes())
+    hasher.update(table.project_launch_days[project_codes].tobytes())
+    for strings in (
+        table.pool_ids[rows].tolist(),
+        [table.symbol_names[code] for code in table.symbol_codes[rows].tolist()],
+        [table.project_names[code] for code in project_codes.tolist()],
+    ):
+        hasher.update("\x00".join(map(str, strings)).encode("utf-8", "surrogatepass"))
+    return hasher.hexdigest()
+
+
+def _footprint(value: Any, seen: set[int]) -> int:
+    """Bytes held by arrays and containers reachable from a table, counted once."""
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _footprint(key, seen) + _footprint(item, seen) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_footprint(item, seen) for item in value)
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if hasattr(value, "__dict__"):
+        # The records are shared with the snapshot, not held by the shard.
+        return sum(
+            _footprint(item, seen) for name, item in vars(value).items() if name != "pools"
+        )
+    return 0
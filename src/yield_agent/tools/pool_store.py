@@ -0,0 +1,318 @@
+"""
+================================================================================
+    POOL SNAPSHOT STORE
+    Compact on-disk copy of the last good /pools snapshot
+
+    Layout (little-endian):
+        magic (8 bytes) | format version (u32) | header length (u32)
+        header JSON, padded to 8 bytes
+        body of 8-byte aligned sections
+
+    The header lists each section's dtype, offset and length, the body
+    size and a CRC-32 of the body. Numeric fields are float64 columns
+    with NaN for missing values; string fields are int32 codes into a
+    shared string table (offsets + UTF-8 blob), with token lists stored
+    as JSON text. Loading memory-maps the body and uses the columns in
+    place, so a restarted process can serve pools before any download.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import json
+import operator
+import os
+import struct
+import tempfile
+import time
+import zlib
+from typing import Any, Iterator, Optional, Sequence
+
+import msgspec
+import numpy as np
+
+from yield_agent.tools.pool_records import POOL_FIELDS, PoolRecord
+from yield_agent.tools.pool_table import PoolTable
+from yield_agent.tools.token_taxonomy import TOKENS
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(".cache", "pools.snapshot"))
+
+MAGIC = b"WYPOOLS\x00"
+FORMAT_VERSION = 2
+
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+FLOAT_FIELDS = ("apy", "apy_base", "apy_reward", "apy_mean_7d", "apy_mean_30d", "tvl_usd")
+STRING_FIELDS = ("pool", "project", "symbol", "chain")
+JSON_FIELDS = ("underlying_tokens", "reward_tokens")
+
+# String code for a missing value.
+NO_STRING = -1
+
+
+# ==============================================================================
+# EXCEPTIONS
+# ==============================================================================
+
+
+class SnapshotFormatError(ValueError):
+    """A snapshot file is truncated, corrupt or from another format version."""
+
+
+# ==============================================================================
+# MAPPED SNAPSHOT
+# ==============================================================================
+
+
+class MappedPools(Sequence[PoolRecord]):
+    """
+    Read-only pool records backed by a memory-mapped snapshot file.
+
+    Columns stay in the mapping; a PoolRecord is only built when a row
+    is indexed, which in practice means the few rows that survive a
+    filter and get parsed into models.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fetched_at: float,
+        columns: dict[str, np.ndarray],
+        strings: list[str],
+    ):
+        self.path = path
+        self.fetched_at = fetched_at
+        self.columns = columns
+        self.strings = strings
+        self._size = len(columns["pool"])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self._size))]
+
+        row = operator.index(row)
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError("pool row out of range")
+
+        return PoolRecord(*(self._value(field, row) for field in POOL_FIELDS))
+
+    def __iter__(self) -> Iterator[PoolRecord]:
+        for row in range(self._size):
+            yield self[row]
+
+    def build_table(self) -> PoolTable:
+        """Columnar table over these records, reusing the mapped columns."""
+        return PoolTable.from_columns(
+            self,
+            columns={field: self.columns[field] for field in FLOAT_FIELDS},
+            chains=self._string_column("chain"),
+            projects=self._string_column("project"),
+            symbols=self._string_column("symbol"),
+            pool_ids=self._string_column("pool"),
+            underlying_masks=self._underlying_masks(),
+        )
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _value(self, field: str, row: int) -> Any:
+        value = self.columns[field][row]
+        if field in FLOAT_FIELDS:
+            return None if np.isnan(value) else float(value)
+        if value == NO_STRING:
+            return None
+        if field in JSON_FIELDS:
+            return msgspec.json.decode(self.strings[value])
+        return self.strings[value]
+
+    def _underlying_masks(self) -> np.ndarray:
+        """Token taxonomy mask per row, decoding each distinct token list once."""
+        by_code = {
+            code: TOKENS.address_mask(
+                msgspec.json.decode(self.strings[code]) if code != NO_STRING else None
+            )
+            for code in np.unique(self.columns["underlying_tokens"]).tolist()
+        }
+        return np.fromiter(
+            (by_code[code] for code in self.columns["underlying_tokens"].tolist()),
+            dtype=np.uint64,
+            count=self._size,
+        )
+
+    def _string_column(self, field: str) -> list[Optional[str]]:
+        strings = self.strings
+        return [
+            strings[code] if code != NO_STRING else None
+            for code in self.columns[field].tolist()
+        ]
+
+
+# ==============================================================================
+# READ / WRITE
+# ==============================================================================
+
+
+def save_snapshot(
+    pools: Sequence[PoolRecord],
+    fetched_at: Optional[float] = None,
+    path: str = SNAPSHOT_PATH,
+) -> int:
+    """
+    Write pools to a snapshot file, atomically replacing any old one.
+
+    Args:
+        pools: Records to store
+        fetched_at: Unix time the pools were downloaded (default now)
+        path: Destination file
+
+    Returns:
+        Size of the written file in bytes
+    """
+    strings: dict[bytes, int] = {}
+
+    def intern(value: Any, as_json: bool) -> int:
+        if value is None:
+            return NO_STRING
+        encoded = msgspec.json.encode(value) if as_json else str(value).encode()
+        return strings.setdefault(encoded, len(strings))
+
+    sections: dict[str, np.ndarray] = {}
+
+    for field in FLOAT_FIELDS:
+        values = (getattr(pool, field) for pool in pools)
+        sections[field] = np.fromiter(
+            (np.nan if value is None else float(value) for value in values),
+            dtype="<f8",
+            count=len(pools),
+        )
+    for field in STRING_FIELDS + JSON_FIELDS:
+        as_json = field in JSON_FIELDS
+        sections[field] = np.fromiter(
+            (intern(getattr(pool, field), as_json) for pool in pools),
+            dtype="<i4",
+            count=len(pools),
+        )
+
+    lengths = np.fromiter(map(len, strings), dtype="<i8", count=len(strings))
+    sections["string_offsets"] = np.concatenate([np.zeros(1, dtype="<i8"), np.cumsum(lengths)])
+    sections["string_data"] = np.frombuffer(b"".join(strings), dtype=np.uint8)
+
+    body = bytearray()
+    layout = {}
+    for name, array in sections.items():
+        body.extend(b"\0" * (-len(body) % ALIGNMENT))
+        layout[name] = {"dtype": array.dtype.str, "offset": len(body), "length": len(array)}
+        body.extend(array.tobytes())
+
+    header = json.dumps({
+        "fetched_at": fetched_at if fetched_at is not None else time.time(),
+        "rows": len(pools),
+        "sections": layout,
+        "body_size": len(body),
+        "checksum": zlib.crc32(body),
+    }).encode()
+    header += b" " * (-(PREAMBLE.size + len(header)) % ALIGNMENT)
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pools-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return PREAMBLE.size + len(header) + len(body)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> MappedPools:
+    """
+    Memory-map a snapshot file written by save_snapshot.
+
+    Args:
+        path: Snapshot file
+
+    Returns:
+        MappedPools over the file's columns
+
+    Raises:
+        FileNotFoundError: If there is no snapshot file
+        SnapshotFormatError: If the file is truncated, corrupt or from
+            another format version
+    """
+    file_size = os.path.getsize(path)
+
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            raise SnapshotFormatError("truncated preamble")
+
+        magic, version, header_size = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise SnapshotFormatError("not a pool snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotFormatError(f"unsupported format version {version}")
+
+        header_bytes = f.read(header_size)
+        if len(header_bytes) < header_size:
+            raise SnapshotFormatError("truncated header")
+
+    try:
+        header = json.loads(header_bytes)
+        body_size = int(header["body_size"])
+        rows = int(header["rows"])
+        fetched_at = float(header["fetched_at"])
+        layout = header["sections"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise SnapshotFormatError("corrupt header") from e
+
+    body_start = PREAMBLE.size + header_size
+    if file_size != body_start + body_size:
+        raise SnapshotFormatError(
+            f"expected {body_start + body_size} bytes, found {file_size}"
+        )
+
+    body = np.memmap(path, dtype=np.uint8, mode="r", offset=body_start, shape=(body_size,))
+    if zlib.crc32(body) != header.get("checksum"):
+        raise SnapshotFormatError("checksum mismatch")
+
+    try:
+        sections = {}
+        for name, spec in layout.items():
+            dtype = np.dtype(spec["dtype"])
+            start = spec["offset"]
+            sections[name] = body[start:start + spec["length"] * dtype.itemsize].view(dtype)
+
+        columns = {field: sections[field] for field in POOL_FIELDS}
+        offsets = sections["string_offsets"].tolist()
+        data = sections["string_data"].tobytes()
+    except (ValueError, KeyError, TypeError) as e:
+        raise SnapshotFormatError("corrupt section layout") from e
+
+    if any(len(column) != rows for column in columns.values()):
+        raise SnapshotFormatError("column lengths do not match row count")
+
+    strings = [data[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+    return MappedPools(path, fetched_at, columns, strings)
@@ -0,0 +1,162 @@
+"""
+================================================================================
+    POOL STREAM DECODER
+    Incremental decoding of the DeFiLlama /pools response
+
+    Parses the body chunk by chunk as it arrives and applies the snapshot
+    chain/TVL filter per pool, so rejected pools are never built into
+    Python objects and the full body is never held in memory. Kept pools
+    are emitted as the same PoolRecords the full-body decoder produces.
+================================================================================
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional
+
+import ijson
+
+from yield_agent.tools.pool_records import (
+    POOL_KEYS,
+    SNAPSHOT_CHAINS,
+    SNAPSHOT_MIN_TVL_USD,
+    PoolRecord,
+    intern_strings,
+    keep_pool,
+)
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+FIELD_SLOTS = {key: slot for slot, key in enumerate(POOL_KEYS)}
+
+CHAIN_SLOT = FIELD_SLOTS["chain"]
+TVL_SLOT = FIELD_SLOTS["tvlUsd"]
+
+# Nesting depth of containers: 1 = response object, 2 = "data" array,
+# 3 = a pool object, 4 = a container inside a pool.
+POOL_DEPTH = 3
+
+NO_VALUES = [None] * len(POOL_KEYS)
+
+
+# ==============================================================================
+# DECODER CLASS
+# ==============================================================================
+
+
+class PoolStreamDecoder:
+    """
+    Push decoder for ``{"status": ..., "data": [pool, ...]}`` bodies.
+
+    Feed raw byte chunks in arrival order and call ``close()`` for the
+    kept pools. Only the keys in POOL_KEYS are retained; each pool's
+    values are collected into a reused slot list and turned into a
+    PoolRecord only if the pool passes the filter.
+    """
+
+    def __init__(
+        self,
+        chains: Optional[Iterable[str]] = SNAPSHOT_CHAINS,
+        min_tvl: float = SNAPSHOT_MIN_TVL_USD,
+    ):
+        self.chains = {c.lower() for c in chains} if chains is not None else None
+        self.min_tvl = min_tvl
+        self.pools: list[PoolRecord] = []
+        self.pools_seen = 0
+        self.bytes_read = 0
+
+        self._events = ijson.sendable_list()
+        self._parser = ijson.basic_parse_coro(self._events, use_float=True)
+        self._depth = 0
+        self._top_key: Optional[str] = None
+        self._in_data = False
+        self._slot: Optional[int] = None
+        self._array: Optional[list[Any]] = None
+        self._values: list[Any] = list(NO_VALUES)
+
+    def feed(self, chunk: bytes) -> None:
+        """Decode the next chunk of the response body."""
+        self.bytes_read += len(chunk)
+        self._parser.send(chunk)
+        self._consume()
+
+    def close(self) -> list[PoolRecord]:
+        """Finish decoding and return the kept pools."""
+        self._parser.close()
+        self._consume()
+        return self.pools
+
+    def stats(self) -> dict[str, int]:
+        """Bytes decoded and pools seen versus kept."""
+        return {
+            "bytes_read": self.bytes_read,
+            "pools_seen": self.pools_seen,
+            "pools_kept": len(self.pools),
+        }
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _consume(self) -> None:
+        # Parser state lives in locals for the hot loop and is written back
+        # once per chunk.
+        values = self._values
+        depth = self._depth
+        slot = self._slot
+        array = self._array
+        in_data = self._in_data
+
+        for event, value in self._events:
+            if depth == POOL_DEPTH:
+                if event == "map_key":
+                    slot = FIELD_SLOTS.get(value) if in_data else None
+                elif event == "end_map" or event == "end_array":
+                    if in_data:
+                        self._finish_pool()
+                        slot = None
+                    depth -= 1
+                elif event == "start_map" or event == "start_array":
+                    depth += 1
+                    if event == "start_array" and slot is not None:
+                        array = []
+                elif slot is not None:
+                    values[slot] = value
+
+            elif event == "start_map" or event == "start_array":
+                depth += 1
+                if depth == 2:
+                    in_data = event == "start_array" and self._top_key == "data"
+                elif depth == POOL_DEPTH and in_data:
+                    values[:] = NO_VALUES
+
+            elif event == "end_map" or event == "end_array":
+                if depth == POOL_DEPTH + 1 and array is not None:
+                    values[slot] = array
+                    array = None
+                elif depth == 2:
+                    in_data = False
+                depth -= 1
+
+            elif array is not None and depth == POOL_DEPTH + 1:
+                array.append(value)
+
+            elif event == "map_key" and depth == 1:
+                self._top_key = value
+
+        del self._events[:]
+        self._depth = depth
+        self._slot = slot
+        self._array = array
+        self._in_data = in_data
+
+    def _finish_pool(self) -> None:
+        values = self._values
+        self.pools_seen += 1
+
+        if keep_pool(values[CHAIN_SLOT], values[TVL_SLOT], self.chains, self.min_tvl):
+            self.pools.append(intern_strings(PoolRecord(*values)))
@@ -0,0 +1,317 @@
+"""
+================================================================================
+    POOL TABLE
+    Columnar view of a DeFiLlama /pools snapshot
+
+    Built once per snapshot so per-request filtering is a handful of
+    vectorized NumPy comparisons instead of Python loops over raw dicts.
+    Risk attributes derived from the pool data are stored as columns
+    too, so parsing reads them instead of recomputing them per request,
+    and so are token taxonomy masks, so token filters are bitwise tests.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import sys
+from datetime import date
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from yield_agent.state import SUPPORTED_CHAINS
+from yield_agent.tools.pool_index import PoolSearchIndex
+from yield_agent.tools.pool_records import PoolRecord
+from yield_agent.tools.pool_risk import (
+    NO_LAUNCH_DAY,
+    il_risk_codes,
+    project_slug,
+    protocol_age_days,
+    risk_scores,
+)
+from yield_agent.tools.protocol_registry import get_protocol_registry
+from yield_agent.tools.token_taxonomy import TOKENS
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+MAX_SANE_APY = 1000.0
+
+# PoolRecord fields stored as float columns of the same name.
+NUMERIC_COLUMNS = ("tvl_usd", "apy", "apy_base", "apy_reward", "apy_mean_7d", "apy_mean_30d")
+
+# Columns where a missing value means "not reported" rather than zero.
+NULLABLE_COLUMNS = {"apy_mean_7d", "apy_mean_30d"}
+
+CHAIN_KEYS_BY_SLUG: dict[str, str] = {
+    config["defillama_slug"].lower(): key for key, config in SUPPORTED_CHAINS.items()
+}
+
+
+# ==============================================================================
+# TABLE CLASS
+# ==============================================================================
+
+
+class PoolTable:
+    """
+    Column-oriented pool data with categorical chain, project and symbol codes.
+
+    Row ``i`` of every column describes ``pools[i]``; the records are
+    kept only so survivors of a filter can be parsed into models.
+    Missing tvl/apy values are stored as 0 and missing 7d/30d means as
+    NaN, matching how the client has always interpreted them.
+
+    ``pool_ids`` is an object array of pool ids ("" where missing).
+    Derived columns: ``il_risk_codes`` and ``risk_scores`` per row, and
+    ``project_slugs``, ``project_audited`` and ``project_launch_days``
+    per project code, looked up in the protocol registry when the table
+    is built. ``underlying_masks`` holds the token taxonomy mask of each
+    row's known underlying addresses and ``token_masks`` adds its
+    symbol's mask (see token_taxonomy).
+    """
+
+    def __init__(self, pools: Sequence[PoolRecord]):
+        self._build(
+            pools,
+            columns={column: _float_column(pools, column) for column in NUMERIC_COLUMNS},
+            chains=[pool.chain for pool in pools],
+            projects=[pool.project for pool in pools],
+            symbols=[pool.symbol for pool in pools],
+            pool_ids=[pool.pool for pool in pools],
+            underlying_masks=TOKENS.address_masks(
+                (pool.underlying_tokens for pool in pools), len(pools)
+            ),
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        pools: Sequence[PoolRecord],
+        columns: dict[str, np.ndarray],
+        chains: Sequence[Optional[str]],
+        projects: Sequence[Optional[str]],
+        symbols: Sequence[Optional[str]],
+        pool_ids: Sequence[Optional[str]],
+        underlying_masks: Optional[np.ndarray] = None,
+    ) -> PoolTable:
+        """
+        Build a table from stored columns instead of records.
+
+        Args:
+            pools: Records backing the rows
+            columns: Float64 array per NUMERIC_COLUMNS field, NaN where missing
+            chains: Per-row chain names
+            projects: Per-row project slugs
+            symbols: Per-row pool symbols
+            pool_ids: Per-row DeFiLlama pool ids
+            underlying_masks: Per-row taxonomy masks of the underlying
+                token addresses (default: none known)
+
+        Returns:
+            PoolTable over ``pools``
+        """
+        table = cls.__new__(cls)
+        if underlying_masks is None:
+            underlying_masks = np.zeros(len(pools), dtype=np.uint64)
+        table._build(pools, columns, chains, projects, symbols, pool_ids, underlying_masks)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+    # --------------------------------------------------------------------------
+    # LOOKUPS
+    # --------------------------------------------------------------------------
+
+    def protocol_age_days(self, row: int, today: Optional[date] = None) -> int:
+        """Age in days of the protocol behind a row, 0 if unknown."""
+        return protocol_age_days(
+            int(self.project_launch_days[self.project_codes[row]]), today
+        )
+
+    def chain_code(self, defillama_chain: str) -> Optional[int]:
+        """Code for a DeFiLlama chain name, or None if no pool uses it."""
+        return self._chain_lookup.get(defillama_chain.lower())
+
+    def resolve_chains(self, chains: Iterable[str]) -> dict[int, str]:
+        """
+        Map chain codes to the requested chain identifiers.
+
+        Unsupported chains and chains without pools are dropped. When two
+        identifiers resolve to the same DeFiLlama chain the first wins.
+        """
+        resolved: dict[int, str] = {}
+        for chain in chains:
+            chain_config = SUPPORTED_CHAINS.get(chain.lower())
+            if not chain_config:
+                continue
+            code = self.chain_code(chain_config["defillama_slug"])
+            if code is not None:
+                resolved.setdefault(code, chain)
+        return resolved
+
+    # --------------------------------------------------------------------------
+    # MASKS
+    # --------------------------------------------------------------------------
+
+    def chain_mask(self, codes: Iterable[int]) -> np.ndarray:
+        """Rows on any of the given chain codes."""
+        return np.isin(self.chain_codes, np.fromiter(codes, dtype=self.chain_codes.dtype))
+
+    def criteria_mask(self, min_tvl: float, min_apy: float) -> np.ndarray:
+        """Rows meeting minimum TVL/APY with a sane APY ceiling."""
+        return (
+            (self.tvl_usd >= min_tvl)
+            & (self.apy >= min_apy)
+            & (self.apy <= MAX_SANE_APY)
+        )
+
+    def text_mask(self, query: str) -> np.ndarray:
+        """Rows whose symbol or project contains the query (case-insensitive)."""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.search_index.search(query)] = True
+        return mask
+
+    # --------------------------------------------------------------------------
+    # ROW SELECTIONS
+    # --------------------------------------------------------------------------
+
+    def search_rows(
+        self,
+        query: str,
+        chain_codes: Optional[Iterable[int]] = None,
+    ) -> np.ndarray:
+        """Sorted row ids matching a search, via the snapshot's inverted index."""
+        return self.search_index.search(query, chain_codes)
+
+    def group_by_chain(self, rows: np.ndarray) -> dict[int, np.ndarray]:
+        """Split row ids into per-chain buckets, keeping their order."""
+        if not len(rows):
+            return {}
+        row_chains = self.chain_codes[rows]
+        order = np.argsort(row_chains, kind="stable")
+        codes, starts = np.unique(row_chains[order], return_index=True)
+        buckets = np.split(rows[order], starts[1:])
+        return {int(code): bucket for code, bucket in zip(codes, buckets)}
+
+    def top_by_tvl(self, rows: np.ndarray, k: int) -> np.ndarray:
+        """
+        The ``k`` highest-TVL rows, ordered by TVL descending.
+
+        Uses argpartition-style selection so cost is linear in
+        ``len(rows)``; ties are broken by row id, matching a stable
+        descending sort of the full list.
+        """
+        if k <= 0:
+            return rows[:0]
+        if k < len(rows):
+            tvl = self.tvl_usd[rows]
+            kth = np.partition(tvl, len(rows) - k)[len(rows) - k]
+            above = rows[tvl > kth]
+            ties = rows[tvl == kth][: k - len(above)]
+            rows = np.concatenate([above, ties])
+        return self.sort_by_tvl(rows)
+
+    def sort_by_tvl(self, rows: np.ndarray) -> np.ndarray:
+        """Rows ordered by TVL descending, ties by row id."""
+        return rows[np.lexsort((rows, -self.tvl_usd[rows]))]
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _build(
+        self,
+        pools: Sequence[PoolRecord],
+        columns: dict[str, np.ndarray],
+        chains: Sequence[Optional[str]],
+        projects: Sequence[Optional[str]],
+        symbols: Sequence[Optional[str]],
+        pool_ids: Sequence[Optional[str]],
+        underlying_masks: np.ndarray,
+    ) -> None:
+        self.pools = pools
+        self.pool_ids = np.array(
+            [pool_id if isinstance(pool_id, str) else "" for pool_id in pool_ids],
+            dtype=object,
+        )
+
+        for column in NUMERIC_COLUMNS:
+            values = columns[column]
+            if column not in NULLABLE_COLUMNS:
+                values = np.where(np.isnan(values), 0.0, values)
+            setattr(self, column, values)
+
+        self.chain_codes, self.chain_names = _encode(
+            (chain or "").lower() for chain in chains
+        )
+        self.project_codes, self.project_names = _encode(
+            project or "" for project in projects
+        )
+        self.symbol_codes, self.symbol_names = _encode(
+            symbol or "" for symbol in symbols
+        )
+        self.search_index = PoolSearchIndex(
+            symbols=(self.symbol_names[code] for code in self.symbol_codes.tolist()),
+            project_names=self.project_names,
+            project_codes=self.project_codes,
+            chain_codes=self.chain_codes,
+        )
+
+        # Empty, null and non-string projects get no slug, and rows using
+        # them cannot be parsed.
+        self.project_slugs: list[Optional[str]] = [
+            sys.intern(project_slug(name)) if name and isinstance(name, str) else None
+            for name in self.project_names
+        ]
+        registry = get_protocol_registry()
+        self.project_audited = np.array(
+            [slug is not None and registry.is_audited(slug) for slug in self.project_slugs],
+            dtype=bool,
+        )
+        self.project_launch_days = np.array(
+            [registry.launch_day(slug) if slug else NO_LAUNCH_DAY for slug in self.project_slugs],
+            dtype=np.int32,
+        )
+        self.il_risk_codes = il_risk_codes(self.symbol_names)[self.symbol_codes]
+        self.underlying_masks = underlying_masks
+        self.token_masks = (
+            TOKENS.symbol_masks(self.symbol_names)[self.symbol_codes] | underlying_masks
+        )
+        self.risk_scores = risk_scores(
+            self.tvl_usd,
+            self.apy,
+            self.project_audited[self.project_codes],
+            self.il_risk_codes,
+        )
+
+        self._chain_lookup = {name: code for code, name in enumerate(self.chain_names)}
+        self.chain_keys: list[Optional[str]] = [
+            CHAIN_KEYS_BY_SLUG.get(name) for name in self.chain_names
+        ]
+
+
+# ==============================================================================
+# HELPER FUNCTIONS
+# ==============================================================================
+
+
+def _float_column(pools: Sequence[PoolRecord], key: str) -> np.ndarray:
+    """One numeric field as float64, NaN where the record has None."""
+    values = (getattr(pool, key) for pool in pools)
+    return np.fromiter(
+        (np.nan if value is None else value or 0.0 for value in values),
+        dtype=np.float64,
+        count=len(pools),
+    )
+
+
+def _encode(values: Iterable[str]) -> tuple[np.ndarray, list[str]]:
+    """Dictionary-encode strings into int32 codes plus a category list."""
+    lookup: dict[str, int] = {}
+    codes = [lookup.setdefault(value, len(lookup)) for value in values]
+    return np.array(codes, dtype=np.int32), list(lookup)
@@ -0,0 +1,329 @@
+"""
+================================================================================
+    PROTOCOL REGISTRY
+    Audit status and age of every DeFiLlama protocol, cached on disk
+
+    DeFiLlama's /protocols lists several thousand protocols with their
+    audit count, audit links, listing date and category. The registry
+    downloads it at most once per PROTOCOL_REGISTRY_MAX_AGE_SECONDS,
+    keeps the fields it needs in a dict keyed by slug and saves them to
+    PROTOCOL_REGISTRY_PATH, so a restarted or offline process still
+    has them. The curated tables in pool_risk remain the fallback and
+    are merged in: a protocol is audited if either source says so, and
+    its launch day is the earliest one known.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import httpx
+import msgspec
+
+from yield_agent.tools.pool_risk import (
+    KNOWN_AUDITED_PROTOCOLS,
+    NO_LAUNCH_DAY,
+    launch_day,
+)
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+PROTOCOLS_URL = "https://api.llama.fi/protocols"
+
+PROTOCOL_REGISTRY_PATH = os.getenv(
+    "PROTOCOL_REGISTRY_PATH", os.path.join(".cache", "protocols.json")
+)
+
+PROTOCOL_REGISTRY_MAX_AGE_SECONDS = float(os.getenv("PROTOCOL_REGISTRY_MAX_AGE_SECONDS", 86_400))
+
+REQUEST_TIMEOUT = 30.0
+
+# Wait after a failed download before trying again.
+RETRY_AFTER_SECONDS = 900.0
+
+
+# ==============================================================================
+# SCHEMA
+# ==============================================================================
+
+
+class ProtocolRecord(msgspec.Struct, gc=False):
+    """One /protocols entry, projected to the fields the registry reads."""
+
+    slug: Optional[str] = None
+    audits: Any = None
+    audit_links: Any = None
+    # The one camelCase key; audit_links is snake_case upstream.
+    listed_at: Any = msgspec.field(default=None, name="listedAt")
+    category: Optional[str] = None
+
+
+class ProtocolInfo(msgspec.Struct, gc=False):
+    """What the registry keeps per protocol."""
+
+    slug: str
+    audited: bool = False
+    audit_links: list[str] = []
+    launch_day: int = NO_LAUNCH_DAY
+    category: Optional[str] = None
+
+
+class RegistryFile(msgspec.Struct):
+    """On-disk form of the registry."""
+
+    fetched_at: float
+    protocols: list[ProtocolInfo]
+
+
+_protocols_decoder = msgspec.json.Decoder(list[ProtocolRecord], strict=False)
+_file_decoder = msgspec.json.Decoder(RegistryFile)
+
+
+def parse_protocols(body: bytes) -> list[ProtocolInfo]:
+    """
+    Decode a /protocols body, skipping entries without a slug.
+
+    Raises:
+        msgspec.DecodeError: If the body is not a valid /protocols payload
+    """
+    protocols = []
+    for record in _protocols_decoder.decode(body):
+        if not isinstance(record.slug, str) or not record.slug:
+            continue
+        links = record.audit_links if isinstance(record.audit_links, list) else []
+        protocols.append(ProtocolInfo(
+            slug=record.slug.lower(),
+            audited=_audit_count(record.audits) > 0,
+            audit_links=[link for link in links if isinstance(link, str)],
+            launch_day=_listed_day(record.listed_at),
+            category=record.category,
+        ))
+    return protocols
+
+
+def _audit_count(audits: Any) -> int:
+    """/protocols sends the audit count as a string, a number or null."""
+    try:
+        return int(audits)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _listed_day(listed_at: Any) -> int:
+    """Proleptic ordinal of a unix listing time, or NO_LAUNCH_DAY."""
+    try:
+        return datetime.fromtimestamp(float(listed_at), tz=timezone.utc).toordinal()
+    except (TypeError, ValueError, OverflowError, OSError):
+        return NO_LAUNCH_DAY
+
+
+# ==============================================================================
+# REGISTRY CLASS
+# ==============================================================================
+
+
+class ProtocolRegistry:
+    """
+    Protocol metadata indexed by slug, shared across threads.
+
+    Lookups never touch the network; refresh_if_stale() is awaited on
+    the pool refresh path, and a failed download keeps the last good
+    registry.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = PROTOCOL_REGISTRY_PATH,
+        max_age_seconds: float = PROTOCOL_REGISTRY_MAX_AGE_SECONDS,
+        url: str = PROTOCOLS_URL,
+    ):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.url = url
+        self._lock = threading.Lock()
+        self._protocols: dict[str, ProtocolInfo] = {}
+        self._fetched_at: Optional[float] = None
+        self._refreshes = 0
+        self._errors = 0
+        self._last_error: Optional[str] = None
+        self._retry_at = 0.0
+        self._loaded_from_disk = False
+
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._protocols)
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        if self._fetched_at is None:
+            return None
+        return max(0.0, time.time() - self._fetched_at)
+
+    # --------------------------------------------------------------------------
+    # LOOKUPS
+    # --------------------------------------------------------------------------
+
+    def get(self, slug: str) -> Optional[ProtocolInfo]:
+        """Registry entry for a protocol slug, or None."""
+        return self._protocols.get(slug)
+
+    def is_audited(self, slug: str) -> bool:
+        """Whether the registry or the curated list knows an audit."""
+        if slug in KNOWN_AUDITED_PROTOCOLS:
+            return True
+        info = self._protocols.get(slug)
+        return info is not None and info.audited
+
+    def launch_day(self, slug: str) -> int:
+        """Earliest known launch or listing day, or NO_LAUNCH_DAY."""
+        info = self._protocols.get(slug)
+        days = [launch_day(slug), info.launch_day if info is not None else NO_LAUNCH_DAY]
+        known = [day for day in days if day != NO_LAUNCH_DAY]
+        return min(known) if known else NO_LAUNCH_DAY
+
+    def audit_links(self, slug: str) -> list[str]:
+        """Audit report links for a protocol, empty if none are known."""
+        info = self._protocols.get(slug)
+        return list(info.audit_links) if info is not None else []
+
+    # --------------------------------------------------------------------------
+    # REFRESH
+    # --------------------------------------------------------------------------
+
+    async def refresh_if_stale(self, client: Optional[httpx.AsyncClient] = None) -> bool:
+        """
+        Download /protocols if the registry is older than max_age_seconds.
+
+        Never raises; errors are recorded in stats().
+
+        Args:
+            client: Open HTTP client to use (default: a short-lived one)
+
+        Returns:
+            Whether the registry was replaced
+        """
+        age = self.age_seconds
+        if age is not None and age < self.max_age_seconds:
+            return False
+        if time.time() < self._retry_at:
+            return False
+
+        try:
+            if client is None:
+                async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as own_client:
+                    await self.refresh(own_client)
+            else:
+                await self.refresh(client)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+                self._last_error = str(e) or type(e).__name__
+                self._retry_at = time.time() + RETRY_AFTER_SECONDS
+            return False
+        return True
+
+    async def refresh(self, client: httpx.AsyncClient) -> None:
+        """
+        Download /protocols and replace the registry, saving it to disk.
+
+        Raises:
+            httpx.HTTPError: If the download fails
+            msgspec.DecodeError: If the body is not a valid /protocols payload
+        """
+        response = await client.get(self.url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        protocols = parse_protocols(response.content)
+        fetched_at = time.time()
+
+        with self._lock:
+            self._protocols = {info.slug: info for info in protocols}
+            self._fetched_at = fetched_at
+            self._refreshes += 1
+            self._last_error = None
+
+        if self.path:
+            self._save(RegistryFile(fetched_at=fetched_at, protocols=protocols))
+
+    def stats(self) -> dict[str, Any]:
+        """Size, age and refresh counters."""
+        age = self.age_seconds
+        with self._lock:
+            return {
+                "protocols": len(self._protocols),
+                "audited": sum(info.audited for info in self._protocols.values()),
+                "age_seconds": round(age, 1) if age is not None else None,
+                "loaded_from_disk": self._loaded_from_disk,
+                "refreshes": self._refreshes,
+                "errors": self._errors,
+                "last_error": self._last_error,
+            }
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _load(self) -> None:
+        """Load the saved registry; a missing or unreadable file is skipped."""
+        try:
+            with open(self.path, "rb") as f:
+                saved = _file_decoder.decode(f.read())
+        except (OSError, msgspec.DecodeError):
+            return
+        self._protocols = {info.slug: info for info in saved.protocols}
+        self._fetched_at = saved.fetched_at
+        self._loaded_from_disk = True
+
+    def _save(self, saved: RegistryFile) -> None:
+        """Write the registry atomically. Never raises."""
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".protocols-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(msgspec.json.encode(saved))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            with self._lock:
+                self._last_error = str(e) or type(e).__name__
+
+
+# ==============================================================================
+# PROCESS-WIDE INSTANCE
+# ==============================================================================
+
+
+_registry: Optional[ProtocolRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_protocol_registry() -> ProtocolRegistry:
+    """
+    Return the process-wide protocol registry, loading it on first use.
+
+    Set PROTOCOL_REGISTRY_PATH to an empty string to keep it in memory.
+    """
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProtocolRegistry(PROTOCOL_REGISTRY_PATH or None)
+
+    return _registry
@@ -0,0 +1,207 @@
+"""
+================================================================================
+    ROUTE CACHE
+    LI.FI routes by chain pair, token and amount bucket
+
+    Users ask about the same chain pairs and tokens with slightly
+    different amounts. Routes are cached per (from_chain, to_chain,
+    token, amount bucket), where buckets are equal steps of log10 of the
+    amount, so 10,000 and 10,400 USDC share an entry while 100 and
+    10,000 do not. A hit is rescaled from the quoted amount to the
+    requested one: the gas cost is per transaction and stays as quoted,
+    while the bridge fee and the output are proportional to the amount.
+
+    Entries are fresh for ttl_seconds. Past that they are only served
+    when a live request fails, for up to stale_seconds more. The cache
+    holds at most max_entries entries and evicts the least recently
+    used one. Cached routes carry no transaction data; LiFiClient.get_quote
+    always quotes live before anything is signed.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+from yield_agent.state import BridgeRoute
+
+
+# ==============================================================================
+# TYPES
+# ==============================================================================
+
+
+# (from_chain, to_chain, token, amount bucket) of a cached transfer.
+CacheKey = tuple[str, str, str, int]
+
+
+class CachedRoutes(NamedTuple):
+    """Routes as quoted for ``amount``, at ``fetched_at``."""
+    routes: list[BridgeRoute]
+    amount: float
+    fetched_at: float
+
+
+# ==============================================================================
+# CACHE CLASS
+# ==============================================================================
+
+
+class RouteCache:
+    """
+    Thread-safe, size-bounded LRU of bridge routes with a TTL.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        stale_seconds: float,
+        max_entries: int,
+        buckets_per_decade: int,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max(1, max_entries)
+        self.buckets_per_decade = max(1, buckets_per_decade)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[CacheKey, CachedRoutes] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._stale_serves = 0
+        self._stores = 0
+        self._evictions = 0
+
+    # --------------------------------------------------------------------------
+    # KEYS
+    # --------------------------------------------------------------------------
+
+    def bucket(self, amount: float) -> Optional[int]:
+        """Log-scale bucket of an amount; None for amounts that are not cached."""
+        if not amount > 0 or math.isinf(amount):
+            return None
+        return math.floor(math.log10(amount) * self.buckets_per_decade)
+
+    def key(
+        self, from_chain: str, to_chain: str, token: str, amount: float
+    ) -> Optional[CacheKey]:
+        """Normalized cache key of a transfer, or None if it is not cacheable."""
+        bucket = self.bucket(amount)
+        if bucket is None:
+            return None
+        return (from_chain.lower(), to_chain.lower(), token.upper(), bucket)
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    def lookup(self, key: CacheKey, amount: float) -> Optional[list[BridgeRoute]]:
+        """
+        Fresh routes for a key, rescaled to ``amount``.
+
+        Counts a hit or a miss. Expired entries stay in the cache, for
+        serve_stale, until they are past the stale window.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry.fetched_at >= self.ttl_seconds:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return rescale_routes(entry.routes, entry.amount, amount)
+
+    def serve_stale(self, key: CacheKey, amount: float) -> Optional[list[BridgeRoute]]:
+        """
+        Expired routes for a key, for use when a live request failed.
+
+        Returns:
+            Routes rescaled to ``amount``, or None if the entry is
+            missing or past the stale window
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.fetched_at >= self.ttl_seconds + self.stale_seconds:
+                del self._entries[key]
+                return None
+            self._stale_serves += 1
+        return rescale_routes(entry.routes, entry.amount, amount)
+
+    def store(self, key: CacheKey, routes: list[BridgeRoute], amount: float) -> None:
+        """Cache the routes quoted for ``amount``, evicting the least recently used."""
+        entry = CachedRoutes(
+            [route.model_copy(update={"tx_data": None}) for route in routes],
+            amount,
+            time.time(),
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries and counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._stale_serves = 0
+            self._stores = 0
+            self._evictions = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Hit ratio, stale serves, evictions and size."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stale_serves": self._stale_serves,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds,
+            }
+
+
+# ==============================================================================
+# HELPER FUNCTIONS
+# ==============================================================================
+
+
+def rescale_routes(
+    routes: list[BridgeRoute], quoted_amount: float, amount: float
+) -> list[BridgeRoute]:
+    """
+    Routes quoted for one amount, restated for another.
+
+    Gas is a per-transaction cost and is kept; the bridge fee and the
+    estimated output scale with the amount.
+    """
+    scale = amount / quoted_amount
+    rescaled: list[BridgeRoute] = []
+    for route in routes:
+        bridge_fee_usd = round(route.bridge_fee_usd * scale, 2)
+        rescaled.append(
+            route.model_copy(
+                update={
+                    "amount": amount,
+                    "bridge_fee_usd": bridge_fee_usd,
+                    "total_cost_usd": round(route.gas_cost_usd + bridge_fee_usd, 2),
+                    "estimated_output": round(route.estimated_output * scale, 6),
+                    "tx_data": None,
+                }
+            )
+        )
+    return rescaled
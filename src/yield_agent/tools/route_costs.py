@@ -0,0 +1,313 @@
+"""
+================================================================================
+    ROUTE COSTS
+    Fitted bridge cost curves per chain pair and token
+
+    A bridge transfer costs roughly a fixed amount (gas, flat bridge
+    fees) plus a fee proportional to the amount. Each (from, to, token)
+    row of the route matrix holds quotes at a few reference amounts;
+    fitting cost = fixed + rate * amount, and the output linearly in the
+    amount, to those quotes prices any amount without an API call.
+
+    A modeled route carries its confidence bound in cost_error_usd: the
+    worst residual of the fit, at least COST_CURVE_ERROR_FLOOR of the
+    modeled cost, widened in proportion when the amount lies outside the
+    sampled range. Live quotes seen later are checked against the curve;
+    a pair whose quote falls outside the bound is marked drifted, is no
+    longer modeled, and is re-sampled by the next drift refresh.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import statistics
+import threading
+import time
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from yield_agent.state import BridgeRoute
+from yield_agent.tools.route_matrix import ROUTE_MATRIX, RouteMatrix, RoutePair
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+# Smallest confidence bound, as a fraction of the modeled cost.
+COST_CURVE_ERROR_FLOOR = float(os.getenv("COST_CURVE_ERROR_FLOOR", 0.05))
+
+# Curves older than this are not used; they are refit on every matrix refresh.
+COST_CURVE_MAX_AGE_SECONDS = float(
+    os.getenv("COST_CURVE_MAX_AGE_SECONDS", ROUTE_MATRIX.max_age_seconds)
+)
+
+
+# ==============================================================================
+# CURVE CLASS
+# ==============================================================================
+
+
+class CostCurve:
+    """
+    Linear cost and output model of one chain pair and token.
+
+    ``samples`` are the (amount, route) quotes the curve was fitted to;
+    the route nearest a requested amount supplies the bridge name and
+    chain details of modeled routes.
+    """
+
+    def __init__(
+        self,
+        fixed_usd: float,
+        rate: float,
+        output_offset: float,
+        output_ratio: float,
+        time_seconds: int,
+        residual_usd: float,
+        samples: Sequence[tuple[float, BridgeRoute]],
+        fitted_at: Optional[float] = None,
+    ):
+        self.fixed_usd = fixed_usd
+        self.rate = rate
+        self.output_offset = output_offset
+        self.output_ratio = output_ratio
+        self.time_seconds = time_seconds
+        self.residual_usd = residual_usd
+        self.samples = list(samples)
+        self.fitted_at = fitted_at if fitted_at is not None else time.time()
+        self.min_amount = min(amount for amount, _ in self.samples)
+        self.max_amount = max(amount for amount, _ in self.samples)
+
+    def cost(self, amount: float) -> float:
+        """Modeled total cost in USD."""
+        return self.fixed_usd + self.rate * amount
+
+    def output(self, amount: float) -> float:
+        """Modeled amount received, in token units."""
+        return max(0.0, self.output_offset + self.output_ratio * amount)
+
+    def bound(self, amount: float) -> float:
+        """Confidence bound on cost(amount), in USD."""
+        error = max(self.residual_usd, COST_CURVE_ERROR_FLOOR * self.cost(amount))
+        return error * max(1.0, amount / self.max_amount, self.min_amount / amount)
+
+    def route(self, amount: float) -> BridgeRoute:
+        """Modeled route for an amount, carrying its confidence bound."""
+        _, template = min(
+            self.samples, key=lambda sample: abs(math.log(amount / sample[0]))
+        )
+        bridge_fee_usd = round(self.rate * amount, 2)
+        return template.model_copy(
+            update={
+                "amount": amount,
+                "estimated_time_seconds": self.time_seconds,
+                "gas_cost_usd": round(self.fixed_usd, 2),
+                "bridge_fee_usd": bridge_fee_usd,
+                "total_cost_usd": round(self.fixed_usd + bridge_fee_usd, 2),
+                "estimated_output": round(self.output(amount), 6),
+                "tx_data": None,
+                "cost_error_usd": round(self.bound(amount), 2),
+            }
+        )
+
+
+def fit_cost_curve(samples: Sequence[tuple[float, BridgeRoute]]) -> Optional[CostCurve]:
+    """
+    Fit fixed plus proportional cost to quotes at several amounts.
+
+    Both coefficients are kept non-negative: a negative rate is fitted
+    as a flat cost, a negative fixed cost as a pure proportional fee.
+
+    Args:
+        samples: (amount, route) quotes of one pair and token
+
+    Returns:
+        The curve, or None without quotes at two distinct amounts
+    """
+    samples = [(amount, route) for amount, route in samples if amount > 0]
+    if len({amount for amount, _ in samples}) < 2:
+        return None
+
+    amounts = np.array([amount for amount, _ in samples], dtype=np.float64)
+    costs = np.array([route.total_cost_usd for _, route in samples], dtype=np.float64)
+    outputs = np.array([route.estimated_output for _, route in samples], dtype=np.float64)
+    design = np.column_stack([np.ones_like(amounts), amounts])
+
+    fixed, rate = np.linalg.lstsq(design, costs, rcond=None)[0]
+    if rate < 0:
+        fixed, rate = costs.mean(), 0.0
+    if fixed < 0:
+        fixed, rate = 0.0, float(amounts @ costs / (amounts @ amounts))
+
+    output_offset, output_ratio = np.linalg.lstsq(design, outputs, rcond=None)[0]
+    residuals = costs - (fixed + rate * amounts)
+
+    return CostCurve(
+        fixed_usd=float(fixed),
+        rate=float(rate),
+        output_offset=float(output_offset),
+        output_ratio=float(output_ratio),
+        time_seconds=int(statistics.median(route.estimated_time_seconds for _, route in samples)),
+        residual_usd=float(np.abs(residuals).max()),
+        samples=samples,
+    )
+
+
+# ==============================================================================
+# MODEL CLASS
+# ==============================================================================
+
+
+class CostModel:
+    """
+    Thread-safe cost curves by (from_chain, to_chain, token).
+    """
+
+    def __init__(self, max_age_seconds: float = COST_CURVE_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._curves: dict[RoutePair, CostCurve] = {}
+        self._drifted: set[RoutePair] = set()
+        self._hits = 0
+        self._misses = 0
+        self._checks = 0
+        self._drifts = 0
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    def fit(self, matrix: RouteMatrix, pairs: Optional[Sequence[RoutePair]] = None) -> int:
+        """
+        Refit curves from the matrix's fresh samples.
+
+        Pairs that can no longer be fitted lose their curve; refitted
+        pairs are no longer drifted.
+
+        Returns:
+            Number of curves fitted
+        """
+        fitted: dict[RoutePair, Optional[CostCurve]] = {
+            pair: fit_cost_curve(matrix.samples(pair))
+            for pair in (matrix.pairs() if pairs is None else pairs)
+        }
+        with self._lock:
+            for pair, curve in fitted.items():
+                if curve is None:
+                    self._curves.pop(pair, None)
+                else:
+                    self._curves[pair] = curve
+                self._drifted.discard(pair)
+        return sum(curve is not None for curve in fitted.values())
+
+    def route(
+        self, from_chain: str, to_chain: str, token: str, amount: float
+    ) -> Optional[BridgeRoute]:
+        """
+        Modeled route for a transfer, without an API call.
+
+        Returns:
+            The route with cost_error_usd set, or None if the pair has
+            no current curve or has drifted
+        """
+        pair = (from_chain.lower(), to_chain.lower(), token.upper())
+        with self._lock:
+            curve = self._curves.get(pair)
+            if (
+                curve is None
+                or not amount > 0
+                or pair in self._drifted
+                or time.time() - curve.fitted_at >= self.max_age_seconds
+            ):
+                self._misses += 1
+                return None
+            self._hits += 1
+        return curve.route(amount)
+
+    def observe(self, route: BridgeRoute) -> Optional[float]:
+        """
+        Check a live quote against its pair's curve.
+
+        A quote whose cost falls outside the curve's bound marks the
+        pair drifted.
+
+        Returns:
+            The curve's error on this quote in USD, or None without a curve
+        """
+        pair = (route.from_chain.lower(), route.to_chain.lower(), route.token.upper())
+        with self._lock:
+            curve = self._curves.get(pair)
+            if curve is None or not route.amount > 0:
+                return None
+            error = abs(route.total_cost_usd - curve.cost(route.amount))
+            self._checks += 1
+            if error > curve.bound(route.amount) and pair not in self._drifted:
+                self._drifted.add(pair)
+                self._drifts += 1
+        return error
+
+    def drifted(self) -> list[RoutePair]:
+        """Pairs waiting to be re-sampled."""
+        with self._lock:
+            return sorted(self._drifted)
+
+    def clear(self) -> None:
+        """Drop all curves and counters."""
+        with self._lock:
+            self._curves.clear()
+            self._drifted.clear()
+            self._hits = 0
+            self._misses = 0
+            self._checks = 0
+            self._drifts = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Curve count, hit ratio and drift counters."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "curves": len(self._curves),
+                "drifted": len(self._drifted),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "checks": self._checks,
+                "drifts": self._drifts,
+            }
+
+
+# ==============================================================================
+# SHARED MODEL
+# ==============================================================================
+
+
+COST_MODEL = CostModel()
+
+
+async def refresh_cost_curves(
+    api_key: Optional[str] = None,
+    drifted_only: bool = False,
+) -> int:
+    """
+    Re-sample ROUTE_MATRIX and refit COST_MODEL from it.
+
+    Args:
+        api_key: Optional LI.FI API key
+        drifted_only: Re-sample only the pairs marked drifted
+
+    Returns:
+        Number of curves fitted
+    """
+    pairs: Optional[list[RoutePair]] = None
+    if drifted_only:
+        pairs = COST_MODEL.drifted()
+        if not pairs:
+            return 0
+
+    await ROUTE_MATRIX.refresh(api_key=api_key, pairs=pairs)
+    return COST_MODEL.fit(ROUTE_MATRIX, pairs)
@@ -0,0 +1,295 @@
+"""
+================================================================================
+    ROUTE MATRIX
+    Best bridge route for every supported chain pair and common token
+
+    With seven chains and a few common tokens there are only a few dozen
+    directed chain pairs per token, so the best route for each (from,
+    to, token) is quoted in the background at a few reference amounts.
+    Requests are answered from the matrix with a dict lookup: the
+    nearest reference amount on a log scale, rescaled to the requested
+    amount the way the route cache rescales (see route_cache). Only a
+    miss goes to LI.FI on the request path.
+
+    A refresh quotes every cell once, under a request semaphore and a
+    token bucket, so the background job stays within LI.FI rate limits.
+    Cells are published as they are quoted, and a cell older than
+    max_age_seconds is treated as missing.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+import time
+from typing import Any, Iterable, Optional, Sequence
+from urllib.parse import urlsplit
+
+from yield_agent.state import BridgeRoute, SUPPORTED_CHAINS
+from yield_agent.tools.lifi_client import COMMON_TOKENS, LiFiClient
+from yield_agent.tools.pool_charts import HostRateLimiter
+from yield_agent.tools.route_cache import rescale_routes
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+ROUTE_MATRIX_TOKENS = [
+    token.strip().upper()
+    for token in os.getenv("ROUTE_MATRIX_TOKENS", "USDC,USDT,ETH").split(",")
+    if token.strip()
+]
+
+ROUTE_MATRIX_AMOUNTS = [
+    float(amount)
+    for amount in os.getenv("ROUTE_MATRIX_AMOUNTS", "1000,10000,100000").split(",")
+    if amount.strip()
+]
+
+# Cells older than this are ignored; keep it above the refresh interval.
+ROUTE_MATRIX_MAX_AGE_SECONDS = float(os.getenv("ROUTE_MATRIX_MAX_AGE_SECONDS", 7200))
+
+# LI.FI request budget of one refresh: requests in flight, and the
+# sustained rate and burst of the token bucket.
+ROUTE_MATRIX_CONCURRENCY = int(os.getenv("ROUTE_MATRIX_CONCURRENCY", 2))
+ROUTE_MATRIX_RATE_PER_SECOND = float(os.getenv("ROUTE_MATRIX_RATE_PER_SECOND", 0.5))
+ROUTE_MATRIX_BURST = int(os.getenv("ROUTE_MATRIX_BURST", 5))
+
+
+# (from_chain, to_chain, token) of a matrix row.
+RoutePair = tuple[str, str, str]
+
+# (from_chain, to_chain, token, reference amount) of a matrix cell.
+MatrixKey = tuple[str, str, str, float]
+
+
+# ==============================================================================
+# MATRIX CLASS
+# ==============================================================================
+
+
+class RouteMatrix:
+    """
+    Thread-safe map of chain pair, token and reference amount to the
+    best route, refreshed in the background.
+    """
+
+    def __init__(
+        self,
+        tokens: Sequence[str] = ROUTE_MATRIX_TOKENS,
+        amounts: Sequence[float] = ROUTE_MATRIX_AMOUNTS,
+        max_age_seconds: float = ROUTE_MATRIX_MAX_AGE_SECONDS,
+        concurrency: int = ROUTE_MATRIX_CONCURRENCY,
+        limiter: Optional[HostRateLimiter] = None,
+    ):
+        self.tokens = [token.upper() for token in tokens]
+        self.amounts = sorted(amount for amount in amounts if amount > 0)
+        self.max_age_seconds = max_age_seconds
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter or HostRateLimiter(
+            ROUTE_MATRIX_RATE_PER_SECOND, ROUTE_MATRIX_BURST
+        )
+        self._lock = threading.Lock()
+        self._cells: dict[MatrixKey, tuple[BridgeRoute, float]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._quotes = 0
+        self._errors = 0
+        self._last_error: Optional[str] = None
+        self._last_refresh: dict[str, Any] = {}
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    def pairs(self) -> list[RoutePair]:
+        """Every directed chain pair, per token, with the token on both chains."""
+        pairs: list[RoutePair] = []
+        for token in self.tokens:
+            chains = [
+                chain for chain in SUPPORTED_CHAINS
+                if COMMON_TOKENS.get(token, {}).get(chain)
+            ]
+            pairs.extend(
+                (from_chain, to_chain, token)
+                for from_chain in chains
+                for to_chain in chains
+                if from_chain != to_chain
+            )
+        return pairs
+
+    def lookup(
+        self, from_chain: str, to_chain: str, token: str, amount: float
+    ) -> Optional[BridgeRoute]:
+        """
+        Best route for a transfer, from the nearest reference amount.
+
+        Reference amounts are compared on a log scale, and only fresh
+        cells are considered.
+
+        Returns:
+            The route rescaled to ``amount``, or None on a miss
+        """
+        pair = (from_chain.lower(), to_chain.lower(), token.upper())
+        if not amount > 0:
+            return None
+
+        with self._lock:
+            now = time.time()
+            best: Optional[tuple[BridgeRoute, float]] = None
+            best_distance = math.inf
+            for reference in self.amounts:
+                cell = self._cells.get((*pair, reference))
+                if cell is None or now - cell[1] >= self.max_age_seconds:
+                    continue
+                distance = abs(math.log(amount / reference))
+                if distance < best_distance:
+                    best, best_distance = (cell[0], reference), distance
+
+            if best is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+
+        route, reference = best
+        return rescale_routes([route], reference, amount)[0]
+
+    def samples(self, pair: RoutePair) -> list[tuple[float, BridgeRoute]]:
+        """Fresh (reference amount, route) cells of one pair, smallest amount first."""
+        with self._lock:
+            now = time.time()
+            cells = [(amount, self._cells.get((*pair, amount))) for amount in self.amounts]
+            return [
+                (amount, cell[0]) for amount, cell in cells
+                if cell is not None and now - cell[1] < self.max_age_seconds
+            ]
+
+    def publish(self, key: MatrixKey, route: BridgeRoute) -> None:
+        """Replace the route of one cell."""
+        with self._lock:
+            self._cells[key] = (route, time.time())
+
+    async def refresh(
+        self,
+        api_key: Optional[str] = None,
+        client: Optional[LiFiClient] = None,
+        pairs: Optional[Iterable[RoutePair]] = None,
+    ) -> int:
+        """
+        Quote every cell and publish each as it arrives.
+
+        Args:
+            api_key: Optional LI.FI API key
+            client: Open LiFiClient to use (default: a new one)
+            pairs: Pairs to quote (default: every pair)
+
+        Returns:
+            Number of cells published
+
+        Raises:
+            RuntimeError: If every quote failed
+        """
+        if client is None:
+            async with LiFiClient(api_key=api_key) as client:
+                return await self.refresh(client=client, pairs=pairs)
+
+        started = time.perf_counter()
+        if pairs is None:
+            pairs = self.pairs()
+        keys: list[MatrixKey] = [
+            (*pair, amount) for pair in pairs for amount in self.amounts
+        ]
+        if not keys:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        host = urlsplit(client.base_url).netloc
+        errors: list[str] = []
+
+        async def quote(key: MatrixKey) -> bool:
+            from_chain, to_chain, token, amount = key
+            async with semaphore:
+                await self.limiter.acquire(host)
+                try:
+                    routes = await client.get_routes(
+                        from_chain=from_chain,
+                        to_chain=to_chain,
+                        from_token=token,
+                        to_token=token,
+                        amount=amount,
+                        cached=False,
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    errors.append(f"{from_chain}->{to_chain} {token}: {e}")
+                    return False
+
+            if not routes:
+                return False
+            self.publish(key, routes[0])
+            return True
+
+        published = sum(await asyncio.gather(*(quote(key) for key in keys)))
+
+        with self._lock:
+            self._quotes += len(keys)
+            self._errors += len(errors)
+            if errors:
+                self._last_error = errors[-1]
+            self._last_refresh = {
+                "cells": len(keys),
+                "published": published,
+                "errors": len(errors),
+                "duration_seconds": round(time.perf_counter() - started, 3),
+            }
+
+        if errors and len(errors) == len(keys):
+            raise RuntimeError(f"All route matrix quotes failed ({errors[0]})")
+
+        return published
+
+    def clear(self) -> None:
+        """Drop all cells and counters."""
+        with self._lock:
+            self._cells.clear()
+            self._hits = 0
+            self._misses = 0
+            self._quotes = 0
+            self._errors = 0
+            self._last_error = None
+            self._last_refresh = {}
+
+    def stats(self) -> dict[str, Any]:
+        """Coverage, hit ratio and the outcome of the last refresh."""
+        with self._lock:
+            now = time.time()
+            fresh = sum(
+                1 for _, at in self._cells.values() if now - at < self.max_age_seconds
+            )
+            lookups = self._hits + self._misses
+            return {
+                "cells": len(self.pairs()) * len(self.amounts),
+                "fresh_cells": fresh,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "quotes": self._quotes,
+                "errors": self._errors,
+                "last_error": self._last_error,
+                "last_refresh": dict(self._last_refresh),
+            }
+
+
+# ==============================================================================
+# SHARED MATRIX
+# ==============================================================================
+
+
+ROUTE_MATRIX = RouteMatrix()
+
@@ -0,0 +1,118 @@
+"""
+================================================================================
+    SNAPSHOT BOARD
+    Latest published value per key, shared across threads
+
+    The background refresher publishes gas estimates and bridge routes
+    here; request handlers only read. Reads also count demand per key,
+    so the refresher knows which routes are popular enough to keep warm.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+# Demand is tracked for at most this many keys; the least requested half
+# is forgotten when the limit is reached, and expired values are pruned.
+MAX_TRACKED_KEYS = 10_000
+
+
+# ==============================================================================
+# BOARD CLASS
+# ==============================================================================
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SnapshotBoard(Generic[K, V]):
+    """
+    Thread-safe map of key to its most recently published value.
+
+    Values older than max_age_seconds are treated as missing, so a
+    stalled refresher degrades to live fetches instead of serving
+    arbitrarily old data.
+    """
+
+    def __init__(self, name: str, max_age_seconds: float):
+        self.name = name
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._values: dict[K, tuple[V, float]] = {}
+        self._demand: Counter[K] = Counter()
+        self._hits = 0
+        self._misses = 0
+        self._publishes = 0
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    def get(self, key: K) -> Optional[V]:
+        """Return the published value for a key, or None if missing or expired."""
+        with self._lock:
+            self._demand[key] += 1
+            if len(self._demand) > MAX_TRACKED_KEYS:
+                self._demand = Counter(dict(self._demand.most_common(MAX_TRACKED_KEYS // 2)))
+            entry = self._values.get(key)
+            if entry is None or time.time() - entry[1] >= self.max_age_seconds:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[0]
+
+    def publish(self, key: K, value: V) -> None:
+        """Replace the value for a key."""
+        with self._lock:
+            now = time.time()
+            self._values[key] = (value, now)
+            self._publishes += 1
+            if len(self._values) > MAX_TRACKED_KEYS:
+                self._values = {
+                    k: entry for k, entry in self._values.items()
+                    if now - entry[1] < self.max_age_seconds
+                }
+
+    def popular(self, limit: int) -> list[K]:
+        """The most requested keys, most requested first."""
+        with self._lock:
+            return [key for key, _ in self._demand.most_common(limit)]
+
+    def clear(self) -> None:
+        """Drop all values, demand and counters."""
+        with self._lock:
+            self._values.clear()
+            self._demand.clear()
+            self._hits = 0
+            self._misses = 0
+            self._publishes = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters and the age of the oldest value."""
+        with self._lock:
+            now = time.time()
+            lookups = self._hits + self._misses
+            return {
+                "name": self.name,
+                "keys": len(self._values),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "publishes": self._publishes,
+                "oldest_age_seconds": (
+                    round(now - min(at for _, at in self._values.values()), 1)
+                    if self._values else None
+                ),
+                "max_age_seconds": self.max_age_seconds,
+            }
@@ -0,0 +1,345 @@
+"""
+================================================================================
+    TOKEN REGISTRY
+    LI.FI token list per supported chain, cached on disk
+
+    LI.FI's /tokens lists the tokens it can route on every chain, with
+    their contract addresses and decimals. The registry downloads it for
+    the supported chains at most once per TOKEN_REGISTRY_MAX_AGE_SECONDS,
+    indexes it by (chain, symbol) and (chain, address), and saves it to
+    TOKEN_REGISTRY_PATH, so a restarted or offline process still has
+    it. COMMON_TOKENS in lifi_client stays authoritative for the tokens
+    it lists; the registry covers everything else, and supplies the
+    decimals that amounts are scaled by.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+import httpx
+import msgspec
+
+from yield_agent.state import SUPPORTED_CHAINS
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+TOKENS_URL = "https://li.quest/v1/tokens"
+
+TOKEN_REGISTRY_PATH = os.getenv(
+    "TOKEN_REGISTRY_PATH", os.path.join(".cache", "lifi_tokens.json")
+)
+
+TOKEN_REGISTRY_MAX_AGE_SECONDS = float(os.getenv("TOKEN_REGISTRY_MAX_AGE_SECONDS", 86_400))
+
+REQUEST_TIMEOUT = 30.0
+
+# Wait after a failed download before trying again.
+RETRY_AFTER_SECONDS = 900.0
+
+CHAIN_KEYS_BY_ID: dict[int, str] = {
+    config["chain_id"]: key for key, config in SUPPORTED_CHAINS.items()
+}
+
+
+# ==============================================================================
+# SCHEMA
+# ==============================================================================
+
+
+class TokenRecord(msgspec.Struct, gc=False):
+    """One /tokens entry, projected to the fields the registry reads."""
+
+    address: Any = None
+    symbol: Any = None
+    decimals: Any = None
+
+
+class TokensResponse(msgspec.Struct):
+    """/tokens body: token lists keyed by chain id."""
+
+    tokens: dict[str, list[TokenRecord]] = {}
+
+
+class TokenInfo(msgspec.Struct, gc=False):
+    """What the registry keeps per token."""
+
+    chain: str
+    address: str
+    symbol: str
+    decimals: int
+
+
+class RegistryFile(msgspec.Struct):
+    """On-disk form of the registry."""
+
+    fetched_at: float
+    tokens: list[TokenInfo]
+
+
+_tokens_decoder = msgspec.json.Decoder(TokensResponse, strict=False)
+_file_decoder = msgspec.json.Decoder(RegistryFile)
+
+
+def parse_tokens(body: bytes) -> list[TokenInfo]:
+    """
+    Decode a /tokens body, keeping supported chains and complete entries.
+
+    Raises:
+        msgspec.DecodeError: If the body is not a valid /tokens payload
+    """
+    tokens = []
+    for chain_id, records in _tokens_decoder.decode(body).tokens.items():
+        chain = CHAIN_KEYS_BY_ID.get(_chain_id(chain_id))
+        if chain is None:
+            continue
+        for record in records:
+            if (
+                not isinstance(record.address, str)
+                or not isinstance(record.symbol, str)
+                or not record.symbol
+                or not isinstance(record.decimals, int)
+                or isinstance(record.decimals, bool)
+                or not 0 <= record.decimals <= 36
+            ):
+                continue
+            tokens.append(TokenInfo(
+                chain=chain,
+                address=record.address,
+                symbol=record.symbol,
+                decimals=record.decimals,
+            ))
+    return tokens
+
+
+def _chain_id(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+# ==============================================================================
+# REGISTRY CLASS
+# ==============================================================================
+
+
+class TokenRegistry:
+    """
+    LI.FI tokens indexed by (chain, symbol) and (chain, address).
+
+    Lookups never touch the network. Symbols are matched
+    case-insensitively; when a chain lists one symbol more than once,
+    the first listing wins. A failed download keeps the last good
+    registry.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = TOKEN_REGISTRY_PATH,
+        max_age_seconds: float = TOKEN_REGISTRY_MAX_AGE_SECONDS,
+        url: str = TOKENS_URL,
+    ):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.url = url
+        self._lock = threading.Lock()
+        self._by_symbol: dict[tuple[str, str], TokenInfo] = {}
+        self._by_address: dict[tuple[str, str], TokenInfo] = {}
+        self._fetched_at: Optional[float] = None
+        self._refreshes = 0
+        self._errors = 0
+        self._last_error: Optional[str] = None
+        self._retry_at = 0.0
+        self._loaded_from_disk = False
+
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._by_address)
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        if self._fetched_at is None:
+            return None
+        return max(0.0, time.time() - self._fetched_at)
+
+    # --------------------------------------------------------------------------
+    # LOOKUPS
+    # --------------------------------------------------------------------------
+
+    def get(self, chain: str, token: str) -> Optional[TokenInfo]:
+        """Registry entry for a token symbol or address on a chain, or None."""
+        chain = chain.lower()
+        if token.startswith("0x"):
+            return self._by_address.get((chain, token.lower()))
+        return self._by_symbol.get((chain, token.upper()))
+
+    def address(self, chain: str, symbol: str) -> Optional[str]:
+        """Contract address of a symbol on a chain, or None."""
+        info = self._by_symbol.get((chain.lower(), symbol.upper()))
+        return info.address if info is not None else None
+
+    def decimals(self, chain: str, token: str) -> Optional[int]:
+        """Decimals of a token symbol or address on a chain, or None."""
+        info = self.get(chain, token)
+        return info.decimals if info is not None else None
+
+    # --------------------------------------------------------------------------
+    # REFRESH
+    # --------------------------------------------------------------------------
+
+    async def refresh_if_stale(self, client: Optional[httpx.AsyncClient] = None) -> bool:
+        """
+        Download /tokens if the registry is older than max_age_seconds.
+
+        Never raises; errors are recorded in stats().
+
+        Args:
+            client: Open HTTP client to use (default: a short-lived one)
+
+        Returns:
+            Whether the registry was replaced
+        """
+        age = self.age_seconds
+        if age is not None and age < self.max_age_seconds:
+            return False
+        if time.time() < self._retry_at:
+            return False
+
+        try:
+            if client is None:
+                async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as own_client:
+                    await self.refresh(own_client)
+            else:
+                await self.refresh(client)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+                self._last_error = str(e) or type(e).__name__
+                self._retry_at = time.time() + RETRY_AFTER_SECONDS
+            return False
+        return True
+
+    async def refresh(self, client: httpx.AsyncClient) -> None:
+        """
+        Download /tokens for the supported chains and replace the registry,
+        saving it to disk.
+
+        Raises:
+            httpx.HTTPError: If the download fails
+            msgspec.DecodeError: If the body is not a valid /tokens payload
+        """
+        response = await client.get(
+            self.url,
+            params={"chains": ",".join(str(chain_id) for chain_id in CHAIN_KEYS_BY_ID)},
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        tokens = parse_tokens(response.content)
+        fetched_at = time.time()
+        by_symbol, by_address = _index(tokens)
+
+        with self._lock:
+            self._by_symbol = by_symbol
+            self._by_address = by_address
+            self._fetched_at = fetched_at
+            self._refreshes += 1
+            self._last_error = None
+
+        if self.path:
+            self._save(RegistryFile(fetched_at=fetched_at, tokens=tokens))
+
+    def stats(self) -> dict[str, Any]:
+        """Size, age and refresh counters."""
+        age = self.age_seconds
+        with self._lock:
+            return {
+                "tokens": len(self._by_address),
+                "symbols": len(self._by_symbol),
+                "age_seconds": round(age, 1) if age is not None else None,
+                "loaded_from_disk": self._loaded_from_disk,
+                "refreshes": self._refreshes,
+                "errors": self._errors,
+                "last_error": self._last_error,
+            }
+
+    # --------------------------------------------------------------------------
+    # PRIVATE METHODS
+    # --------------------------------------------------------------------------
+
+    def _load(self) -> None:
+        """Load the saved registry; a missing or unreadable file is skipped."""
+        try:
+            with open(self.path, "rb") as f:
+                saved = _file_decoder.decode(f.read())
+        except (OSError, msgspec.DecodeError):
+            return
+        self._by_symbol, self._by_address = _index(saved.tokens)
+        self._fetched_at = saved.fetched_at
+        self._loaded_from_disk = True
+
+    def _save(self, saved: RegistryFile) -> None:
+        """Write the registry atomically. Never raises."""
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tokens-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(msgspec.json.encode(saved))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            with self._lock:
+                self._last_error = str(e) or type(e).__name__
+
+
+def _index(
+    tokens: list[TokenInfo],
+) -> tuple[dict[tuple[str, str], TokenInfo], dict[tuple[str, str], TokenInfo]]:
+    """(chain, SYMBOL) and (chain, address) indexes; the first listing wins."""
+    by_symbol: dict[tuple[str, str], TokenInfo] = {}
+    by_address: dict[tuple[str, str], TokenInfo] = {}
+    for info in tokens:
+        by_symbol.setdefault((info.chain, info.symbol.upper()), info)
+        by_address.setdefault((info.chain, info.address.lower()), info)
+    return by_symbol, by_address
+
+
+# ==============================================================================
+# PROCESS-WIDE INSTANCE
+# ==============================================================================
+
+
+_registry: Optional[TokenRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_token_registry() -> TokenRegistry:
+    """
+    Return the process-wide token registry, loading it on first use.
+
+    Set TOKEN_REGISTRY_PATH to an empty string to keep it in memory.
+    """
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TokenRegistry(TOKEN_REGISTRY_PATH or None)
+
+    return _registry
@@ -0,0 +1,264 @@
+"""
+================================================================================
+    TOKEN TAXONOMY
+    Canonical tokens and token families for pool symbols
+
+    Pool symbols spell the same asset many ways ("WETH", "USDC.e",
+    "USDbC"), and substring tests on them match far too much: "ETH" is
+    inside "ETHFI", "USD" inside any symbol naming a dollar. The
+    taxonomy resolves each symbol component to a canonical token and a
+    family (stable, ETH and its liquid staking tokens, BTC, other), and
+    well-known underlying token addresses to the same canonical tokens.
+
+    A pool resolves to one uint64 mask: the low bits are its families,
+    the rest one bit per known canonical token. PoolTable stores the
+    mask as a column, so token filters are a single vectorized AND.
+================================================================================
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+
+from yield_agent.tools.pool_index import SYMBOL_SEPARATORS
+
+
+# ==============================================================================
+# CONSTANTS
+# ==============================================================================
+
+
+FAMILY_STABLE = 1 << 0
+FAMILY_ETH = 1 << 1
+FAMILY_BTC = 1 << 2
+FAMILY_OTHER = 1 << 3
+
+FAMILY_NAMES: dict[int, str] = {
+    FAMILY_STABLE: "stable",
+    FAMILY_ETH: "eth",
+    FAMILY_BTC: "btc",
+    FAMILY_OTHER: "other",
+}
+
+FAMILY_BITS = 4
+
+# Canonical token -> family. Each token gets a mask bit, in this order,
+# after the family bits; at most 64 - FAMILY_BITS tokens fit.
+CANONICAL_TOKENS: dict[str, int] = {
+    **dict.fromkeys(
+        [
+            "USDC", "USDT", "DAI", "USDS", "FRAX", "LUSD", "USDE", "SUSDE", "GHO",
+            "CRVUSD", "PYUSD", "FDUSD", "TUSD", "BUSD", "SDAI", "USD0", "USDM",
+            "DOLA", "MIM",
+        ],
+        FAMILY_STABLE,
+    ),
+    **dict.fromkeys(
+        [
+            "ETH", "STETH", "WSTETH", "RETH", "CBETH", "WEETH", "EETH", "EZETH",
+            "RSETH", "SFRXETH", "FRXETH", "METH", "OETH", "SWETH", "ETHX", "OSETH",
+        ],
+        FAMILY_ETH,
+    ),
+    **dict.fromkeys(
+        ["BTC", "WBTC", "TBTC", "CBBTC", "BTCB", "LBTC", "SOLVBTC"],
+        FAMILY_BTC,
+    ),
+    **dict.fromkeys(
+        ["ARB", "OP", "POL", "AVAX", "BNB", "SOL", "LINK", "UNI", "AAVE", "CRV", "GMX", "PENDLE"],
+        FAMILY_OTHER,
+    ),
+}
+
+# Other spellings of canonical tokens: wrapped natives and bridged copies.
+TOKEN_ALIASES: dict[str, str] = {
+    "WETH": "ETH",
+    "USDC.E": "USDC",
+    "USDBC": "USDC",
+    "USDT.E": "USDT",
+    "USDT0": "USDT",
+    "DAI.E": "DAI",
+    "WBTC.E": "WBTC",
+    "BTC.B": "BTCB",
+    "MATIC": "POL",
+    "WMATIC": "POL",
+    "WPOL": "POL",
+    "WAVAX": "AVAX",
+    "WBNB": "BNB",
+    "WSOL": "SOL",
+}
+
+# Well-known token contracts (lowercase) -> canonical token.
+UNDERLYING_TOKENS: dict[str, str] = {
+    # Ethereum
+    "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48": "USDC",
+    "0xdac17f958d2ee523a2206206994597c13d831ec7": "USDT",
+    "0x6b175474e89094c44da98b954eedeac495271d0f": "DAI",
+    "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2": "ETH",
+    "0x2260fac5e5542a773aa44fbcfedf7c193bc2c599": "WBTC",
+    "0xae7ab96520de3a18e5e111b5eaab095312d7fe84": "STETH",
+    "0x7f39c581f595b53c5cb19bd0b3f8da6c935e2ca0": "WSTETH",
+    "0xae78736cd615f374d3085123a210448e74fc6393": "RETH",
+    # Arbitrum
+    "0xaf88d065e77c8cc2239327c5edb3a432268e5831": "USDC",
+    "0xfd086bc7cd5c481dcc9c85ebe478a1c0b69fcbb9": "USDT",
+    "0x82af49447d8a07e3bd95bd0d56f35241523fbab1": "ETH",
+    # Optimism and Base WETH share a predeploy address
+    "0x4200000000000000000000000000000000000006": "ETH",
+    # Base
+    "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913": "USDC",
+    # Polygon
+    "0x3c499c542cef5e3811e1192ce70d8cc03d5c3359": "USDC",
+}
+
+# Query tokens that stand for their whole family, as "USDC" has always
+# matched pools of any stablecoin.
+FAMILY_QUERIES: dict[str, int] = {
+    "USDC": FAMILY_STABLE,
+    "USDT": FAMILY_STABLE,
+    "DAI": FAMILY_STABLE,
+    "ETH": FAMILY_ETH,
+}
+
+
+# ==============================================================================
+# TAXONOMY CLASS
+# ==============================================================================
+
+
+class TokenTaxonomy:
+    """
+    Resolves symbols and token addresses to canonical tokens and masks.
+
+    Results are cached per distinct symbol; the caches only grow and
+    their values never change, so unlocked reads and writes are safe.
+    """
+
+    def __init__(
+        self,
+        tokens: dict[str, int] = CANONICAL_TOKENS,
+        aliases: dict[str, str] = TOKEN_ALIASES,
+        addresses: dict[str, str] = UNDERLYING_TOKENS,
+    ):
+        if len(tokens) > 64 - FAMILY_BITS:
+            raise ValueError(f"at most {64 - FAMILY_BITS} canonical tokens fit a mask")
+        self.tokens = tokens
+        self.aliases = aliases
+        self.addresses = addresses
+        self.bits = {token: 1 << (FAMILY_BITS + i) for i, token in enumerate(tokens)}
+        self._symbols: dict[str, tuple[tuple[str, int], ...]] = {}
+        self._masks: dict[str, int] = {}
+
+    # --------------------------------------------------------------------------
+    # RESOLUTION
+    # --------------------------------------------------------------------------
+
+    def canonical(self, token: str) -> str:
+        """Canonical spelling of one token, upper-cased if unknown."""
+        token = token.strip().upper()
+        return self.aliases.get(token, token)
+
+    def family(self, token: str) -> int:
+        """
+        Family bit of a canonical token.
+
+        Unknown tokens named after the dollar ("USDX", "EUSD") count as
+        stable; anything else unknown is FAMILY_OTHER.
+        """
+        family = self.tokens.get(token)
+        if family is not None:
+            return family
+        if token.startswith("USD") or token.endswith("USD"):
+            return FAMILY_STABLE
+        return FAMILY_OTHER
+
+    def components(self, symbol: str) -> tuple[tuple[str, int], ...]:
+        """(canonical token, family) for each component of a pool symbol."""
+        found = self._symbols.get(symbol)
+        if found is None:
+            parts = symbol
+            for separator in SYMBOL_SEPARATORS[1:]:
+                parts = parts.replace(separator, SYMBOL_SEPARATORS[0])
+            tokens = [self.canonical(part) for part in parts.split(SYMBOL_SEPARATORS[0])]
+            found = self._symbols[symbol] = tuple(
+                (token, self.family(token)) for token in tokens if token
+            )
+        return found
+
+    # --------------------------------------------------------------------------
+    # MASKS
+    # --------------------------------------------------------------------------
+
+    def token_mask(self, token: str) -> int:
+        """Family bit plus the token's own bit, if it has one."""
+        return self.family(token) | self.bits.get(token, 0)
+
+    def symbol_mask(self, symbol: Any) -> int:
+        """Mask of every component of a symbol; 0 for non-strings."""
+        if not isinstance(symbol, str):
+            return 0
+        mask = self._masks.get(symbol)
+        if mask is None:
+            mask = 0
+            for token, _ in self.components(symbol):
+                mask |= self.token_mask(token)
+            self._masks[symbol] = mask
+        return mask
+
+    def address_mask(self, addresses: Any) -> int:
+        """Mask of the known tokens among a pool's underlying addresses."""
+        if not isinstance(addresses, (list, tuple)):
+            return 0
+        mask = 0
+        for address in addresses:
+            if isinstance(address, str):
+                token = self.addresses.get(address.lower())
+                if token is not None:
+                    mask |= self.token_mask(token)
+        return mask
+
+    def pool_mask(self, symbol: Any, addresses: Any = None) -> int:
+        """Mask of a pool from its symbol and underlying addresses."""
+        return self.symbol_mask(symbol) | self.address_mask(addresses)
+
+    def symbol_masks(self, symbols: Sequence[Any]) -> np.ndarray:
+        """uint64 mask per symbol, e.g. per category of a symbol column."""
+        return np.fromiter(
+            (self.symbol_mask(symbol) for symbol in symbols),
+            dtype=np.uint64,
+            count=len(symbols),
+        )
+
+    def address_masks(self, token_lists: Iterable[Any], count: int) -> np.ndarray:
+        """uint64 mask per row from each row's underlying address list."""
+        return np.fromiter(
+            (self.address_mask(addresses) for addresses in token_lists),
+            dtype=np.uint64,
+            count=count,
+        )
+
+    def query_mask(self, token: str) -> Optional[int]:
+        """
+        Mask bits a pool must share to hold a requested token.
+
+        Family-wide query tokens (FAMILY_QUERIES) match their family;
+        others match only their own token bit.
+
+        Returns:
+            The bits, or None for a token without a bit of its own
+        """
+        token = self.canonical(token)
+        bit = self.bits.get(token)
+        if bit is None:
+            return None
+        return bit | FAMILY_QUERIES.get(token, 0)
+
+
+# ==============================================================================
+# SHARED TAXONOMY
+# ==============================================================================
+
+
+TOKENS = TokenTaxonomy()
@@ -0,0 +1,92 @@
+"""
+================================================================================
+    VOCABULARY
+    Process-wide dictionary encoding for chain names
+
+    Maps every spelling of a name to a small integer code shared by all
+    snapshots and requests, so nodes compare chains as integers instead
+    of lowercasing and comparing strings. Only closed sets of names
+    belong here: codes are never freed, so coding open-ended values
+    such as project names would grow a vocabulary without bound. Codes are
+    case-insensitive: "Base" and "base" get the same code, and each
+    spelling is hashed once per string object thanks to Python's cached
+    string hashes.
+================================================================================
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from typing import Any, Optional
+
+
+# ==============================================================================
+# VOCABULARY CLASS
+# ==============================================================================
+
+
+class Vocabulary:
+    """
+    Append-only string <-> code table, safe to share across threads.
+
+    Codes are never reused or removed, so a code stays valid for the
+    life of the process. Lookups are lock-free; only new names take
+    the lock.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._codes: dict[str, int] = {}
+        self._names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    # --------------------------------------------------------------------------
+    # PUBLIC METHODS
+    # --------------------------------------------------------------------------
+
+    def code(self, value: str) -> int:
+        """Code for a name in any casing, assigning one if it is new."""
+        code = self._codes.get(value)
+        if code is not None:
+            return code
+
+        with self._lock:
+            key = sys.intern(value.lower())
+            code = self._codes.get(key)
+            if code is None:
+                code = len(self._names)
+                self._names.append(key)
+                self._codes[key] = code
+            self._codes[value] = code
+            return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        """Code for a name in any casing, or None if it was never coded."""
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes.get(value.lower())
+        return code
+
+    def label(self, code: int) -> str:
+        """The lowercase name for a code."""
+        return self._names[code]
+
+    def stats(self) -> dict[str, Any]:
+        """Number of names and spellings held."""
+        return {
+            "name": self.name,
+            "names": len(self._names),
+            "spellings": len(self._codes),
+        }
+
+
+# ==============================================================================
+# SHARED VOCABULARIES
+# ==============================================================================
+
+
+CHAINS = Vocabulary("chains")
@@ -9,9 +9,19 @@
 """
 
 import asyncio
+import json
+import os
+from datetime import date
 import sys
+import tempfile
+import threading
+import time
+import traceback
 from pathlib import Path
 
+import httpx
+import numpy as np
+
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from yield_agent.state import (
@@ -24,6 +34,7 @@ from yield_agent.state import (
     ILRisk,
     Intent,
     SUPPORTED_CHAINS,
+    merge_opportunities,
 )
 from yield_agent.nodes.input_parser import (
     parse_input,
@@ -37,6 +48,47 @@ from yield_agent.nodes.response_formatter import (
     format_currency,
     format_apy,
 )
+import yield_agent.nodes.ranking_engine as ranking_engine
+import yield_agent.nodes.yield_fetcher as yield_fetcher
+from yield_agent.nodes.ranking_engine import (
+    calculate_apy_volatility,
+    calculate_volatility_penalty,
+)
+from yield_agent.nodes.route_finder import find_routes_async, get_unique_target_chains
+from yield_agent.nodes.yield_fetcher import (
+    deduplicate_opportunities,
+    filter_by_risk_tolerance,
+    filter_by_token,
+    filter_excluded_protocols,
+    sort_opportunities,
+)
+from yield_agent.graph import find_routes_only
+from yield_agent.refresher import BackgroundRefresher, RefreshJob
+import yield_agent.tools.defillama_client as defillama_client
+from yield_agent.tools.defillama_client import DeFiLlamaClient
+import yield_agent.tools.pool_cache as pool_cache
+from yield_agent.tools.lifi_client import ROUTE_BOARD, LiFiClient, route_key
+from yield_agent.tools.pool_cache import PoolDownload, PoolsNotModified, PoolSnapshotCache
+from yield_agent.tools.pool_charts import ChartFetcher, ChartStore, HostRateLimiter, decode_chart
+from yield_agent.tools.pool_diff import ChangeLog, diff_tables
+from yield_agent.tools.pool_history import PoolHistory
+from yield_agent.tools.pool_identity import dedupe_pools, identity_key
+from yield_agent.tools.pool_records import PoolRecord, decode_pools
+from yield_agent.tools.pool_risk import IL_RISK_LEVELS
+from yield_agent.tools.pool_shards import select_shards
+from yield_agent.tools.pool_store import SnapshotFormatError, load_snapshot, save_snapshot
+from yield_agent.tools.pool_stream import PoolStreamDecoder
+from yield_agent.tools.pool_table import PoolTable
+from yield_agent.tools.protocol_registry import ProtocolRegistry
+from yield_agent.tools.gas_client import GAS_BOARD
+from yield_agent.tools.lifi_client import ROUTE_CACHE
+from yield_agent.tools.route_cache import RouteCache
+from yield_agent.tools.route_costs import CostModel, fit_cost_curve
+from yield_agent.tools.route_matrix import ROUTE_MATRIX, RouteMatrix
+import yield_agent.tools.token_registry as token_registry
+from yield_agent.tools.token_registry import TokenRegistry
+from yield_agent.tools.token_taxonomy import TOKENS
+from yield_agent.tools.vocabulary import CHAINS, Vocabulary
 
 
 # ==============================================================================
@@ -354,6 +406,1495 @@ def test_format_response_node() -> bool:
         return False
 
 
+def test_pool_snapshot_cache() -> None:
+    """Test TTL hits, cold misses and stale-while-revalidate."""
+    calls = []
+    
+    async def loader():
+        calls.append(1)
+        return [PoolRecord(pool=f"pool-{len(calls)}")]
+    
+    async def scenario():
+        cache = PoolSnapshotCache(loader=loader, ttl_seconds=60)
+        
+        first = await cache.get()
+        second = await cache.get()
+        
+        first.fetched_at -= 120
+        stale = await cache.get()
+        cache._refresh_thread.join(timeout=5)
+        refreshed = await cache.get()
+        
+        return first, second, stale, refreshed, cache.stats()
+    
+    first, second, stale, refreshed, stats = asyncio.run(scenario())
+    
+    assert first is second
+    assert stale is first
+    assert refreshed.snapshot_id == 2
+    assert refreshed.pools == [PoolRecord(pool="pool-2")]
+    assert len(calls) == 2
+    assert (stats["misses"], stats["hits"], stats["stale_hits"]) == (1, 2, 1)
+
+
+def test_pool_cache_single_flight() -> None:
+    """Test that concurrent cold callers share one download and its errors."""
+    calls = []
+    
+    async def slow_loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise RuntimeError("upstream down")
+        return [PoolRecord(pool="pool-1")]
+    
+    async def scenario():
+        cache = PoolSnapshotCache(loader=slow_loader, ttl_seconds=60)
+        
+        failed = await asyncio.gather(
+            *[cache.get() for _ in range(20)], return_exceptions=True
+        )
+        succeeded = await asyncio.gather(*[cache.get() for _ in range(20)])
+        
+        return failed, succeeded, cache.stats()
+    
+    failed, succeeded, stats = asyncio.run(scenario())
+    
+    assert all(isinstance(r, RuntimeError) for r in failed)
+    assert len(calls) == 2
+    assert len({id(s) for s in succeeded}) == 1
+    assert stats["coalesced"] == 38
+    assert stats["refresh_errors"] == 1
+
+
+def test_pool_cache_refresh_failures() -> None:
+    """Test that failures after the download never wedge the in-flight refresh."""
+    calls = []
+    
+    async def loader(validators):
+        calls.append(validators)
+        if len(calls) == 1:
+            # Nothing to revalidate on a cold cache.
+            raise PoolsNotModified("not_modified")
+        return PoolDownload([PoolRecord(pool=f"pool-{len(calls)}")], None)
+    
+    cache = PoolSnapshotCache(loader=loader, ttl_seconds=60, conditional=True)
+    publish = cache._publish
+    
+    def broken_publish(pools, validators=None):
+        cache._publish = publish
+        raise ValueError("bad table")
+    
+    def broken_persist(snapshot):
+        raise OSError("disk full")
+    
+    async def refresh():
+        return await asyncio.wait_for(cache.refresh(), timeout=5)
+    
+    async def scenario():
+        results = []
+        for _ in range(3):
+            try:
+                results.append(await refresh())
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    cache._publish = broken_publish
+    cache._persist = broken_persist
+    revalidate_error, publish_error, snapshot = asyncio.run(scenario())
+    cache._refresh_thread.join(timeout=5)
+    stats = cache.stats()
+    
+    assert isinstance(revalidate_error, AttributeError)
+    assert isinstance(publish_error, ValueError)
+    assert snapshot.pools == [PoolRecord(pool="pool-3")]
+    assert stats["refresh_errors"] == 2
+    assert not stats["refreshing"]
+    assert stats["post_refresh_errors"] == 1
+    assert stats["last_post_refresh_error"] == "broken_persist: disk full"
+
+
+def test_pool_table_masks() -> None:
+    """Test columnar chain, criteria and text filtering."""
+    table = PoolTable([
+        PoolRecord(pool="a", chain="Ethereum", project="aave-v3", symbol="USDC",
+                   tvl_usd=5_000_000, apy=4.0),
+        PoolRecord(pool="b", chain="Arbitrum", project="gmx", symbol="WETH-USDC",
+                   tvl_usd=200_000, apy=12.0, apy_mean_7d=11.0),
+        PoolRecord(pool="c", chain="Solana", project="kamino", symbol="SOL",
+                   tvl_usd=9_000_000, apy=7.0),
+        PoolRecord(pool="d", chain="ethereum", project="Curve-DEX", symbol="DAI-USDT",
+                   tvl_usd=None, apy=2000.0),
+    ])
+    
+    codes = table.resolve_chains(["ethereum", "arbitrum", "solana"])
+    chain_rows = np.flatnonzero(table.chain_mask(codes)).tolist()
+    criteria_rows = np.flatnonzero(table.criteria_mask(100_000, 1.0)).tolist()
+    text_rows = np.flatnonzero(table.text_mask("usdc")).tolist()
+    project_rows = np.flatnonzero(table.text_mask("CURVE")).tolist()
+    
+    assert sorted(codes.values()) == ["arbitrum", "ethereum"]
+    assert chain_rows == [0, 1, 3]
+    assert criteria_rows == [0, 1, 2]
+    assert text_rows == [0, 1]
+    assert project_rows == [3]
+    assert np.isnan(table.apy_mean_7d[0])
+    assert table.tvl_usd[3] == 0
+
+
+def test_pool_search_index() -> None:
+    """Test inverted-index search keeps substring semantics."""
+    table = PoolTable([
+        PoolRecord(chain="Ethereum", project="aave-v3", symbol="USDC"),
+        PoolRecord(chain="Arbitrum", project="uniswap-v3", symbol="WETH-USDC.E"),
+        PoolRecord(chain="Base", project="aerodrome-v1", symbol="AUSDC/DAI"),
+        PoolRecord(chain="Ethereum", project="lido", symbol="STETH"),
+    ])
+    
+    codes = table.resolve_chains(["ethereum", "arbitrum"])
+    
+    assert table.search_rows("usdc").tolist() == [0, 1, 2]
+    assert table.search_rows("USDC", codes).tolist() == [0, 1]
+    assert table.search_rows("et").tolist() == [1, 3]
+    assert table.search_rows("AERO").tolist() == [2]
+    assert table.search_rows("h-u").tolist() == [1]
+    assert table.search_rows("-v3").tolist() == [0, 1]
+    assert table.search_rows("zzz").tolist() == []
+    assert table.search_rows("", codes).tolist() == [0, 1, 3]
+
+
+def test_pool_table_top_k() -> None:
+    """Test per-chain bucketing and stable top-K selection by TVL."""
+    tvls = [5.0, 9.0, 5.0, 1.0, 9.0, 5.0, 7.0]
+    chains = ["Ethereum", "Base", "Ethereum", "Base", "Ethereum", "Ethereum", "Base"]
+    table = PoolTable([
+        PoolRecord(chain=chain, tvl_usd=tvl) for chain, tvl in zip(chains, tvls)
+    ])
+    
+    rows = np.arange(len(tvls))
+    buckets = table.group_by_chain(rows)
+    ethereum = buckets[table.chain_code("Ethereum")]
+    
+    assert ethereum.tolist() == [0, 2, 4, 5]
+    assert table.top_by_tvl(ethereum, 2).tolist() == [4, 0]
+    assert table.top_by_tvl(ethereum, 10).tolist() == [4, 0, 2, 5]
+    assert table.top_by_tvl(ethereum, 0).tolist() == []
+    assert table.sort_by_tvl(rows).tolist() == [1, 4, 6, 0, 2, 5, 3]
+
+
+def test_pool_stream_decoder() -> None:
+    """Test chunked decoding with on-the-fly filtering and projection."""
+    body = (
+        b'{"status": "success", "data": ['
+        b'{"chain": "Ethereum", "project": "aave-v3", "symbol": "USDC", "pool": "a",'
+        b' "tvlUsd": 2500000, "apy": 4.5, "predictions": {"predictedClass": "Up"},'
+        b' "underlyingTokens": ["0xA0b8"], "rewardTokens": null, "mu": 1.2},'
+        b'{"chain": "Solana", "project": "kamino", "symbol": "SOL", "pool": "b",'
+        b' "tvlUsd": 9000000, "apy": 7.1},'
+        b'{"chain": "Base", "project": "moonwell", "symbol": "WETH", "pool": "c",'
+        b' "tvlUsd": 500, "apy": 3.0}'
+        b']}'
+    )
+    
+    decoder = PoolStreamDecoder(chains=["Ethereum", "Base"], min_tvl=10_000)
+    for i in range(0, len(body), 7):
+        decoder.feed(body[i:i + 7])
+    pools = decoder.close()
+    
+    expected = [PoolRecord(
+        pool="a",
+        project="aave-v3",
+        symbol="USDC",
+        chain="Ethereum",
+        apy=4.5,
+        tvl_usd=2500000,
+        underlying_tokens=["0xA0b8"],
+    )]
+    
+    assert pools == expected
+    assert decoder.stats()["pools_seen"] == 3
+
+
+def test_pool_struct_decoder() -> None:
+    """Test the field-projected decoder matches the stream decoder."""
+    body = (
+        b'{"status": "success", "data": ['
+        b'{"chain": "Arbitrum", "project": "gmx", "symbol": "WETH-USDC", "pool": "a",'
+        b' "tvlUsd": 750000, "apy": "12.5", "apyMean30d": 10.1, "ilRisk": "yes",'
+        b' "predictions": {"predictedClass": "Down"}, "rewardTokens": "0xr1, 0xr2"},'
+        b'{"chain": "Tron", "project": "justlend", "symbol": "USDT", "pool": "b",'
+        b' "tvlUsd": 9000000, "apy": 3.3},'
+        b'{"chain": "arbitrum", "project": "aave-v3", "symbol": "DAI", "pool": "c",'
+        b' "tvlUsd": null, "apy": 4.0}'
+        b']}'
+    )
+    
+    records = decode_pools(body, chains=["Arbitrum"], min_tvl=0)
+    
+    decoder = PoolStreamDecoder(chains=["Arbitrum"], min_tvl=0)
+    decoder.feed(body)
+    streamed = decoder.close()
+    
+    assert [r.pool for r in records] == ["a", "c"]
+    assert records[0].apy == 12.5
+    assert not hasattr(records[0], "ilRisk")
+    assert records[1].apy_mean_30d is None
+    assert records[1:] == streamed[1:]
+
+
+def test_pool_snapshot_store() -> None:
+    """Test the on-disk snapshot round trip, validation and warm start."""
+    pools = [
+        PoolRecord(pool="a", project="aave-v3", symbol="USDC", chain="Ethereum",
+                   apy=4.5, tvl_usd=2_500_000.0,
+                   underlying_tokens=["0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"]),
+        PoolRecord(pool="b", project="gmx", symbol="WETH-USDC", chain="Arbitrum",
+                   apy=12.0, apy_mean_7d=11.0, tvl_usd=750_000.0, reward_tokens="0xr1, 0xr2"),
+    ]
+    
+    # Holds the warm start's refresh until the stale snapshot was served.
+    release = threading.Event()
+    
+    async def loader():
+        await asyncio.to_thread(release.wait, 5)
+        return pools[:1]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pools.snapshot")
+        save_snapshot(pools, fetched_at=1_700_000_000.0, path=path)
+        
+        mapped = load_snapshot(path)
+        table = mapped.build_table()
+        
+        cache = PoolSnapshotCache(loader=loader, ttl_seconds=60, snapshot_path=path)
+        warm = cache.warm_start()
+        served = asyncio.run(cache.get())
+        release.set()
+        cache._refresh_thread.join(timeout=5)
+        refreshed = asyncio.run(cache.get())
+        persisted = list(load_snapshot(path))
+        
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 3)
+        try:
+            load_snapshot(path)
+            truncated_rejected = False
+        except SnapshotFormatError:
+            truncated_rejected = True
+        
+        cold = PoolSnapshotCache(loader=loader, ttl_seconds=60, snapshot_path=path)
+        cold_start = cold.warm_start()
+    
+    assert list(mapped) == pools
+    assert mapped.fetched_at == 1_700_000_000.0
+    assert table.tvl_usd.tolist() == [2_500_000.0, 750_000.0]
+    assert np.isnan(table.apy_mean_7d[0])
+    assert table.chain_keys == ["ethereum", "arbitrum"]
+    assert table.underlying_masks[0] != 0
+    assert table.token_masks.tolist() == PoolTable(pools).token_masks.tolist()
+    assert served is warm
+    assert warm.source == "disk"
+    assert refreshed.source == "network"
+    assert len(refreshed) == 1
+    assert persisted == pools[:1]
+    assert truncated_rejected
+    assert cold_start is None
+    assert cold.peek() is None
+    assert "expected" in cold.stats()["warm_start"]["error"]
+
+
+def test_pool_risk_columns() -> None:
+    """Test the IL risk, risk score and protocol age columns of a table."""
+    rows = [
+        ("USDC", "aave-v3", 2e9, 4.0),
+        ("USDC-USDT", "Curve DEX", 5e7, 3.0),
+        ("ETH/STETH", "newproto", 2e5, 25.0),
+        ("WETH-USDC", "uniswap-v3", 3e6, 60.0),
+        ("ARB-OP", None, 8e5, 150.0),
+        ("USDC-DAI", "aave-v3", 2e9, 4.0),
+    ]
+    table = PoolTable([
+        PoolRecord(symbol=symbol, project=project, tvl_usd=tvl, apy=apy)
+        for symbol, project, tvl, apy in rows
+    ])
+    
+    levels = [IL_RISK_LEVELS[code] for code in table.il_risk_codes]
+    aave = table.project_codes[0]
+    today = date(2024, 1, 27)
+    
+    assert levels == [
+        ILRisk.NONE, ILRisk.LOW, ILRisk.MEDIUM, ILRisk.MEDIUM, ILRisk.HIGH, ILRisk.LOW,
+    ]
+    assert table.risk_scores.tolist() == [1.0, 2.5, 7.0, 5.0, 9.0, 1.5]
+    assert table.project_slugs == ["aave-v3", "curve-dex", "newproto", "uniswap-v3", None]
+    assert table.project_audited.tolist() == [True, True, False, True, False]
+    assert table.project_codes[5] == aave
+    assert table.protocol_age_days(0, today) == 365
+    assert table.protocol_age_days(2, today) == 0
+
+
+def test_lazy_materialization() -> None:
+    """Test that candidates filter like models and materialize identically."""
+    client = DeFiLlamaClient()
+    
+    def record(pool_id: str, **fields) -> PoolRecord:
+        values = dict(
+            pool=pool_id, project="aave-v3", symbol="USDC", chain="Ethereum",
+            apy=4.123, apy_base=3.0, apy_reward=1.123, tvl_usd=2e8,
+            underlying_tokens=["0xa"], reward_tokens="0xr1, 0xr2",
+        )
+        values.update(fields)
+        return PoolRecord(**values)
+    
+    def parse(records: list[PoolRecord], chain: str) -> list:
+        table = PoolTable(records)
+        return [client._parse_candidate(table, row, chain) for row in range(len(records))]
+    
+    plain, tupled, *rejected = parse([
+        record("plain"),
+        record("tupled", underlying_tokens=("0xa",)),
+        record("negative", apy_base=-1.0),
+        record("listed", reward_tokens=["0xr"]),
+        record("none-token", underlying_tokens=["0xa", None]),
+        record("no-project", project=None),
+        record("empty-project", project=""),
+    ], "ethereum")
+    
+    candidates = parse([
+        record(f"p{i}", apy=apy, tvl_usd=tvl, project=project)
+        for i, (apy, tvl, project) in enumerate([
+            (4.0, 2e7, "aave-v3"), (30.0, 5e6, "newproto"), (8.0, 3e8, "lido"),
+            (12.0, 5e5, "aave-v3"), (60.0, 4e7, "gmx"),
+        ])
+    ], "base")
+    opportunities = client.materialize(candidates)
+    
+    def ids(rows) -> list[str]:
+        return [row.pool_id for row in rows]
+    
+    model = client.materialize([plain])[0]
+    
+    assert plain is not None
+    assert plain.opportunity is None
+    assert tupled is not None
+    assert tupled.opportunity is not None
+    assert rejected == [None] * 5
+    assert model.apy == 4.12
+    assert model.reward_tokens == ["0xr1", "0xr2"]
+    assert model.risk_score == plain.risk_score
+    assert model.audited
+    assert ids(opportunities) == ids(candidates)
+    assert all(
+        ids(filter_by_risk_tolerance(candidates, risk))
+        == ids(filter_by_risk_tolerance(opportunities, risk))
+        for risk in RiskTolerance
+    )
+    assert all(
+        ids(sort_opportunities(candidates, risk))
+        == ids(sort_opportunities(opportunities, risk))
+        for risk in RiskTolerance
+    )
+
+
+def test_categorical_encoding() -> None:
+    """Test interned snapshot strings and code-based chain/protocol matching."""
+    vocabulary = Vocabulary("test")
+    base = vocabulary.code("Base")
+    
+    body = (
+        b'{"data": ['
+        b'{"pool": "a", "chain": "Base", "project": "aave-v3", "symbol": "USDC", "tvlUsd": 1e6},'
+        b'{"pool": "b", "chain": "Base", "project": "aave-v3", "symbol": "USDC", "tvlUsd": 2e6}'
+        b']}'
+    )
+    first, second = decode_pools(body, chains=None, min_tvl=0)
+    table = PoolTable([first, second])
+    
+    def opportunity(chain: str, protocol: str, slug: str) -> YieldOpportunity:
+        return YieldOpportunity(
+            pool_id=f"{chain}-{protocol}", protocol=protocol, protocol_slug=slug,
+            chain=chain, pool_name=protocol, symbol="USDC", apy=5.0, tvl_usd=1e7,
+            risk_score=3.0,
+        )
+    
+    opportunities = [
+        opportunity("Arbitrum", "Aave V3", "aave-v3"),
+        opportunity("arbitrum", "Lido", "lido"),
+        opportunity("Base", "Compound", "compound-v3"),
+        opportunity("ethereum", "Morpho", "morpho"),
+    ]
+    kept = filter_excluded_protocols(opportunities, ["AAVE-V3", "lido", "not-a-protocol"])
+    
+    assert vocabulary.code("base") == base
+    assert vocabulary.lookup("BASE") == base
+    assert vocabulary.lookup("optimism") is None
+    assert len(vocabulary) == 1
+    assert vocabulary.label(base) == "base"
+    assert first.chain is second.chain
+    assert first.project is second.project
+    assert table.symbol_codes.tolist() == [0, 0]
+    assert table.symbol_names == ["USDC"]
+    assert [o.protocol for o in kept] == ["Compound", "Morpho"]
+    assert get_unique_target_chains(opportunities, "Ethereum") == ["arbitrum", "base"]
+    assert CHAINS.code("Arbitrum") == CHAINS.code("arbitrum")
+
+
+def test_snapshot_diff() -> None:
+    """Test vectorized snapshot diffs and the bounded change log."""
+    def pool(pool_id: str, apy: float, tvl: float, chain: str = "Ethereum") -> PoolRecord:
+        return PoolRecord(
+            pool=pool_id, chain=chain, project="aave-v3", symbol="USDC", apy=apy, tvl_usd=tvl,
+        )
+    
+    old = [pool("a", 5.0, 1e8), pool("b", 5.0, 1e8), pool("c", 5.0, 1e8), pool("gone", 1.0, 1e6)]
+    new = [
+        pool("c", 5.0, 1.05e8),
+        pool("b", 5.2, 5e8),
+        pool("a", 8.0, 1e8),
+        pool("fresh", 3.0, 1e6, chain="Base"),
+        pool(None, 3.0, 1e6),
+    ]
+    diff = diff_tables(PoolTable(old), PoolTable(new), from_id=1, to_id=2)
+    
+    async def loader():
+        return new
+    
+    cache = PoolSnapshotCache(loader=loader, ttl_seconds=60)
+    cache.publish(old)
+    cache.publish(new)
+    cache.publish(new)
+    
+    log = ChangeLog(max_diffs=2)
+    log.start(1)
+    for snapshot_id in (1, 2, 3):
+        log.record(diff_tables(PoolTable(old), PoolTable(old), snapshot_id, snapshot_id + 1))
+    try:
+        log.record(diff_tables(PoolTable(old), PoolTable(old), 1, 5))
+        rejected_gap = False
+    except ValueError:
+        rejected_gap = True
+    
+    assert diff.added == ["fresh"]
+    assert diff.removed == ["gone"]
+    assert [(c["pool"], c["old"], c["new"]) for c in diff.apy] == [("a", 5.0, 8.0)]
+    assert [c["pool"] for c in diff.tvl_usd] == ["b"]
+    assert [c["pool"] for c in diff.risk_score] == ["b", "c"]
+    assert diff.chains == ["base", "ethereum"]
+    assert diff.changed_pools == 5
+    assert [d.to_id for d in cache.changes.since(1)] == [2, 3]
+    assert cache.changes.since(2)[0].changed_pools == 0
+    assert cache.changes.since(3) == []
+    assert log.since(1) is None
+    assert [d.to_id for d in log.since(2)] == [3, 4]
+    assert log.since(9) is None
+    assert rejected_gap
+
+
+def test_changes_endpoint() -> None:
+    """Test bootstrapping and polling /changes from the reported snapshot ids."""
+    try:
+        from fastapi.testclient import TestClient
+        
+        from yield_agent import server
+    except ImportError as e:
+        print(f"      Import error (needs the server extra): {e}")
+        return
+    
+    cache = PoolSnapshotCache(loader=None)
+    cache.changes = ChangeLog(max_diffs=1)
+    client = TestClient(server.app, headers={"X-API-Key": server.API_KEY})
+    
+    shared = pool_cache._pool_cache
+    pool_cache._pool_cache = cache
+    try:
+        empty = client.get("/changes").json()
+        for apy in (4.0, 5.0, 6.0):
+            cache.publish([PoolRecord(pool="a", chain="Base", project="aave-v3",
+                                      symbol="USDC", apy=apy, tvl_usd=1e6)])
+        bootstrap = client.get("/changes").json()
+        zero = client.get("/changes", params={"since": 0}).json()
+        polled = client.get("/changes", params={"since": bootstrap["oldest_snapshot_id"]})
+        current = client.get("/changes", params={"since": bootstrap["latest_snapshot_id"]})
+        expired = client.get("/changes", params={"since": 1})
+        ahead = client.get("/changes", params={"since": 9})
+    finally:
+        pool_cache._pool_cache = shared
+    
+    assert empty["latest_snapshot_id"] is None and empty["changes"] == []
+    assert bootstrap == {
+        "since": None, "latest_snapshot_id": 3, "oldest_snapshot_id": 2, "changes": [],
+    }
+    assert zero["latest_snapshot_id"] == 3 and zero["since"] == 0
+    assert polled.status_code == 200
+    assert [c["to_snapshot_id"] for c in polled.json()["changes"]] == [3]
+    assert current.json()["changes"] == [] and current.json()["latest_snapshot_id"] == 3
+    for response in (expired, ahead):
+        assert response.status_code == 410
+        assert response.json()["detail"]["latest_snapshot_id"] == 3
+        assert response.json()["detail"]["oldest_snapshot_id"] == 2
+
+
+def test_pool_history() -> None:
+    """Test history appends, window stats, chunked compaction and ranking reads."""
+    def table(apys: dict[str, float]) -> PoolTable:
+        return PoolTable([
+            PoolRecord(pool=pool_id, chain="Base", project="aave-v3", symbol="USDC",
+                       apy=apy, tvl_usd=1e6)
+            for pool_id, apy in apys.items()
+        ])
+    
+    now = 1_700_000_000.0
+    series = [{"a": 10.0, "b": 4.0}, {"a": 12.0, "b": 4.0}, {"a": 6.0}, {"a": 9.0, "b": 2.0}]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        history = PoolHistory(tmp)
+        for step, apys in enumerate(series):
+            history.append(table(apys), now - 3 * 3600 + step * 3600)
+        window = history.window("apy", 4 * 3600, now=now)
+        recent = history.window("apy", 90 * 60, now=now)
+        daily = history.window("apy", 4 * 3600, now=now, pool_ids=["a", "missing"],
+                               bucket_seconds=86400)
+        a = window.get("a")
+        
+        # A torn append leaves one column longer than the others.
+        with open(os.path.join(tmp, "gen-000000", "apy"), "ab") as f:
+            f.write(b"\0\0\0\0")
+        reopened = PoolHistory(tmp)
+        
+        compacted = PoolHistory(tmp, raw_seconds=3600, hourly_seconds=4 * 3600)
+        result = compacted.compact(now=now + 4 * 3600)
+        times, values = compacted.series("a", "apy")
+        
+        expired = PoolHistory(tmp, retention_seconds=3600)
+        expired.compact(now=now + 30 * 86400)
+    
+    # One row per chunk still never splits a bucket.
+    with tempfile.TemporaryDirectory() as tmp:
+        chunked = PoolHistory(tmp, raw_seconds=3600, hourly_seconds=4 * 3600, chunk_rows=1)
+        for step, apys in enumerate(series):
+            chunked.append(table(apys), now - 3 * 3600 + step * 3600)
+        chunked_result = chunked.compact(now=now + 4 * 3600)
+        chunked_series = [chunked.series(pool_id, "apy") for pool_id in ("a", "b")]
+    
+    # Ranking takes the daily volatility from recorded history when it
+    # covers HISTORY_MIN_DAYS.
+    with tempfile.TemporaryDirectory() as tmp:
+        recorded = PoolHistory(tmp)
+        today = (time.time() // 86400) * 86400
+        for day in range(10):
+            apys = {"steady": 5.0 + day % 2, "b": 3.0} if day < 3 else {"steady": 5.0 + day % 2}
+            for hour in (1, 13):
+                recorded.append(table(apys), today - (9 - day) * 86400 + hour * 3600)
+        shortlist = [
+            YieldOpportunity(
+                pool_id=pool_id, protocol="Aave V3", protocol_slug="aave-v3", chain="base",
+                pool_name="USDC", symbol="USDC", apy=5.0, tvl_usd=1e6, risk_score=3.0,
+            )
+            for pool_id in ("steady", "b", "unknown")
+        ]
+        shared = pool_cache._pool_cache
+        pool_cache._pool_cache = PoolSnapshotCache(loader=None, history=recorded)
+        try:
+            volatilities = ranking_engine._recorded_volatilities(shortlist)
+        finally:
+            pool_cache._pool_cache = shared
+        
+        assert sorted(window.pool_ids) == ["a", "b"]
+        assert a["count"] == 4
+        assert window.get("b")["count"] == 3
+        assert abs(a["mean"] - 9.25) < 1e-9
+        assert abs(a["std"] - float(np.std([10.0, 12.0, 6.0, 9.0]))) < 1e-9
+        assert abs(a["max_drawdown"] - 0.5) < 1e-9
+        assert a["change"] == -1.0
+        assert window.get("b")["change"] == -2.0
+        assert recent.get("a")["count"] == 2
+        assert window.get("missing") is None
+        assert daily.pool_ids == ["a"]
+        assert daily.get("a")["count"] == 1
+        assert abs(daily.get("a")["mean"] - 9.25) < 1e-5
+        assert reopened.rows == 7
+        assert result["rows_before"] == 7
+        assert result["rows_after"] == 4
+        assert abs(values[0] - 28.0 / 3) < 1e-5
+        assert len(values) == 2
+        assert times[0] % 86400 == 0
+        assert expired.rows == 0
+        assert expired.series("a", "apy")[0].size == 0
+        assert chunked_result["rows_after"] == 4
+        assert np.array_equal(chunked_series[0][0], times)
+        assert np.allclose(chunked_series[0][1], values)
+        assert len(chunked_series[1][1]) == 2
+        assert volatilities.keys() == {"steady"}
+        assert abs(volatilities["steady"] - 0.5 / 5.5) < 1e-6
+
+
+def test_pool_charts() -> None:
+    """Test concurrent, cached /chart fetching with incremental top-ups."""
+    def chart(days: int) -> bytes:
+        return json.dumps({"status": "success", "data": [
+            {"timestamp": f"2024-01-{day:02d}T23:01:13.000Z", "apy": 5.0 + day % 2,
+             "apyBase": None, "tvlUsd": 1e6}
+            for day in range(1, days + 1)
+        ]}).encode()
+    
+    class FakeClient:
+        base_url = "https://yields.llama.fi"
+        
+        def __init__(self, days: int):
+            self.days = days
+            self.calls: list[str] = []
+        
+        async def fetch_pool_chart(self, pool_id: str):
+            self.calls.append(pool_id)
+            await asyncio.sleep(0.2)
+            if pool_id == "broken":
+                raise RuntimeError("upstream error")
+            return decode_chart(chart(self.days))
+    
+    pool_ids = [f"pool-{i}" for i in range(20)] + ["broken"]
+    
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            fetcher = ChartFetcher(ChartStore(tmp))
+            
+            started = time.perf_counter()
+            first = await fetcher.fetch(pool_ids, client=FakeClient(10))
+            elapsed = time.perf_counter() - started
+            
+            cached_client = FakeClient(12)
+            cached = await fetcher.fetch(pool_ids[:5], client=cached_client)
+            
+            fetcher.max_age_seconds = 0
+            topped_up = await fetcher.fetch(["pool-0"], client=FakeClient(12))
+            return first, elapsed, cached_client.calls, cached, topped_up, fetcher.stats()
+    
+    first, elapsed, cached_calls, cached, topped_up, stats = asyncio.run(run())
+    points = topped_up["pool-0"]
+    
+    assert len(first) == 20
+    assert "broken" not in first
+    assert elapsed < 1.0
+    assert len(first["pool-0"]) == 10
+    assert np.isnan(first["pool-0"]["apy_base"]).all()
+    assert cached_calls == []
+    assert len(cached) == 5
+    assert len(points) == 12
+    assert stats["points_appended"] == 202
+    assert bool(np.all(np.diff(points["time"]) == 86_400))
+    assert stats["errors"] == 1
+    assert abs(calculate_apy_volatility(points) - 0.5 / 5.5) < 1e-6
+    assert calculate_apy_volatility(points[:3]) is None
+    assert calculate_volatility_penalty(0.3) == 1.0
+    assert calculate_volatility_penalty(0.1) == 0.0
+
+
+def test_conditional_refresh() -> None:
+    """Test 304 and content-hash short-circuits of pool refreshes."""
+    def pools_body(apy: float) -> bytes:
+        return json.dumps({"data": [
+            {"pool": "a", "chain": "Base", "project": "aave-v3", "symbol": "USDC",
+             "apy": apy, "tvlUsd": 1e6},
+        ]}).encode()
+    
+    server = {"etag": True, "body": pools_body(5.0), "requests": []}
+    decoded = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        server["requests"].append(request)
+        if server["etag"] and request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        headers = {"ETag": '"v1"'} if server["etag"] else {}
+        return httpx.Response(200, content=server["body"], headers=headers)
+    
+    class StreamDecoder(PoolStreamDecoder):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            decoded.append("stream")
+    
+    def struct_decode(body, **kwargs):
+        decoded.append("struct")
+        return decode_pools(body, **kwargs)
+    
+    async def loader(validators):
+        client = DeFiLlamaClient(use_cache=False)
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await client.download_pools_if_changed(validators)
+        finally:
+            await client._client.aclose()
+    
+    results = {}
+    patched = (
+        defillama_client.POOL_DECODER,
+        defillama_client.PoolStreamDecoder,
+        defillama_client.decode_pools,
+    )
+    defillama_client.PoolStreamDecoder = StreamDecoder
+    defillama_client.decode_pools = struct_decode
+    try:
+        for mode in ("stream", "struct"):
+            defillama_client.POOL_DECODER = mode
+            server["etag"] = True
+            server["body"] = pools_body(5.0)
+            decoded.clear()
+            cache = PoolSnapshotCache(loader=loader, ttl_seconds=60, conditional=True)
+            
+            async def scenario():
+                first = await cache.refresh()
+                second = await cache.refresh()
+                server["etag"] = False
+                third = await cache.refresh()
+                server["body"] = pools_body(6.0)
+                fourth = await cache.refresh()
+                return first, second, third, fourth
+            
+            snapshots = asyncio.run(scenario())
+            cache._refresh_thread.join(timeout=5)
+            results[mode] = (*snapshots, cache.stats(), list(decoded))
+    finally:
+        (
+            defillama_client.POOL_DECODER,
+            defillama_client.PoolStreamDecoder,
+            defillama_client.decode_pools,
+        ) = patched
+    
+    for mode, (first, second, third, fourth, stats, decodes) in results.items():
+        assert first.snapshot_id == second.snapshot_id == third.snapshot_id, mode
+        assert third.table is first.table, mode
+        assert third.fetched_at >= first.fetched_at and not third.stale, mode
+        assert stats["short_circuits"] == {"not_modified": 1, "content_hash": 1}, mode
+        assert fourth.pools[0].apy == 6.0, mode
+        assert stats["changes"]["diffs"] == 1, mode
+        # Only the cold download and the changed body are decoded.
+        assert decodes == [mode, "struct"], mode
+    assert server["requests"][1].headers.get("if-none-match") == '"v1"'
+
+
+def test_protocol_registry() -> None:
+    """Test the /protocols registry, its disk cache and curated fallbacks."""
+    listed = 1_600_000_000
+    body = json.dumps([
+        {"slug": "Fresh-Vault", "audits": "2", "audit_links": ["https://audit.example/1"],
+         "listedAt": listed, "category": "Yield"},
+        {"slug": "unaudited-farm", "audits": "0", "listedAt": None, "category": "Farm"},
+        {"slug": "aave-v3", "audits": None, "listedAt": listed},
+        {"name": "No slug"},
+    ]).encode()
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=body)
+    
+    async def refresh(registry: ProtocolRegistry) -> bool:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await registry.refresh_if_stale(client)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "protocols.json")
+        registry = ProtocolRegistry(path)
+        offline_audited = registry.is_audited("aave-v3")
+        offline_size = len(registry)
+        refreshed = asyncio.run(refresh(registry))
+        refreshed_again = asyncio.run(refresh(registry))
+        reloaded = ProtocolRegistry(path)
+    
+    listed_day = date(2020, 9, 13).toordinal()
+    
+    assert offline_audited
+    assert offline_size == 0
+    assert refreshed
+    assert not refreshed_again
+    assert len(requests) == 1
+    assert registry.is_audited("fresh-vault")
+    assert not registry.is_audited("unaudited-farm")
+    assert registry.is_audited("aave-v3")
+    assert registry.audit_links("fresh-vault") == ["https://audit.example/1"]
+    assert registry.launch_day("fresh-vault") == listed_day
+    assert registry.launch_day("aave-v3") == listed_day
+    assert registry.launch_day("unaudited-farm") == 0
+    assert registry.get("x") is None
+    assert reloaded.stats()["loaded_from_disk"]
+    assert reloaded.is_audited("fresh-vault")
+
+
+def test_token_registry() -> None:
+    """Test the LI.FI /tokens registry, its disk cache and route amounts."""
+    pendle_arb = "0x0c880f6761F1af8d9Aa9C466984b80DAb9a8c9e8"
+    bsc_usdc = "0x8AC76a51cc950d9822D68b83fE1Ad97B32Cd580d"
+    body = json.dumps({"tokens": {
+        "42161": [
+            {"address": pendle_arb, "symbol": "PENDLE", "decimals": 18},
+            {"address": "0x0000000000000000000000000000000000000001", "symbol": "PENDLE",
+             "decimals": 18},
+            {"address": "0xbad", "symbol": "BROKEN", "decimals": "6"},
+        ],
+        "8453": [{"address": "0xA88594D404727625A9437C3f886C7643872296AE", "symbol": "WELL",
+                  "decimals": 18}],
+        "56": [{"address": bsc_usdc, "symbol": "USDC", "decimals": 18}],
+        "1151111081099710": [{"address": "EPjF", "symbol": "USDC", "decimals": 6}],
+    }}).encode()
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            return httpx.Response(200, content=body)
+        payload = json.loads(request.content)
+        route = {
+            "steps": [{"toolDetails": {"name": "Stargate"}}],
+            "toAmount": payload["fromAmount"],
+            "toToken": {"decimals": 18},
+        }
+        return httpx.Response(200, json={"routes": [route]})
+    
+    async def scenario(registry: TokenRegistry):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            refreshed = await registry.refresh_if_stale(client)
+            refreshed_again = await registry.refresh_if_stale(client)
+        
+        lifi = LiFiClient(cache=None)
+        lifi._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            pendle = await lifi.get_routes_many("arbitrum", ["arbitrum"], "pendle", "PENDLE", 2.5)
+            usdc = await lifi.get_routes("bsc", "ethereum", "USDC", "USDC", 100)
+        finally:
+            await lifi._client.aclose()
+        return refreshed, refreshed_again, pendle["arbitrum"], usdc
+    
+    shared = token_registry._registry
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tokens.json")
+        registry = TokenRegistry(path)
+        offline_size = len(registry)
+        token_registry._registry = registry
+        try:
+            refreshed, refreshed_again, pendle, usdc = asyncio.run(scenario(registry))
+        finally:
+            token_registry._registry = shared
+        reloaded = TokenRegistry(path)
+    
+    posts = [json.loads(r.content) for r in requests if r.method == "POST"]
+    
+    assert offline_size == 0
+    assert requests[0].url.params["chains"].split(",")[:2] == ["1", "42161"]
+    assert refreshed
+    assert not refreshed_again
+    assert sum(r.method == "GET" for r in requests) == 1
+    assert registry.address("Arbitrum", "pendle") == pendle_arb
+    assert registry.decimals("arbitrum", pendle_arb.lower()) == 18
+    assert registry.get("arbitrum", "BROKEN") is None
+    assert len(registry) == 4
+    assert posts[0]["fromTokenAddress"] == pendle_arb
+    assert posts[0]["fromAmount"] == str(25 * 10 ** 17)
+    assert posts[1]["fromAmount"] == str(100 * 10 ** 18)
+    assert usdc[0].estimated_output == 100
+    assert pendle[0].estimated_output == 2.5
+    assert reloaded.stats()["loaded_from_disk"]
+    assert reloaded.decimals("bsc", "USDC") == 18
+
+
+def test_token_registry_destinations() -> None:
+    """Test loading the token registry for tokens missing only on the destination."""
+    base_usdt = "0xfde4C96c8593536E31F229EA8f37b2AD11ED9A3a"
+    avalanche_dai = "0xd586E7F844cEa2F87f50152665BCbc2C279D8d70"
+    polygon_eth = "0x7ceB23fD6bC0adD59E62ac25578270cFf1b9f619"
+    body = json.dumps({"tokens": {
+        "8453": [{"address": base_usdt, "symbol": "USDT", "decimals": 6}],
+        "43114": [{"address": avalanche_dai, "symbol": "DAI", "decimals": 18}],
+        "137": [{"address": polygon_eth, "symbol": "ETH", "decimals": 18}],
+    }}).encode()
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("/tokens"):
+            return httpx.Response(200, content=body)
+        if request.url.path.endswith("/quote"):
+            return httpx.Response(200, json={
+                "toolDetails": {"name": "Stargate"},
+                "estimate": {"toAmount": str(10 ** 18)},
+                "transactionRequest": {"to": "0x1"},
+            })
+        route = {"steps": [{"toolDetails": {"name": "Stargate"}}], "toAmount": "100"}
+        return httpx.Response(200, json={"routes": [route]})
+    
+    async def scenario(call):
+        lifi = LiFiClient(cache=None)
+        lifi._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await call(lifi)
+        finally:
+            await lifi._client.aclose()
+    
+    # Each source token is in COMMON_TOKENS; only the destination needs the registry.
+    calls = {
+        "many": lambda lifi: lifi.get_routes_many(
+            "ethereum", ["base", "arbitrum"], "USDT", "USDT", 100
+        ),
+        "routes": lambda lifi: lifi.get_routes("ethereum", "avalanche", "DAI", "DAI", 100),
+        "quote": lambda lifi: lifi.get_quote(
+            "ethereum", "polygon", "ETH", "ETH", 1, "0x" + "ab" * 20
+        ),
+    }
+    results = {}
+    shared = token_registry._registry
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, call in calls.items():
+                token_registry._registry = TokenRegistry(os.path.join(tmp, f"{name}.json"))
+                results[name] = asyncio.run(scenario(call))
+    finally:
+        token_registry._registry = shared
+    
+    posts = {
+        json.loads(r.content)["toChainId"]: json.loads(r.content)
+        for r in requests if r.method == "POST"
+    }
+    quotes = [r for r in requests if r.url.path.endswith("/quote")]
+    
+    assert sum(r.url.path.endswith("/tokens") for r in requests) == 3
+    assert results["many"]["base"]
+    assert results["many"]["arbitrum"]
+    assert posts[8453]["toTokenAddress"] == base_usdt
+    assert results["routes"]
+    assert posts[43114]["toTokenAddress"] == avalanche_dai
+    assert results["quote"] is not None
+    assert quotes[0].url.params["toToken"] == polygon_eth
+
+
+def test_pool_shards() -> None:
+    """Test per-chain shards, their versions and chain-scoped selection."""
+    def pools(base_apy: float) -> list[PoolRecord]:
+        return [
+            PoolRecord(pool="arb-1", chain="Arbitrum", project="aave-v3", symbol="USDC",
+                       tvl_usd=5e6, apy=4.0),
+            PoolRecord(pool="base-1", chain="Base", project="aave-v3", symbol="USDC",
+                       tvl_usd=3e6, apy=base_apy),
+            PoolRecord(pool="eth-1", chain="Ethereum", project="lido", symbol="STETH",
+                       tvl_usd=9e9, apy=3.0),
+            PoolRecord(pool="arb-2", chain="Arbitrum", project="gmx", symbol="GLP",
+                       tvl_usd=2e6, apy=12.0),
+        ]
+    
+    cache = PoolSnapshotCache(loader=None)
+    first = cache.publish(pools(5.0))
+    second = cache.publish(pools(6.5))
+    shards = second.shards
+    selected = select_shards(shards, ["Arbitrum", "base", "arbitrum", "solana", "foo"])
+    stats = cache.stats()["shards"]
+    
+    assert sorted(shards) == ["arbitrum", "base", "ethereum"]
+    assert shards["arbitrum"].rows.tolist() == [0, 3]
+    assert [p.pool for p in shards["arbitrum"].table.pools] == ["arb-1", "arb-2"]
+    assert shards["arbitrum"].table.search_rows("glp").tolist() == [1]
+    assert shards["base"].version == 2
+    assert shards["base"].table.apy.tolist() == [6.5]
+    assert shards["arbitrum"].version == 1
+    assert shards["arbitrum"].table.search_index is first.shards["arbitrum"].table.search_index
+    assert shards["arbitrum"].table.pools[0] is second.pools[0]
+    assert list(selected) == ["Arbitrum", "base"]
+    assert sorted(select_shards(shards)) == ["arbitrum", "base", "ethereum"]
+    assert stats["base"]["version"] == 2
+    assert stats["ethereum"]["pools"] == 1
+    assert stats["ethereum"]["bytes"] > 0
+
+
+def test_token_taxonomy() -> None:
+    """Test canonical tokens, family masks and token filtering."""
+    client = DeFiLlamaClient()
+    weth = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+    symbols = [
+        ("USDC", None), ("USDC.e-USDbC", None), ("ETHFI-ARB", None), ("WSTETH-WETH", None),
+        ("SUSHI-ETH", None), ("PENDLE", None), ("AWETH", [weth]), ("WBTC-TBTC", None),
+    ]
+    records = [
+        PoolRecord(pool=f"p{i}", project="aave-v3", symbol=symbol, chain="Ethereum",
+                   apy=4.0, tvl_usd=2e8, underlying_tokens=tokens)
+        for i, (symbol, tokens) in enumerate(symbols)
+    ]
+    table = PoolTable(records)
+    candidates = [client._parse_candidate(table, row, "ethereum") for row in range(len(records))]
+    opportunities = client.materialize(candidates)
+    
+    def ids(rows) -> list[str]:
+        return [row.pool_id for row in rows]
+    
+    levels = [IL_RISK_LEVELS[code] for code in table.il_risk_codes]
+    
+    assert TOKENS.canonical("usdc.e") == "USDC"
+    assert TOKENS.canonical("WETH") == "ETH"
+    assert ids(filter_by_token(candidates, "USDC")) == ["p0", "p1"]
+    assert ids(filter_by_token(candidates, "weth")) == ["p3", "p4", "p6"]
+    assert ids(filter_by_token(candidates, "WSTETH")) == ["p3"]
+    assert ids(filter_by_token(candidates, "TBTC")) == ["p7"]
+    assert ids(filter_by_token(candidates, "ethfi")) == ["p2"]
+    assert ids(filter_by_token(candidates, "ETH"))[-1] == "p6"
+    assert all(
+        ids(filter_by_token(candidates, token)) == ids(filter_by_token(opportunities, token))
+        for token in ["USDC", "ETH", "WSTETH", "PENDLE", "ethfi", "doge"]
+    )
+    assert levels[1:5] == [
+        ILRisk.LOW, ILRisk.HIGH, ILRisk.MEDIUM, ILRisk.HIGH,
+    ]
+    assert levels[7] == ILRisk.MEDIUM
+
+
+def test_pool_identity() -> None:
+    """Test identity keys, wrapper collapsing and dedup after risk filtering."""
+    client = DeFiLlamaClient()
+    usdc, weth, dai = "0xA0b8", "0xC02a", "0x6B17"
+    rows = [
+        ("aave-v2-usdc", "aave-v2", "Ethereum", [usdc], 3e8, 4.0),
+        ("aave-v3-usdc", "aave-v3", "Ethereum", [usdc.lower()], 9e8, 4.0),
+        ("uni-5bp", "uniswap-v3", "Ethereum", [weth, usdc], 2e8, 9.0),
+        ("uni-30bp", "uniswap-v3", "Ethereum", [usdc, weth], 1e8, 12.0),
+        ("curve-lp", "curve-dex", "Ethereum", [weth, usdc], 4e7, 5.0),
+        ("convex-lp", "convex-finance", "Ethereum", [usdc, weth], 6e7, 20.0),
+        ("curve-a", "curve-dex", "Ethereum", [dai, usdc], 3e7, 4.0),
+        ("curve-b", "curve-dex", "Ethereum", [usdc, dai], 2e7, 4.0),
+        ("convex-ab", "convex-finance", "Ethereum", [dai, usdc], 5e7, 4.0),
+        ("aave-v3-usdc", "aave-v3", "Ethereum", [usdc], 9e8, 4.0),
+    ]
+    table = PoolTable([
+        PoolRecord(pool=pool_id, project=project, symbol="USDC", chain=chain,
+                   apy=apy, tvl_usd=tvl, underlying_tokens=tokens)
+        for pool_id, project, chain, tokens, tvl, apy in rows
+    ])
+    candidates = [
+        client._parse_candidate(table, row, table.pools[row].chain.lower())
+        for row in range(len(rows))
+    ]
+    opportunities = client.materialize(candidates)
+    
+    def ids(items) -> list[str]:
+        return [item.pool_id for item in items]
+    
+    expected = [
+        "aave-v2-usdc", "aave-v3-usdc", "uni-5bp", "uni-30bp", "convex-lp",
+        "curve-a", "curve-b", "convex-ab",
+    ]
+    
+    assert identity_key(candidates[0]) != identity_key(candidates[1])
+    assert identity_key(candidates[1]) == identity_key(opportunities[9])
+    assert ids(deduplicate_opportunities(candidates)) == expected
+    assert ids(deduplicate_opportunities(opportunities)) == expected
+    assert "curve-lp" in ids(dedupe_pools(candidates, rank=lambda c: -c.tvl_usd))
+    assert ids(merge_opportunities(opportunities[:2], opportunities[9:])) == [
+        "aave-v2-usdc", "aave-v3-usdc",
+    ]
+    
+    # The Convex listing fails the conservative APY cap, so the Curve
+    # pool it wraps must survive dedup.
+    async def top_candidates(**kwargs):
+        return candidates[4:6]
+    
+    fetch_candidates = yield_fetcher.get_top_yield_candidates
+    yield_fetcher.get_top_yield_candidates = top_candidates
+    try:
+        result = asyncio.run(yield_fetcher.fetch_yields_async(AgentState(
+            user_query="test", risk_tolerance=RiskTolerance.CONSERVATIVE,
+        )))
+    finally:
+        yield_fetcher.get_top_yield_candidates = fetch_candidates
+    
+    assert ids(result["yield_opportunities"]) == ["curve-lp"]
+
+
+def test_concurrent_routes() -> None:
+    """Test concurrent route fan-out, timeouts and per-destination errors."""
+    in_flight = []
+    peak = []
+    
+    async def handler(request: httpx.Request) -> httpx.Response:
+        to_chain_id = json.loads(request.content)["toChainId"]
+        in_flight.append(to_chain_id)
+        peak.append(len(in_flight))
+        try:
+            if to_chain_id == SUPPORTED_CHAINS["polygon"]["chain_id"]:
+                await asyncio.sleep(5)
+            await asyncio.sleep(0.1)
+        finally:
+            in_flight.remove(to_chain_id)
+        route = {"steps": [{"toolDetails": {"name": "Stargate"}}], "toAmount": "999000000"}
+        return httpx.Response(200, json={"routes": [route]})
+    
+    async def fan_out(concurrency: int) -> tuple[dict, float]:
+        client = LiFiClient(cache=None)
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            started = time.perf_counter()
+            results = await client.get_routes_many(
+                "ethereum", ["arbitrum", "base", "optimism", "polygon", "solana", "base"],
+                "USDC", "USDC", 1000, concurrency=concurrency, call_timeout=0.5,
+            )
+            return results, time.perf_counter() - started
+        finally:
+            await client._client.aclose()
+    
+    results, elapsed = asyncio.run(fan_out(concurrency=6))
+    peak_parallel = max(peak)
+    peak.clear()
+    _, bounded_elapsed = asyncio.run(fan_out(concurrency=1))
+    
+    assert list(results) == [
+        "arbitrum", "base", "optimism", "polygon", "solana",
+    ]
+    assert results["base"][0].bridge_name == "Stargate"
+    assert results["solana"] == []
+    assert isinstance(results["polygon"], TimeoutError)
+    assert peak_parallel == 4
+    assert elapsed < 0.75
+    assert max(peak) == 1
+    assert bounded_elapsed >= 0.75
+
+
+def test_route_cache() -> None:
+    """Test amount-bucketed route caching, rescaling, LRU and stale serves."""
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append((payload["toChainId"], int(payload["fromAmount"])))
+        route = {
+            "steps": [{"toolDetails": {"name": "Stargate"}}],
+            "gasCostUSD": "2.00",
+            "feeCostUSD": "1.00",
+            "toAmount": str(int(payload["fromAmount"]) - 1_000_000),
+        }
+        return httpx.Response(200, json={"routes": [route]})
+    
+    cache = RouteCache(ttl_seconds=60, stale_seconds=60, max_entries=2, buckets_per_decade=8)
+    
+    async def scenario():
+        client = LiFiClient(cache=cache)
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            first = await client.get_routes("ethereum", "arbitrum", "USDC", "USDC", 10_000)
+            nearby = await client.get_routes("ethereum", "arbitrum", "usdc", "USDC", 10_500)
+            await client.get_routes("ethereum", "arbitrum", "USDC", "USDC", 100)
+            await client.get_routes("ethereum", "base", "USDC", "USDC", 10_000)
+            evicted = await client.get_routes("ethereum", "arbitrum", "USDC", "USDC", 10_000)
+            return first, nearby, evicted
+        finally:
+            await client._client.aclose()
+    
+    first, nearby, evicted = asyncio.run(scenario())
+    
+    # Expired entries are only served as a fallback, within the stale window.
+    key = cache.key("ethereum", "arbitrum", "USDC", 10_000)
+    entry = cache._entries[key]
+    cache._entries[key] = entry._replace(fetched_at=entry.fetched_at - 90)
+    expired = cache.lookup(key, 10_000)
+    stale = cache.serve_stale(key, 20_000)
+    cache._entries[key] = entry._replace(fetched_at=entry.fetched_at - 150)
+    too_old = cache.serve_stale(key, 10_000)
+    stats = cache.stats()
+    
+    assert cache.bucket(10_000) == cache.bucket(10_500)
+    assert cache.bucket(100) != cache.bucket(10_000)
+    assert cache.bucket(0) is None
+    assert [amount for _, amount in requests][:2] == [10_000_000_000, 100_000_000]
+    assert nearby[0].amount == 10_500
+    assert first[0].amount == 10_000
+    assert nearby[0].gas_cost_usd == 2.0
+    assert nearby[0].bridge_fee_usd == 1.05
+    assert nearby[0].total_cost_usd == 3.05
+    assert abs(nearby[0].estimated_output - 9_999 * 1.05) < 1e-6
+    assert len(requests) == 4
+    assert evicted[0].amount == 10_000
+    assert expired is None
+    assert stale[0].amount == 20_000
+    assert stats["stale_serves"] == 1
+    assert too_old is None
+    assert key not in cache._entries
+    assert stats["hits"] == 1
+    assert stats["misses"] == 5
+    assert stats["hit_ratio"] == 0.1667
+    assert stats["evictions"] == 2
+    assert stats["entries"] == 1
+
+
+def test_route_matrix() -> None:
+    """Test the all-pairs route matrix refresh, lookups and route-only reads."""
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload["toChainId"])
+        if payload["toChainId"] == SUPPORTED_CHAINS["bsc"]["chain_id"]:
+            return httpx.Response(200, json={"routes": []})
+        route = {
+            "steps": [{"toolDetails": {"name": "Across"}}],
+            "gasCostUSD": "1.50",
+            "feeCostUSD": str(int(payload["fromAmount"]) / 1e9),
+            "toAmount": payload["fromAmount"],
+        }
+        return httpx.Response(200, json={"routes": [route]})
+    
+    matrix = RouteMatrix(
+        tokens=["usdc", "ETH"], amounts=[100_000, 1000], concurrency=8,
+        limiter=HostRateLimiter(rate_per_second=1e6, burst=1000),
+    )
+    
+    async def refresh():
+        client = LiFiClient(cache=None)
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await matrix.refresh(client=client)
+        finally:
+            await client._client.aclose()
+    
+    published = asyncio.run(refresh())
+    near_small = matrix.lookup("Ethereum", "arbitrum", "USDC", 2000)
+    near_large = matrix.lookup("ethereum", "arbitrum", "usdc", 50_000)
+    no_route = matrix.lookup("ethereum", "bsc", "USDC", 1000)
+    no_token = matrix.lookup("ethereum", "polygon", "ETH", 1000)
+    stats = matrix.stats()
+    
+    # Route-only queries answer from the shared matrix without LI.FI.
+    ROUTE_BOARD.clear()
+    ROUTE_MATRIX.clear()
+    ROUTE_MATRIX.publish(("ethereum", "base", "USDC", 1000.0), near_small.model_copy(
+        update={"to_chain": "base", "to_chain_id": 8453, "amount": 1000.0, "bridge_fee_usd": 1.0}
+    ))
+    state = AgentState(
+        user_query="bridge 3000 USDC to base",
+        amount=3000,
+        token="USDC",
+        current_chain="ethereum",
+        preferred_chains=["Base", "ethereum", "base"],
+    )
+    result = find_routes_only(state)
+    routes = result.get("bridge_routes", [])
+    ROUTE_BOARD.clear()
+    ROUTE_MATRIX.clear()
+    
+    assert len(matrix.pairs()) == 7 * 6 + 4 * 3
+    assert len(requests) == 2 * len(matrix.pairs())
+    assert published == len(requests) - 2 * 6
+    assert near_small.bridge_fee_usd == 2.0
+    assert near_small.amount == 2000
+    assert near_large.bridge_fee_usd == 50.0
+    assert near_large.gas_cost_usd == 1.5
+    assert no_route is None
+    assert no_token is None
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["fresh_cells"] == published
+    assert [route.to_chain for route in routes] == ["ethereum", "base"]
+    assert routes[1].amount == 3000
+    assert routes[1].bridge_fee_usd == 3.0
+    assert not result.get("warnings")
+
+
+def test_route_costs() -> None:
+    """Test cost-curve fits, bounds, drift and live confirmation of the top few."""
+    def route(to_chain: str, amount: float, total: float, **update) -> BridgeRoute:
+        return BridgeRoute(
+            from_chain="ethereum", from_chain_id=1, to_chain=to_chain,
+            to_chain_id=SUPPORTED_CHAINS[to_chain]["chain_id"], token="USDC",
+            token_address="0x", amount=amount, bridge_name="Across",
+            estimated_time_seconds=120, gas_cost_usd=min(total, 2.0),
+            bridge_fee_usd=max(0.0, total - 2.0), total_cost_usd=total,
+            estimated_output=amount - total, **update,
+        )
+    
+    samples = [(a, route("arbitrum", a, 2.0 + 0.0005 * a)) for a in (1000, 10_000, 100_000)]
+    curve = fit_cost_curve(samples)
+    modeled = curve.route(5000)
+    far = curve.route(1_000_000)
+    proportional = fit_cost_curve([
+        (1000, route("base", 1000, 0.9)), (2000, route("base", 2000, 2.0)),
+    ])
+    
+    matrix = RouteMatrix(tokens=["USDC"], amounts=[1000, 10_000, 100_000])
+    for amount, sample in samples:
+        matrix.publish(("ethereum", "arbitrum", "USDC", float(amount)), sample)
+    matrix.publish(("ethereum", "base", "USDC", 1000.0), route("base", 1000, 3.0))
+    model = CostModel()
+    fitted = model.fit(matrix)
+    hit = model.route("Ethereum", "arbitrum", "usdc", 20_000)
+    close_error = model.observe(route("arbitrum", 20_000, 12.3))
+    drift_error = model.observe(route("arbitrum", 20_000, 40.0))
+    drifted = model.drifted()
+    after_drift = model.route("ethereum", "arbitrum", "USDC", 20_000)
+    model.fit(matrix, drifted)
+    refit = model.route("ethereum", "arbitrum", "USDC", 20_000)
+    
+    # Ranking confirms modeled routes for the top candidate only, with a
+    # live quote even though the route cache holds one.
+    def opportunity(chain: str, apy: float) -> YieldOpportunity:
+        return YieldOpportunity(
+            pool_id=f"{chain}-pool", protocol="Aave", protocol_slug="aave-v3", chain=chain,
+            pool_name="Aave USDC", symbol="USDC", apy=apy, tvl_usd=5e8, risk_score=2.0,
+            audited=True, protocol_age_days=1000,
+        )
+    
+    gas = {
+        chain: GasEstimate(
+            chain=chain, chain_id=SUPPORTED_CHAINS[chain]["chain_id"], gas_price_slow=0.1,
+            gas_price_standard=0.1, gas_price_fast=0.1, swap_cost_usd=0.1,
+            deposit_cost_usd=0.1, last_updated="now",
+        )
+        for chain in ("arbitrum", "base")
+    }
+    GAS_BOARD.clear()
+    for chain, estimate in gas.items():
+        GAS_BOARD.publish(chain, estimate)
+    ROUTE_CACHE.clear()
+    ROUTE_CACHE.store(
+        ROUTE_CACHE.key("ethereum", "arbitrum", "USDC", 10_000),
+        [route("arbitrum", 10_000, 5.0)],
+        10_000,
+    )
+    quoted = []
+    observed = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        quoted.append(json.loads(request.content)["toChainId"])
+        live = {
+            "steps": [{"toolDetails": {"name": "Stargate"}}],
+            "gasCostUSD": "2.00",
+            "feeCostUSD": "898.00",
+            "toAmount": "9100000000",
+        }
+        return httpx.Response(200, json={"routes": [live]})
+    
+    class LiveLiFiClient(LiFiClient):
+        async def __aenter__(self) -> LiFiClient:
+            self._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            observer = self.observer
+            self.observer = lambda live: (observed.append(live), observer(live))
+            return self
+    
+    state = AgentState(
+        user_query="test",
+        amount=10_000,
+        token="USDC",
+        current_chain="ethereum",
+        yield_opportunities=[opportunity("arbitrum", 8.0), opportunity("base", 7.5)],
+        bridge_routes=[
+            route("arbitrum", 10_000, 7.0, cost_error_usd=0.35),
+            route("base", 10_000, 7.0, cost_error_usd=0.35),
+        ],
+    )
+    history_candidates = ranking_engine.HISTORY_CANDIDATES
+    live_candidates = ranking_engine.LIVE_QUOTE_CANDIDATES
+    ranking_engine.HISTORY_CANDIDATES = 0
+    ranking_engine.LIVE_QUOTE_CANDIDATES = 1
+    ranking_engine.LiFiClient = LiveLiFiClient
+    try:
+        result = asyncio.run(ranking_engine.rank_opportunities_async(state))
+    finally:
+        ranking_engine.HISTORY_CANDIDATES = history_candidates
+        ranking_engine.LIVE_QUOTE_CANDIDATES = live_candidates
+        ranking_engine.LiFiClient = LiFiClient
+        GAS_BOARD.clear()
+        ROUTE_CACHE.clear()
+    recommendations = result["recommendations"]
+    
+    assert abs(curve.fixed_usd - 2.0) < 1e-6
+    assert abs(curve.rate - 0.0005) < 1e-9
+    assert modeled.total_cost_usd == 4.5
+    assert modeled.gas_cost_usd == 2.0
+    assert abs(modeled.estimated_output - (5000 - 4.5)) < 1e-6
+    assert modeled.cost_error_usd == round(0.05 * 4.5, 2)
+    assert far.cost_error_usd == round(0.05 * 502.0 * 10, 2)
+    assert proportional.fixed_usd == 0.0
+    assert proportional.rate > 0
+    assert fitted == 1
+    assert model.route("ethereum", "base", "USDC", 1000) is None
+    assert hit.amount == 20_000
+    assert hit.total_cost_usd == 12.0
+    assert hit.cost_error_usd
+    assert abs(close_error - 0.3) < 1e-6
+    assert abs(drift_error - 28.0) < 1e-6
+    assert drifted == [("ethereum", "arbitrum", "USDC")]
+    assert after_drift is None
+    assert refit is not None
+    assert model.drifted() == []
+    assert quoted == [SUPPORTED_CHAINS["arbitrum"]["chain_id"]]
+    assert [live.total_cost_usd for live in observed] == [900.0]
+    assert recommendations[1].bridge_route.total_cost_usd == 900.0
+    assert recommendations[1].bridge_route.cost_error_usd is None
+    assert [r.opportunity.chain for r in recommendations] == ["base", "arbitrum"]
+    assert recommendations[0].bridge_route.cost_error_usd == 0.35
+
+
+def test_background_refresher() -> None:
+    """Test jittered backoff, clean shutdown and published route reads."""
+    calls = []
+    
+    async def flaky():
+        calls.append(1)
+        if len(calls) <= 2:
+            raise RuntimeError("upstream down")
+    
+    async def hung():
+        await asyncio.sleep(60)
+    
+    flaky_job = RefreshJob("flaky", flaky, interval_seconds=0.02, jitter=0,
+                           backoff_base_seconds=0.01)
+    hung_job = RefreshJob("hung", hung, interval_seconds=0.02)
+    
+    async def scenario():
+        refresher = BackgroundRefresher([flaky_job, hung_job], shutdown_timeout=0.1)
+        refresher.start()
+        await asyncio.sleep(0.2)
+        await refresher.stop()
+        return refresher
+    
+    refresher = asyncio.run(scenario())
+    
+    backoff = RefreshJob("backoff", flaky, interval_seconds=60, jitter=0,
+                         backoff_base_seconds=15, max_backoff_seconds=100)
+    delays = []
+    for failures in (0, 1, 3, 5):
+        backoff.consecutive_failures = failures
+        delays.append(backoff.next_delay())
+    
+    jittered = RefreshJob("jittered", flaky, interval_seconds=60, jitter=0.1)
+    samples = [jittered.next_delay() for _ in range(200)]
+    
+    route = BridgeRoute(
+        from_chain="ethereum", from_chain_id=1, to_chain="arbitrum", to_chain_id=42161,
+        token="USDC", token_address="0x", amount=1000, bridge_name="stargate",
+        estimated_time_seconds=60, gas_cost_usd=1.0, bridge_fee_usd=0.5,
+        total_cost_usd=1.5, estimated_output=998.5,
+    )
+    ROUTE_BOARD.clear()
+    ROUTE_BOARD.publish(route_key("Ethereum", "arbitrum", "usdc", 1000), route)
+    
+    state = AgentState(
+        user_query="test",
+        amount=1000,
+        token="USDC",
+        current_chain="ethereum",
+        yield_opportunities=[YieldOpportunity(
+            pool_id="p", protocol="Aave", protocol_slug="aave-v3", chain="arbitrum",
+            pool_name="Aave USDC", symbol="USDC", apy=5.0, tvl_usd=1e8,
+            risk_score=2.0, il_risk=ILRisk.NONE,
+        )],
+    )
+    result = asyncio.run(find_routes_async(state))
+    board_stats = ROUTE_BOARD.stats()
+    ROUTE_BOARD.clear()
+    
+    assert not refresher.running
+    assert flaky_job.failures == 2
+    assert flaky_job.consecutive_failures == 0
+    assert flaky_job.runs >= 4
+    assert hung_job.runs == 1
+    assert hung_job.last_success_at is None
+    assert delays == [60, 15, 60, 100]
+    assert all(54 <= d <= 66 for d in samples)
+    assert len(set(samples)) > 1
+    assert result["bridge_routes"][1] is route
+    assert board_stats["hits"] == 1
+
+
 # ==============================================================================
 # INTEGRATION TEST
 # ==============================================================================
@@ -402,6 +1943,34 @@ def run_all_tests() -> None:
         ("Supported Chains", test_supported_chains),
         ("Parse Input Node", test_parse_input_node),
         ("Format Response Node", test_format_response_node),
+        ("Pool Snapshot Cache", test_pool_snapshot_cache),
+        ("Pool Cache Single Flight", test_pool_cache_single_flight),
+        ("Pool Cache Refresh Failures", test_pool_cache_refresh_failures),
+        ("Pool Table Masks", test_pool_table_masks),
+        ("Pool Search Index", test_pool_search_index),
+        ("Pool Table Top-K", test_pool_table_top_k),
+        ("Pool Stream Decoder", test_pool_stream_decoder),
+        ("Pool Struct Decoder", test_pool_struct_decoder),
+        ("Pool Snapshot Store", test_pool_snapshot_store),
+        ("Categorical Encoding", test_categorical_encoding),
+        ("Snapshot Diff", test_snapshot_diff),
+        ("Changes Endpoint", test_changes_endpoint),
+        ("Pool History", test_pool_history),
+        ("Pool Charts", test_pool_charts),
+        ("Conditional Refresh", test_conditional_refresh),
+        ("Protocol Registry", test_protocol_registry),
+        ("Token Registry", test_token_registry),
+        ("Token Registry Destinations", test_token_registry_destinations),
+        ("Pool Shards", test_pool_shards),
+        ("Token Taxonomy", test_token_taxonomy),
+        ("Pool Identity", test_pool_identity),
+        ("Concurrent Routes", test_concurrent_routes),
+        ("Route Cache", test_route_cache),
+        ("Route Matrix", test_route_matrix),
+        ("Route Costs", test_route_costs),
+        ("Background Refresher", test_background_refresher),
+        ("Pool Risk Columns", test_pool_risk_columns),
+        ("Lazy Materialization", test_lazy_materialization),
         ("Full Graph Creation", test_full_graph),
     ]
     
@@ -411,7 +1980,12 @@ def run_all_tests() -> None:
     
     for name, test_func in tests:
         try:
-            passed = test_func()
+            # Assert-style tests return None when they pass.
+            passed = test_func() is not False
+        except AssertionError as e:
+            passed = False
+            failed_line = traceback.extract_tb(e.__traceback__)[-1].line
+            print(f"      Failed: {failed_line}" + (f" ({e})" if str(e) else ""))
         except Exception as e:
             passed = False
             print(f"      Exception in {name}: {e}")